@@ -0,0 +1,456 @@
+"""
+A Hashtable that lives in a memory-mapped file, so a large index can be reopened
+(and shared between processes) without rebuilding it.
+"""
+import io
+import mmap
+import os
+import pickle
+import struct
+from collections import Counter
+from hashlib import blake2b
+
+from hashtable import GrowthPolicy, Hashtable, KeyValuePair
+
+_MAGIC = b'HTDISK01'
+_HEADER = struct.Struct('<8sQQQQ')
+"""File header: magic, number of slots, number of elements, number of tombstones, end of the value heap"""
+_HEADER_SIZE = 64
+"""The header is padded to this many bytes; the slot directory starts right after it"""
+_SLOT = struct.Struct('<QQII')
+"""A directory slot: key hash, record offset (0 means empty), key length, value length"""
+_TOMBSTONE = 0xFFFFFFFF
+"""Key length marking a slot whose entry was removed"""
+
+
+def stable_hash(key_bytes: bytes) -> int:
+    """
+    A 64-bit hash that is the same in every process (unlike the builtin hash() of a str),
+    so the slot layout written by one process is valid in every other.
+    :param key_bytes: The encoded key
+    :return: The hash of the key
+    """
+    return int.from_bytes(blake2b(key_bytes, digest_size=8).digest(), 'little')
+
+
+def _encode_key(key) -> bytes:
+    """
+    Internal helper to turn a key into bytes, tagged with its type so "1", b"1" and 1 stay distinct.
+    :param key: A str, bytes or int key
+    :return: The encoded key
+    """
+    if isinstance(key, str):
+        return b's' + key.encode('utf-8')
+    if isinstance(key, bytes):
+        return b'b' + key
+    if isinstance(key, int):
+        return b'i' + str(key).encode('ascii')
+    raise TypeError(f"DiskHashtable keys must be str, bytes or int, not {type(key).__name__}")
+
+
+def _decode_key(key_bytes: bytes):
+    """
+    Internal helper that reverses _encode_key.
+    :param key_bytes: The encoded key
+    :return: The original key
+    """
+    tag, body = key_bytes[:1], key_bytes[1:]
+    if tag == b's':
+        return body.decode('utf-8')
+    if tag == b'b':
+        return body
+    return int(body)
+
+
+class DiskHashtable(Hashtable):
+    """
+    A Hashtable stored in a memory-mapped file. The file holds a fixed-size directory of slots
+    (open addressing with linear probing, like OpenAddressingHashtable) followed by an append-only
+    heap of key/value records. Opening a table only maps the file; pages are read in lazily as
+    they are used, and every process that maps the same file shares one copy in the page cache.
+    Keys may be str, bytes or int; values are stored with the serializer (pickle by default).
+    Overwritten and removed records stay in the heap until the table is resized or compacted,
+    which rewrites the file. A read-only table sees another process's puts and removes as they are
+    made, remapping the file when the heap grows past what it has mapped; a resize or compaction
+    writes a new file, though, and readers keep seeing the old one until they reopen the table.
+    """
+
+    def __init__(self, path: str, num_buckets=1024, readonly=False, serializer=pickle, hasher=stable_hash):
+        """
+        Open (or create) a disk-backed hashtable.
+        :param path: The file holding the table; created if it doesn't exist (unless readonly).
+        :param num_buckets: The number of directory slots for a new file, rounded up to a power of two.
+        :param readonly: If True, map the file read-only; put/remove raise io.UnsupportedOperation.
+        :param serializer: Anything with dumps()/loads() used to store values; defaults to pickle.
+        :param hasher: Turns an encoded key into an unsigned 64-bit int, the same in every process
+            (e.g. a seeded hasher from hashers.py); defaults to stable_hash. Hashes are stored in the
+            file, so a table must always be opened with the hasher it was created with.
+        """
+        self.path = path
+        """The file holding this table"""
+        self.readonly = readonly
+        """Whether this table was opened read-only"""
+        self.serializer = serializer
+        """Turns values into bytes and back"""
+        self.hasher = hasher
+        """Turns an encoded key into the hash stored in its slot"""
+        self.policy = GrowthPolicy(max_load_factor=0.6, growth_factor=2, power_of_two=True, min_buckets=8)
+        """Decides when and how the slot directory grows"""
+        self.alpha = self.policy.max_load_factor
+        """This is a 'target' value-- if the fraction of used slots ever gets bigger than this, resize. """
+        self.old_buckets = None
+        """Always None; the directory is rebuilt in one pass"""
+        self.stats = None
+        """The HashtableStats being collected, or None (the default) if stats are off"""
+        self._file = None
+        self._mm = None
+        if not os.path.exists(path):
+            if readonly:
+                raise FileNotFoundError(f"No DiskHashtable at {path}")
+            self._write_file(path, self.policy.rounded(num_buckets), ())
+        self._open()
+
+    def _open(self) -> None:
+        """
+        Internal helper that maps self.path and reads its header.
+        """
+        self._file = open(self.path, 'rb' if self.readonly else 'r+b')
+        self._map()
+        magic, num_slots, num_elements, num_tombstones, heap_end = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a DiskHashtable file")
+        self.num_buckets = num_slots
+        """Number of slots in the directory"""
+        self.mask = num_slots - 1
+        """num_buckets - 1, to pick a slot with `hash & mask`"""
+        self.num_elements = num_elements
+        """Number of elements stored in this hashtable"""
+        self.num_tombstones = num_tombstones
+        """Number of slots holding a tombstone left behind by remove()"""
+        self.heap_end = heap_end
+        """Offset just past the last record in the heap"""
+
+    def _map(self) -> None:
+        """
+        Internal helper that maps the whole of the open file, replacing any older mapping.
+        """
+        if self._mm is not None:
+            self._mm.close()
+        access = mmap.ACCESS_READ if self.readonly else mmap.ACCESS_WRITE
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=access)
+
+    def _refresh(self) -> None:
+        """
+        Internal helper for read-only tables: re-reads the counts another process may have changed
+        since this one looked, and remaps the file if the heap has grown past the mapped part.
+        """
+        _, _, self.num_elements, self.num_tombstones, self.heap_end = _HEADER.unpack_from(self._mm, 0)
+        if self.heap_end > len(self._mm):
+            self._map()
+
+    def _check_mapped(self, end: int) -> None:
+        """
+        Internal helper that makes sure the mapping reaches a record's end, remapping once if a
+        writer has appended past it.
+        :param end: The offset just past the record
+        """
+        if end > len(self._mm):
+            self._map()
+            if end > len(self._mm):
+                raise ValueError(f"{self.path} is corrupt: a record ends past the end of the file")
+
+    def close(self) -> None:
+        """
+        Flushes and unmaps the file.
+        """
+        if self._mm is not None:
+            if not self.readonly:
+                self._mm.flush()
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def flush(self) -> None:
+        """
+        Makes sure every change so far has been written to the file.
+        """
+        self._mm.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def _write_file(path: str, num_slots: int, entries) -> None:
+        """
+        Internal helper that writes a complete table file.
+        :param path: Where to write the file
+        :param num_slots: The number of directory slots (a power of two)
+        :param entries: An iterable of (key hash, encoded key, encoded value) for distinct keys
+        """
+        mask = num_slots - 1
+        directory = bytearray(num_slots * _SLOT.size)
+        heap_start = _HEADER_SIZE + len(directory)
+        offset = heap_start
+        num_elements = 0
+        with open(path, 'wb') as f:
+            f.seek(heap_start)
+            for key_hash, key_bytes, value_bytes in entries:
+                slot = key_hash & mask
+                while _SLOT.unpack_from(directory, slot * _SLOT.size)[1]:
+                    slot = (slot + 1) & mask
+                _SLOT.pack_into(directory, slot * _SLOT.size, key_hash, offset, len(key_bytes), len(value_bytes))
+                f.write(key_bytes)
+                f.write(value_bytes)
+                offset += len(key_bytes) + len(value_bytes)
+                num_elements += 1
+            f.truncate(offset)
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, num_slots, num_elements, 0, offset).ljust(_HEADER_SIZE, b'\0'))
+            f.write(directory)
+
+    def _write_header(self) -> None:
+        """
+        Internal helper that stores the current counts in the file header.
+        """
+        _HEADER.pack_into(self._mm, 0, _MAGIC, self.num_buckets, self.num_elements,
+                          self.num_tombstones, self.heap_end)
+
+    def _check_writable(self) -> None:
+        if self.readonly:
+            raise io.UnsupportedOperation(f"{self.path} was opened read-only")
+
+    def _slot(self, slot: int):
+        """
+        Internal helper to read a directory slot.
+        :return: (key hash, record offset, key length, value length)
+        """
+        return _SLOT.unpack_from(self._mm, _HEADER_SIZE + slot * _SLOT.size)
+
+    def _probe(self, key_bytes: bytes, key_hash: int):
+        """
+        Internal helper that walks the probe sequence for a key.
+        :param key_bytes: The encoded key
+        :param key_hash: self.hasher(key_bytes)
+        :return: A tuple (slot of the key or -1 if absent, first slot the key could be inserted into)
+        """
+        mm = self._mm
+        mask = self.mask
+        key_len = len(key_bytes)
+        slot = key_hash & mask
+        first_free = -1
+        while True:
+            slot_hash, offset, slot_key_len, _ = _SLOT.unpack_from(mm, _HEADER_SIZE + slot * _SLOT.size)
+            if offset == 0:
+                return -1, (slot if first_free < 0 else first_free)
+            if slot_key_len == _TOMBSTONE:
+                if first_free < 0:
+                    first_free = slot
+            elif slot_hash == key_hash and slot_key_len == key_len:
+                if offset + key_len > len(mm):
+                    self._check_mapped(offset + key_len)
+                    mm = self._mm
+                if mm[offset:offset + key_len] == key_bytes:
+                    return slot, slot
+            slot = (slot + 1) & mask
+
+    def _append(self, data: bytes) -> int:
+        """
+        Internal helper that appends a record to the heap, growing the file if needed.
+        :param data: The record
+        :return: The offset the record was written at
+        """
+        offset = self.heap_end
+        end = offset + len(data)
+        if end > len(self._mm):
+            self._mm.resize(max(end, 2 * len(self._mm)))
+        self._mm[offset:end] = data
+        self.heap_end = end
+        return offset
+
+    def put(self, key, value):
+        """
+        Put a Key/Value into the hashtable. If the key already exists, its value is replaced.
+        :param key: The key (str, bytes or int)
+        :param value: The value to store with the key
+        :return:
+        """
+        self._check_writable()
+        key_bytes = _encode_key(key)
+        key_hash = self.hasher(key_bytes)
+        value_bytes = self.serializer.dumps(value)
+        slot, free = self._probe(key_bytes, key_hash)
+        offset = self._append(key_bytes + value_bytes)
+        if slot < 0:
+            if self._slot(free)[2] == _TOMBSTONE:
+                self.num_tombstones -= 1
+            slot = free
+            self.num_elements += 1
+        _SLOT.pack_into(self._mm, _HEADER_SIZE + slot * _SLOT.size, key_hash, offset, len(key_bytes), len(value_bytes))
+        self._write_header()
+        if (self.num_elements + self.num_tombstones) / self.num_buckets >= self.alpha:
+            self.resize()
+
+    def get(self, key, default=None):
+        """
+        Given a key, return the value associated with it.
+        :param key: The key that the data is stored by.
+        :param default: What to return if the key is not in the Hashtable; defaults to None.
+        :return: The value associated with the given key.
+        """
+        if self.readonly:
+            self._refresh()
+        key_bytes = _encode_key(key)
+        slot, _ = self._probe(key_bytes, self.hasher(key_bytes))
+        if slot < 0:
+            return default
+        _, offset, key_len, value_len = self._slot(slot)
+        start = offset + key_len
+        self._check_mapped(start + value_len)
+        return self.serializer.loads(self._mm[start:start + value_len])
+
+    def remove(self, key) -> KeyValuePair:
+        """
+        Removes the data associated with the provided Key from this Hashtable.
+        :param key: The key of which data to remove.
+        :return: The KeyValuePair that was removed from this Hashtable.
+        """
+        self._check_writable()
+        key_bytes = _encode_key(key)
+        key_hash = self.hasher(key_bytes)
+        slot, _ = self._probe(key_bytes, key_hash)
+        if slot < 0:
+            raise NotImplementedError(f"Key {key} not found.")
+        _, offset, key_len, value_len = self._slot(slot)
+        start = offset + key_len
+        removed = KeyValuePair(key, self.serializer.loads(self._mm[start:start + value_len]), key_hash)
+        ## Keep the offset so the slot doesn't look empty to probes passing through it
+        _SLOT.pack_into(self._mm, _HEADER_SIZE + slot * _SLOT.size, 0, offset, _TOMBSTONE, 0)
+        self.num_elements -= 1
+        self.num_tombstones += 1
+        self._write_header()
+        self._maybe_shrink()
+        return removed
+
+    def _probe_length(self, key) -> int:
+        """
+        Internal helper used for stats: how many slots a lookup of this key has to look at.
+        :param key: The key
+        :return: The number of slots probed, up to and including the key's slot or the first empty slot
+        """
+        key_bytes = _encode_key(key)
+        key_hash = self.hasher(key_bytes)
+        home = key_hash & self.mask
+        slot, _ = self._probe(key_bytes, key_hash)
+        if slot < 0:
+            ## Walk on to the empty slot that ended the probe
+            slot = home
+            while self._slot(slot)[1]:
+                slot = (slot + 1) & self.mask
+        return ((slot - home) & self.mask) + 1
+
+    def __len__(self) -> int:
+        """
+        :return: The number of elements in this table, as of the last write to the file.
+        """
+        if self.readonly:
+            self._refresh()
+        return self.num_elements
+
+    def bucket_histogram(self) -> dict:
+        """
+        Describes how far entries sit from the slot their hash points at.
+        :return: A dict of probe length (1 means in its home slot) -> number of entries
+        """
+        histogram = Counter()
+        for slot in range(self.num_buckets):
+            key_hash, offset, key_len, _ = self._slot(slot)
+            if offset and key_len != _TOMBSTONE:
+                histogram[((slot - key_hash) & self.mask) + 1] += 1
+        return dict(sorted(histogram.items()))
+
+    def _live_slots(self):
+        """
+        Internal helper that yields (key hash, record offset, key length, value length) for every live slot.
+        """
+        if self.readonly:
+            self._refresh()
+        mm = self._mm
+        for slot in range(self.num_buckets):
+            entry = _SLOT.unpack_from(mm, _HEADER_SIZE + slot * _SLOT.size)
+            if entry[1] and entry[2] != _TOMBSTONE:
+                yield entry
+
+    def _live_entries(self):
+        """
+        Internal helper that yields (key hash, encoded key, encoded value) for every live entry.
+        """
+        for key_hash, offset, key_len, value_len in self._live_slots():
+            start = offset + key_len
+            self._check_mapped(start + value_len)
+            yield key_hash, self._mm[offset:start], self._mm[start:start + value_len]
+
+    def resize(self) -> None:
+        """
+        Rewrites the file with a bigger directory (or the same size, if the used slots were
+        mostly tombstones), dropping dead records from the heap.
+        """
+        new_num_buckets = self.num_buckets
+        if self.load_factor() >= self.alpha / self.policy.growth_factor:
+            new_num_buckets = self.policy.grown(self.num_buckets)
+        self._rehash(new_num_buckets)
+
+    def _start_resize(self, new_num_buckets: int) -> None:
+        self._rehash(new_num_buckets)
+
+    def _rehash(self, new_num_buckets: int, entries=None) -> None:
+        """
+        Internal helper that writes a fresh file next to the current one, then swaps it in.
+        Processes that still have the old file mapped keep reading the old copy.
+        :param new_num_buckets: The number of directory slots for the new file
+        :param entries: The entries to write; defaults to every live entry
+        """
+        self._check_writable()
+        if entries is None:
+            entries = self._live_entries()
+        new_path = self.path + '.rebuild'
+        self._write_file(new_path, new_num_buckets, entries)
+        self.close()
+        os.replace(new_path, self.path)
+        self._open()
+
+    def clear(self) -> None:
+        """
+        Removes everything from this Hashtable, keeping the current number of slots.
+        """
+        self._rehash(self.num_buckets, entries=())
+
+    def __iter__(self):
+        """
+        Helper function to provide easy iteration over the elements of this Hashtable.
+        :return: A generator of the KeyValuePairs in this Hashtable.
+        """
+        loads = self.serializer.loads
+        for key_hash, key_bytes, value_bytes in self._live_entries():
+            yield KeyValuePair(_decode_key(key_bytes), loads(value_bytes), key_hash)
+
+    def _iter_keys(self):
+        """Internal helper used by the keys() view; never deserializes values."""
+        for _, offset, key_len, _ in self._live_slots():
+            self._check_mapped(offset + key_len)
+            yield _decode_key(self._mm[offset:offset + key_len])
+
+    def _iter_values(self):
+        """Internal helper used by the values() view."""
+        loads = self.serializer.loads
+        return (loads(value_bytes) for _, _, value_bytes in self._live_entries())
+
+    def _iter_items(self):
+        """Internal helper used by the items() view."""
+        loads = self.serializer.loads
+        return ((_decode_key(key_bytes), loads(value_bytes)) for _, key_bytes, value_bytes in self._live_entries())
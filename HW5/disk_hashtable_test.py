@@ -0,0 +1,158 @@
+import io
+import os
+
+import pytest
+
+from disk_hashtable import DiskHashtable, stable_hash
+from hashers import XXHasher
+
+
+class TestDiskHashtable:
+
+    def test_create(self, tmp_path):
+        path = str(tmp_path / "table.ht")
+        with DiskHashtable(path, num_buckets=10) as hashtable:
+            assert hashtable.num_buckets == 16  ## Rounded up to a power of two
+            assert hashtable.num_elements == 0
+        assert os.path.exists(path)
+
+    def test_put_get(self, tmp_path):
+        with DiskHashtable(str(tmp_path / "table.ht")) as hashtable:
+            hashtable.put("2004-04", ["Float On", "Ocean Breathes Salty"])
+            hashtable.put(1, "one")
+            hashtable.put(b"raw", {"nested": (1, 2)})
+            assert hashtable.get("2004-04") == ["Float On", "Ocean Breathes Salty"]
+            assert hashtable.get(1) == "one"
+            assert hashtable.get("1") is None  ## Keys of different types stay distinct
+            assert hashtable.get(b"raw") == {"nested": (1, 2)}
+            assert len(hashtable) == 3
+
+    def test_put_existing_key_overwrites(self, tmp_path):
+        with DiskHashtable(str(tmp_path / "table.ht")) as hashtable:
+            hashtable.put("key", "a")
+            hashtable.put("key", "b")
+            assert hashtable.get("key") == "b"
+            assert hashtable.num_elements == 1
+
+    def test_reopen(self, tmp_path):
+        path = str(tmp_path / "table.ht")
+        with DiskHashtable(path) as hashtable:
+            for i in range(500):
+                hashtable.put(f"key{i}", i)
+            hashtable.remove("key7")
+
+        with DiskHashtable(path, readonly=True) as hashtable:
+            assert len(hashtable) == 499
+            assert hashtable.get("key7") is None
+            for i in range(500):
+                if i != 7:
+                    assert hashtable.get(f"key{i}") == i
+
+    def test_readonly(self, tmp_path):
+        path = str(tmp_path / "table.ht")
+        with pytest.raises(FileNotFoundError):
+            DiskHashtable(path, readonly=True)
+        DiskHashtable(path).close()
+        with DiskHashtable(path, readonly=True) as hashtable:
+            with pytest.raises(io.UnsupportedOperation):
+                hashtable.put("key", "value")
+
+    def test_reader_while_writing(self, tmp_path):
+        path = str(tmp_path / "table.ht")
+        with DiskHashtable(path) as writer:
+            writer["a"] = "old"
+            with DiskHashtable(path, readonly=True) as reader:
+                assert reader.get("a") == "old"
+                ## Records appended past the end of the reader's mapping
+                writer["a"] = "new" * 10000
+                writer["b"] = "bee"
+                assert reader.get("a") == "new" * 10000
+                assert reader.get("b") == "bee"
+                assert len(reader) == 2
+                writer["a"] = "short"
+                del writer["b"]
+                assert reader.get("a") == "short"
+                assert "b" not in reader
+                assert sorted(reader.items()) == [("a", "short")]
+                assert list(reader.keys()) == ["a"]
+                assert len(reader) == len(reader.keys()) == 1
+
+    def test_not_a_table(self, tmp_path):
+        path = tmp_path / "other.txt"
+        path.write_bytes(b"x" * 100)
+        with pytest.raises(ValueError):
+            DiskHashtable(str(path))
+
+    def test_remove(self, tmp_path):
+        with DiskHashtable(str(tmp_path / "table.ht"), num_buckets=8) as hashtable:
+            hashtable.put("a", 1)
+            hashtable.put("b", 2)
+            removed_kvp = hashtable.remove("a")
+            assert removed_kvp.key == "a"
+            assert removed_kvp.value == 1
+            assert hashtable.num_tombstones == 1
+            assert "a" not in hashtable
+            assert hashtable.get("b") == 2
+            with pytest.raises(NotImplementedError):
+                hashtable.remove("a")
+
+    def test_resize(self, tmp_path):
+        with DiskHashtable(str(tmp_path / "table.ht"), num_buckets=8) as hashtable:
+            for i in range(1000):
+                hashtable.put(i, str(i))
+            assert hashtable.num_buckets >= 1000 / hashtable.alpha
+            assert hashtable.num_tombstones == 0
+            for i in range(1000):
+                assert hashtable.get(i) == str(i)
+
+    def test_compact_drops_dead_records(self, tmp_path):
+        path = str(tmp_path / "table.ht")
+        with DiskHashtable(path, num_buckets=2048) as hashtable:
+            for i in range(1000):
+                hashtable.put(i, "x" * 100)
+            for i in range(990):
+                hashtable.remove(i)
+            hashtable.flush()
+            size_before = os.path.getsize(path)
+            hashtable.compact()
+            assert os.path.getsize(path) < size_before / 10
+            assert sorted(hashtable.keys()) == list(range(990, 1000))
+
+    def test_iteration_and_views(self, tmp_path):
+        with DiskHashtable(str(tmp_path / "table.ht")) as hashtable:
+            hashtable.update({"a": 1, "b": 2, "c": 3})
+            assert sorted(item.key for item in hashtable) == ["a", "b", "c"]
+            assert sorted(hashtable.keys()) == ["a", "b", "c"]
+            assert sorted(hashtable.values()) == [1, 2, 3]
+            assert sorted(hashtable.items()) == [("a", 1), ("b", 2), ("c", 3)]
+            hashtable.clear()
+            assert len(hashtable) == 0
+            assert list(hashtable.keys()) == []
+
+    def test_stable_hash(self):
+        assert stable_hash(b"s2004-04") == stable_hash(b"s2004-04")
+        assert stable_hash(b"s2004-04") != stable_hash(b"s2004-05")
+        assert 0 <= stable_hash(b"") < 2 ** 64
+
+    def test_stats(self, tmp_path):
+        with DiskHashtable(str(tmp_path / "table.ht")) as hashtable:
+            stats = hashtable.enable_stats()
+            for i in range(1000):
+                hashtable.put(i, i)
+            assert hashtable.get(5) == 5
+            assert hashtable.get("missing") is None
+            report = stats.as_dict()
+            assert report['hits'] == 1
+            assert report['misses'] == 1
+            assert report['resizes'] == 1
+            assert sum(hashtable.bucket_histogram().values()) == 1000
+
+    def test_custom_hasher(self, tmp_path):
+        path = str(tmp_path / "table.ht")
+        hasher = XXHasher(seed=7)
+        with DiskHashtable(path, hasher=hasher) as hashtable:
+            for i in range(100):
+                hashtable.put(f"key{i}", i)
+            assert hashtable._slot(hashtable._probe(b"skey5", hasher(b"skey5"))[0])[0] == hasher(b"skey5")
+        with DiskHashtable(path, readonly=True, hasher=hasher) as hashtable:
+            assert [hashtable.get(f"key{i}") for i in range(100)] == list(range(100))
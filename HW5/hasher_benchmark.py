@@ -0,0 +1,144 @@
+"""
+Benchmarks for hashers.py: how evenly each hash function spreads MusicIndex-shaped keys over
+the buckets of a Hashtable, and how fast it is.
+
+For each hasher, key set and bucket count this reports the chi-square statistic of the bucket
+counts against a uniform spread (about equal to the number of buckets when the spread is as
+good as random), the longest chain, the fraction of empty buckets compared to what a random
+spread would leave empty, and hashes per second.
+
+Examples:
+    python hasher_benchmark.py
+    python hasher_benchmark.py --buckets 9 81 729 1024 --json hashers.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from collections import Counter
+
+from disk_hashtable import stable_hash
+from hashers import FNV1aHasher, SipHasher, XXHasher, key_to_bytes
+
+HASHERS = {
+    'builtin hash': hash,
+    'FNV1aHasher': FNV1aHasher(seed=0x5eed),
+    'SipHasher': SipHasher(seed=0x5eed),
+    'XXHasher': XXHasher(seed=0x5eed),
+    'stable_hash (blake2b)': lambda key: stable_hash(key_to_bytes(key)),
+}
+"""Name -> hash function for every hasher being compared"""
+
+
+def make_keys(shape: str) -> list:
+    """
+    Creates keys shaped like the ones a MusicIndex (or an index built on top of it) uses.
+    :param shape: 'date' for every "YYYY-MM" release date from 1900 to 2025,
+        'artist' for artist-name-like strings, or 'album' for "artist/album" paths
+    :return: A list of distinct keys
+    """
+    if shape == 'date':
+        return [f"{year:04d}-{month:02d}" for year in range(1900, 2026) for month in range(1, 13)]
+    if shape == 'artist':
+        return [f"The Band {i}" for i in range(2000)]
+    if shape == 'album':
+        return [f"The Band {i % 200}/Album {i // 200:02d}" for i in range(4000)]
+    raise ValueError(f"Unknown key shape: {shape}")
+
+
+def distribution(hasher, keys: list, num_buckets: int, use_mask: bool) -> dict:
+    """
+    Measures how evenly a hasher spreads keys over buckets.
+    :param hasher: The hash function
+    :param keys: The keys to spread
+    :param num_buckets: The number of buckets
+    :param use_mask: Pick buckets with `hash & (num_buckets - 1)` instead of `hash % num_buckets`
+        (num_buckets must be a power of two)
+    :return: The measurements, as a dict
+    """
+    if use_mask:
+        mask = num_buckets - 1
+        counts = Counter(hasher(key) & mask for key in keys)
+    else:
+        counts = Counter(hasher(key) % num_buckets for key in keys)
+    expected = len(keys) / num_buckets
+    chi_square = sum((counts.get(bucket, 0) - expected) ** 2 / expected for bucket in range(num_buckets))
+    empty = num_buckets - len(counts)
+    return {
+        'chi_square': chi_square,
+        'max_chain': max(counts.values()),
+        'empty_fraction': empty / num_buckets,
+        ## A random spread leaves (1 - 1/m)^n of the buckets empty
+        'expected_empty_fraction': (1 - 1 / num_buckets) ** len(keys),
+    }
+
+
+def throughput(hasher, keys: list, min_seconds: float = 0.2) -> float:
+    """
+    :return: How many keys per second the hasher hashes
+    """
+    clock = time.perf_counter
+    hashed = 0
+    start = clock()
+    while True:
+        for key in keys:
+            hasher(key)
+        hashed += len(keys)
+        elapsed = clock() - start
+        if elapsed >= min_seconds:
+            return hashed / elapsed
+
+
+def run(hashers, shapes, bucket_counts) -> list:
+    """
+    Runs the whole benchmark matrix.
+    :return: A list of result dicts, one per case
+    """
+    results = []
+    for shape in shapes:
+        keys = make_keys(shape)
+        for name in hashers:
+            hasher = HASHERS[name]
+            speed = throughput(hasher, keys)
+            for num_buckets in bucket_counts:
+                use_mask = num_buckets & (num_buckets - 1) == 0
+                result = distribution(hasher, keys, num_buckets, use_mask)
+                result.update(hasher=name, key_shape=shape, num_keys=len(keys), num_buckets=num_buckets,
+                              indexing='mask' if use_mask else 'mod', hashes_per_sec=speed)
+                results.append(result)
+                print(format_result(result), file=sys.stderr)
+    return results
+
+
+def format_result(result: dict) -> str:
+    """
+    :return: A one-line, human-readable summary of a result
+    """
+    return (f"{result['hasher']:<22} {result['key_shape']:<6} n={result['num_keys']:<5} "
+            f"buckets={result['num_buckets']:<5} {result['indexing']:<4} "
+            f"chi2 {result['chi_square']:>10.1f}  max chain {result['max_chain']:>5}  "
+            f"empty {result['empty_fraction']:6.1%} (random {result['expected_empty_fraction']:6.1%})  "
+            f"{result['hashes_per_sec']:>12,.0f} hashes/s")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hashers', nargs='+', default=list(HASHERS), choices=list(HASHERS))
+    parser.add_argument('--shapes', nargs='+', default=['date', 'artist', 'album'],
+                        choices=['date', 'artist', 'album'])
+    parser.add_argument('--buckets', type=int, nargs='+', default=[9, 81, 1024],
+                        help="Bucket counts to try; powers of two are indexed with a mask, the rest with %%")
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.hashers, args.shapes, args.buckets)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+Seedable hash functions that can be plugged into a Hashtable instead of the builtin hash().
+
+Unlike hash() on a str, these give the same result in every process (for the same seed), so
+table layouts are reproducible, and choosing a secret seed makes it hard for anyone who
+controls the keys to force them all into one bucket.
+
+Every hasher is called as hasher(key) and returns an unsigned 64-bit int. Keys may be str,
+bytes, int, float, or tuples of those. Keys that compare equal (such as 1, 1.0 and True)
+hash the same, as a Hashtable needs.
+"""
+import struct
+
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
+def key_to_bytes(key) -> bytes:
+    """
+    Turns a key into the bytes that get hashed.
+    :param key: A str, bytes, int, float, or a tuple of those
+    :return: The bytes for the key
+    """
+    if isinstance(key, str):
+        return key.encode('utf-8')
+    if isinstance(key, (bytes, bytearray, memoryview)):
+        return bytes(key)
+    if isinstance(key, float) and key.is_integer():
+        key = int(key)  ## 2.0 == 2, so it has to hash like 2
+    if isinstance(key, int):
+        return key.to_bytes((key.bit_length() + 8) // 8, 'little', signed=True)
+    if isinstance(key, float):
+        return struct.pack('<d', key)
+    if isinstance(key, tuple):
+        parts = [key_to_bytes(part) for part in key]
+        return b''.join(len(part).to_bytes(4, 'little') + part for part in parts)
+    raise TypeError(f"Can't hash keys of type {type(key).__name__}")
+
+
+def _rotl(value: int, bits: int) -> int:
+    return ((value << bits) | (value >> (64 - bits))) & _MASK64
+
+
+class FNV1aHasher:
+    """
+    64-bit FNV-1a. Very simple, and fast for the short keys a MusicIndex uses.
+    """
+
+    _OFFSET_BASIS = 0xCBF29CE484222325
+    _PRIME = 0x100000001B3
+
+    def __init__(self, seed: int = 0):
+        """
+        :param seed: Mixed into the starting state; 0 gives standard FNV-1a.
+        """
+        self.seed = seed
+        self._start = (self._OFFSET_BASIS ^ seed) & _MASK64
+
+    def __call__(self, key) -> int:
+        value = self._start
+        prime = self._PRIME
+        for byte in key_to_bytes(key):
+            value = ((value ^ byte) * prime) & _MASK64
+        return value
+
+    def __repr__(self):
+        return f"FNV1aHasher(seed={self.seed})"
+
+
+class SipHasher:
+    """
+    SipHash-2-4, a keyed hash designed to resist collision attacks (CPython uses a variant for str).
+    """
+
+    def __init__(self, seed=0):
+        """
+        :param seed: The 128-bit key, as an int or as 16 bytes.
+        """
+        self.seed = seed
+        if isinstance(seed, (bytes, bytearray)):
+            if len(seed) != 16:
+                raise ValueError("A SipHash key must be 16 bytes")
+            seed = int.from_bytes(seed, 'little')
+        self._k0 = seed & _MASK64
+        self._k1 = (seed >> 64) & _MASK64
+
+    def __call__(self, key) -> int:
+        data = key_to_bytes(key)
+        k0, k1 = self._k0, self._k1
+        v0 = k0 ^ 0x736F6D6570736575
+        v1 = k1 ^ 0x646F72616E646F6D
+        v2 = k0 ^ 0x6C7967656E657261
+        v3 = k1 ^ 0x7465646279746573
+
+        def sip_round(v0, v1, v2, v3):
+            v0 = (v0 + v1) & _MASK64
+            v1 = _rotl(v1, 13) ^ v0
+            v0 = _rotl(v0, 32)
+            v2 = (v2 + v3) & _MASK64
+            v3 = _rotl(v3, 16) ^ v2
+            v0 = (v0 + v3) & _MASK64
+            v3 = _rotl(v3, 21) ^ v0
+            v2 = (v2 + v1) & _MASK64
+            v1 = _rotl(v1, 17) ^ v2
+            v2 = _rotl(v2, 32)
+            return v0, v1, v2, v3
+
+        full = len(data) - len(data) % 8
+        for start in range(0, full, 8):
+            word = int.from_bytes(data[start:start + 8], 'little')
+            v3 ^= word
+            v0, v1, v2, v3 = sip_round(*sip_round(v0, v1, v2, v3))
+            v0 ^= word
+        word = ((len(data) & 0xFF) << 56) | int.from_bytes(data[full:], 'little')
+        v3 ^= word
+        v0, v1, v2, v3 = sip_round(*sip_round(v0, v1, v2, v3))
+        v0 ^= word
+        v2 ^= 0xFF
+        for _ in range(4):
+            v0, v1, v2, v3 = sip_round(v0, v1, v2, v3)
+        return v0 ^ v1 ^ v2 ^ v3
+
+    def __repr__(self):
+        return f"SipHasher(seed={self.seed!r})"
+
+
+class XXHasher:
+    """
+    xxHash64: a fast non-cryptographic hash with very good bit mixing.
+    """
+
+    _P1 = 0x9E3779B185EBCA87
+    _P2 = 0xC2B2AE3D27D4EB4F
+    _P3 = 0x165667B19E3779F9
+    _P4 = 0x85EBCA77C2B2AE63
+    _P5 = 0x27D4EB2F165667C5
+
+    def __init__(self, seed: int = 0):
+        """
+        :param seed: The xxHash64 seed.
+        """
+        self.seed = seed & _MASK64
+
+    @classmethod
+    def _round(cls, acc: int, lane: int) -> int:
+        acc = (acc + lane * cls._P2) & _MASK64
+        return (_rotl(acc, 31) * cls._P1) & _MASK64
+
+    @classmethod
+    def _merge(cls, acc: int, value: int) -> int:
+        acc ^= cls._round(0, value)
+        return (acc * cls._P1 + cls._P4) & _MASK64
+
+    def __call__(self, key) -> int:
+        data = key_to_bytes(key)
+        P1, P2, P3, P4, P5 = self._P1, self._P2, self._P3, self._P4, self._P5
+        seed = self.seed
+        length = len(data)
+        position = 0
+        if length >= 32:
+            v1 = (seed + P1 + P2) & _MASK64
+            v2 = (seed + P2) & _MASK64
+            v3 = seed
+            v4 = (seed - P1) & _MASK64
+            while position + 32 <= length:
+                v1 = self._round(v1, int.from_bytes(data[position:position + 8], 'little'))
+                v2 = self._round(v2, int.from_bytes(data[position + 8:position + 16], 'little'))
+                v3 = self._round(v3, int.from_bytes(data[position + 16:position + 24], 'little'))
+                v4 = self._round(v4, int.from_bytes(data[position + 24:position + 32], 'little'))
+                position += 32
+            value = (_rotl(v1, 1) + _rotl(v2, 7) + _rotl(v3, 12) + _rotl(v4, 18)) & _MASK64
+            for lane in (v1, v2, v3, v4):
+                value = self._merge(value, lane)
+        else:
+            value = (seed + P5) & _MASK64
+        value = (value + length) & _MASK64
+
+        while position + 8 <= length:
+            value ^= self._round(0, int.from_bytes(data[position:position + 8], 'little'))
+            value = (_rotl(value, 27) * P1 + P4) & _MASK64
+            position += 8
+        if position + 4 <= length:
+            value ^= (int.from_bytes(data[position:position + 4], 'little') * P1) & _MASK64
+            value = (_rotl(value, 23) * P2 + P3) & _MASK64
+            position += 4
+        while position < length:
+            value ^= (data[position] * P5) & _MASK64
+            value = (_rotl(value, 11) * P1) & _MASK64
+            position += 1
+
+        value ^= value >> 33
+        value = (value * P2) & _MASK64
+        value ^= value >> 29
+        value = (value * P3) & _MASK64
+        value ^= value >> 32
+        return value
+
+    def __repr__(self):
+        return f"XXHasher(seed={self.seed})"
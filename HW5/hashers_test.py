@@ -0,0 +1,95 @@
+import pytest
+
+from hashers import *
+from hashtable import ConcurrentHashtable, Hashtable, OpenAddressingHashtable
+
+HASHERS = [FNV1aHasher(), FNV1aHasher(seed=12345), SipHasher(), SipHasher(seed=bytes(range(16))),
+           XXHasher(), XXHasher(seed=2025)]
+
+
+class TestKeyToBytes:
+
+    def test_equal_keys_give_equal_bytes(self):
+        assert key_to_bytes(1) == key_to_bytes(1.0) == key_to_bytes(True)
+        assert key_to_bytes(-300) == key_to_bytes(-300.0)
+
+    def test_distinct_keys_give_distinct_bytes(self):
+        assert key_to_bytes(0.5) != key_to_bytes(0)
+        assert key_to_bytes(255) != key_to_bytes(-1)
+        assert key_to_bytes(("ab", "c")) != key_to_bytes(("a", "bc"))
+
+    def test_unsupported_type(self):
+        with pytest.raises(TypeError):
+            key_to_bytes(object())
+
+
+class TestHashers:
+
+    def test_fnv1a_vectors(self):
+        assert FNV1aHasher()(b"") == 0xcbf29ce484222325
+        assert FNV1aHasher()(b"a") == 0xaf63dc4c8601ec8c
+        assert FNV1aHasher()("a") == FNV1aHasher()(b"a")
+
+    def test_siphash_vectors(self):
+        ## From the reference implementation's test vectors (key 00 01 .. 0f)
+        hasher = SipHasher(seed=bytes(range(16)))
+        assert hasher(b"") == 0x726fdb47dd0e0e31
+        assert hasher(bytes(range(15))) == 0xa129ca6149be45e5
+        with pytest.raises(ValueError):
+            SipHasher(seed=b"too short")
+
+    def test_xxhash_vectors(self):
+        assert XXHasher()(b"") == 0xef46db3751d8e999
+        assert XXHasher()(b"abc") == 0x44bc2cf5ad770999
+
+    @pytest.mark.parametrize("hasher", HASHERS, ids=repr)
+    def test_deterministic_and_64_bit(self, hasher):
+        for key in ["2004-04", "", b"raw", 0, -7, 2 ** 100, 3.25, ("Modest Mouse", "2004-04"), "x" * 100]:
+            value = hasher(key)
+            assert value == hasher(key)
+            assert 0 <= value < 2 ** 64
+        assert hasher(1) == hasher(1.0) == hasher(True)
+
+    @pytest.mark.parametrize("hasher_type", [FNV1aHasher, SipHasher, XXHasher])
+    def test_seed_changes_hash(self, hasher_type):
+        assert hasher_type(seed=1)("2004-04") != hasher_type(seed=2)("2004-04")
+        assert hasher_type(seed=1)("2004-04") == hasher_type(seed=1)("2004-04")
+
+    @pytest.mark.parametrize("hasher", HASHERS, ids=repr)
+    def test_few_collisions(self, hasher):
+        keys = [f"{year}-{month:02d}" for year in range(1900, 2026) for month in range(1, 13)]
+        assert len({hasher(key) for key in keys}) == len(keys)
+
+
+class TestHashtableWithHasher:
+
+    @pytest.mark.parametrize("hasher", HASHERS, ids=repr)
+    @pytest.mark.parametrize("table_type", [Hashtable, OpenAddressingHashtable, ConcurrentHashtable])
+    def test_operations(self, table_type, hasher):
+        hashtable = table_type(hasher=hasher)
+        assert hashtable.hasher is hasher
+        for i in range(200):
+            hashtable.put(f"key{i}", i)
+        for i in range(200):
+            assert hashtable.get(f"key{i}") == i
+        assert hashtable.remove("key7").value == 7
+        assert "key7" not in hashtable
+        assert len(hashtable) == 199
+
+    def test_buckets_follow_hasher(self):
+        hasher = FNV1aHasher(seed=99)
+        hashtable = Hashtable(9, hasher=hasher)
+        hashtable.put("2004-04", "Good News for People Who Love Bad News")
+        assert hashtable.buckets[hasher("2004-04") % 9][0].key == "2004-04"
+
+    def test_layout_is_reproducible(self):
+        first, second = Hashtable(hasher=XXHasher(seed=5)), Hashtable(hasher=XXHasher(seed=5))
+        for hashtable in (first, second):
+            for year in range(1990, 2010):
+                hashtable.put(f"{year}-01", year)
+        assert [[kvp.key for kvp in bucket] for bucket in first.buckets] == \
+               [[kvp.key for kvp in bucket] for bucket in second.buckets]
+
+    def test_default_is_builtin_hash(self):
+        assert Hashtable().hasher is hash
+        assert OpenAddressingHashtable().hasher is hash
@@ -1,91 +1,518 @@
 """
 Hashtable and supporting classes.
 """
+from collections import Counter
+from collections.abc import ItemsView, KeysView, Mapping, ValuesView
+from contextlib import contextmanager
+from itertools import chain
+from math import ceil
+from operator import length_hint
+from threading import Lock, RLock
+from time import perf_counter
+
+_MISSING = object()
+"""Default passed to Hashtable.get() to tell a missing key apart from a stored None."""
 
 
 class KeyValuePair:
     """
     A data class holding a key and a value, to be used with a Hashtable.
+    The hash of the key is cached alongside it, so the key never has to be hashed again.
+    There is one of these per entry, so it uses __slots__ instead of a per-instance __dict__.
     """
 
-    def __init__(self, key: str, value):
+    __slots__ = ('key', 'value', 'hash')
+
+    def __init__(self, key: str, value, key_hash: int = None):
         self.key = key
         self.value = value
+        self.hash = hash(key) if key_hash is None else key_hash
+
+
+def _next_power_of_two(n: int) -> int:
+    """
+    Internal helper to round a requested size up to a power of two.
+    :param n: The requested size
+    :return: The smallest power of two that is >= n (and at least 1)
+    """
+    size = 1
+    while size < n:
+        size <<= 1
+    return size
+
+
+class GrowthPolicy:
+    """
+    Describes when a Hashtable grows or shrinks, and what its bucket counts look like.
+    """
+
+    def __init__(self, max_load_factor=3, growth_factor=9, shrink_load_factor=None,
+                 power_of_two=False, min_buckets=1):
+        """
+        Create a new growth policy. The defaults match the original Hashtable behaviour.
+        :param max_load_factor: Grow once the load factor reaches this value (the table's alpha).
+        :param growth_factor: Multiply the number of buckets by this much when growing.
+        :param shrink_load_factor: Shrink once a remove() drops the load factor below this value;
+            None (the default) never shrinks automatically.
+        :param power_of_two: Round every bucket count up to a power of two, so the bucket index
+            can be found with a mask instead of %.
+        :param min_buckets: Never use fewer buckets than this.
+        """
+        if growth_factor <= 1:
+            raise ValueError(f"growth_factor must be bigger than 1, got {growth_factor}")
+        if min_buckets < 1:
+            raise ValueError(f"min_buckets must be at least 1, got {min_buckets}")
+        if shrink_load_factor is not None and shrink_load_factor >= max_load_factor / growth_factor:
+            raise ValueError("shrink_load_factor must be below max_load_factor / growth_factor, "
+                             "or the table would resize back and forth")
+        self.max_load_factor = max_load_factor
+        """Grow once the load factor reaches this value"""
+        self.growth_factor = growth_factor
+        """How much the number of buckets is multiplied by when growing"""
+        self.shrink_load_factor = shrink_load_factor
+        """Shrink once the load factor drops below this value; None to never shrink"""
+        self.power_of_two = power_of_two
+        """Whether bucket counts are always powers of two"""
+        self.min_buckets = min_buckets
+        """The smallest number of buckets a table may have"""
+
+    def rounded(self, num_buckets: int) -> int:
+        """
+        Adjusts a requested number of buckets to one this policy allows.
+        :param num_buckets: The requested number of buckets
+        :return: The number of buckets to actually use
+        """
+        num_buckets = max(num_buckets, self.min_buckets)
+        if self.power_of_two:
+            num_buckets = _next_power_of_two(num_buckets)
+        return num_buckets
+
+    def grown(self, num_buckets: int) -> int:
+        """
+        :param num_buckets: The current number of buckets
+        :return: The number of buckets to grow to
+        """
+        return self.rounded(max(int(num_buckets * self.growth_factor), num_buckets + 1))
+
+    def buckets_for(self, num_elements: int) -> int:
+        """
+        Calculates a snug number of buckets for a given number of elements: the load factor
+        ends up where it would be right after growing, so neither a grow nor a shrink is due.
+        :param num_elements: The number of elements to hold
+        :return: The number of buckets to use
+        """
+        return self.rounded(ceil(num_elements * self.growth_factor / self.max_load_factor))
+
+    def buckets_to_fit(self, num_elements: int) -> int:
+        """
+        Calculates the fewest buckets that can hold a given number of elements without growing.
+        :param num_elements: The number of elements to hold
+        :return: The number of buckets to use
+        """
+        return self.rounded(int(num_elements / self.max_load_factor) + 1)
+
+    def mask(self, num_buckets: int) -> int:
+        """
+        :param num_buckets: A number of buckets chosen by this policy
+        :return: The mask to find a bucket index with, or 0 if % has to be used instead
+        """
+        return num_buckets - 1 if self.power_of_two else 0
+
+
+class HashtableStats:
+    """
+    Telemetry collected by a Hashtable after enable_stats(): operation counts and timings,
+    lookup hits and misses, a histogram of probe lengths (how many entries each operation had
+    to look at), and how many resizes happened and how long they took.
+    """
+
+    def __init__(self):
+        self.operations = Counter()
+        """Number of calls per operation ('get', 'put', 'remove')"""
+        self.operation_seconds = Counter()
+        """Total time spent per operation"""
+        self.hits = 0
+        """Number of get/remove calls that found their key"""
+        self.misses = 0
+        """Number of get/remove calls that didn't find their key"""
+        self.probe_lengths = Counter()
+        """Probe length -> number of operations that had that probe length"""
+        self.resizes = 0
+        """Number of resizes (including compact/reserve rebuilds and incremental resize starts)"""
+        self.resize_seconds = 0.0
+        """Total time spent resizing"""
+        self.hooks = []
+        """Callbacks called as hook(operation, key, seconds) after every operation"""
+        self._in_resize = False
+
+    def add_hook(self, hook) -> None:
+        """
+        Registers a callback to be called after every get/put/remove.
+        :param hook: A function taking (operation name, key, elapsed seconds)
+        """
+        self.hooks.append(hook)
+
+    def record(self, operation: str, key, seconds: float, probe_length: int, hit: bool = None) -> None:
+        """
+        Records one operation.
+        :param operation: 'get', 'put' or 'remove'
+        :param key: The key the operation was about
+        :param seconds: How long the operation took
+        :param probe_length: How many entries the operation had to look at
+        :param hit: Whether a lookup found its key; None for operations that aren't lookups
+        """
+        self.operations[operation] += 1
+        self.operation_seconds[operation] += seconds
+        self.probe_lengths[probe_length] += 1
+        if hit is not None:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        for hook in self.hooks:
+            hook(operation, key, seconds)
+
+    def as_dict(self) -> dict:
+        """
+        :return: Everything collected so far, as plain dicts and numbers
+        """
+        return {
+            'operations': dict(self.operations),
+            'operation_seconds': dict(self.operation_seconds),
+            'hits': self.hits,
+            'misses': self.misses,
+            'probe_lengths': dict(sorted(self.probe_lengths.items())),
+            'resizes': self.resizes,
+            'resize_seconds': self.resize_seconds,
+        }
+
+    def _wrap_lookup(self, hashtable, method):
+        """
+        Internal helper that wraps a table's get() to record it.
+        """
+        def get(key, default=None):
+            start = perf_counter()
+            value = method(key, _MISSING)
+            seconds = perf_counter() - start
+            hit = value is not _MISSING
+            self.record('get', key, seconds, hashtable._probe_length(key), hit)
+            return value if hit else default
+        return get
+
+    def _wrap_put(self, hashtable, method):
+        """
+        Internal helper that wraps a table's put() to record it.
+        """
+        def put(key, value):
+            start = perf_counter()
+            method(key, value)
+            seconds = perf_counter() - start
+            self.record('put', key, seconds, hashtable._probe_length(key))
+        return put
+
+    def _wrap_remove(self, hashtable, method):
+        """
+        Internal helper that wraps a table's remove() to record it.
+        """
+        def remove(key):
+            probe_length = hashtable._probe_length(key)
+            start = perf_counter()
+            try:
+                removed = method(key)
+            except NotImplementedError:
+                self.record('remove', key, perf_counter() - start, probe_length, False)
+                raise
+            self.record('remove', key, perf_counter() - start, probe_length, True)
+            return removed
+        return remove
+
+    def _wrap_resize(self, method):
+        """
+        Internal helper that wraps a table's resizing helpers, counting nested calls once.
+        """
+        def resize(*args, **kwargs):
+            if self._in_resize:
+                return method(*args, **kwargs)
+            self._in_resize = True
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.resizes += 1
+                self.resize_seconds += perf_counter() - start
+                self._in_resize = False
+        return resize
 
 
 class Hashtable:
     """
     A Hashtable implementation, storing key/value pairs efficiently.
+    It has dict's methods (table[key], `key in table`, len(table), update(), pop(), ...), but it is
+    not a collections.abc.Mapping: iterating over the table itself gives KeyValuePairs, not keys.
+    Use keys() to iterate over just the keys, or items() for (key, value) pairs.
     """
 
-    def __init__(self, num_buckets=9):
+    def __init__(self, num_buckets=9, incremental_resize=False, migration_step=4, policy: GrowthPolicy = None,
+                 hasher=None):
         """
         Create a new instance of a hashtable.
         :param num_buckets: The number of buckets to start with; defaults to 9.
+        :param incremental_resize: If True, a resize keeps the old buckets around and moves them over
+            a few at a time on each put/remove, instead of all at once; defaults to False.
+        :param migration_step: How many old buckets to move per operation while an incremental resize is running.
+        :param policy: The GrowthPolicy deciding when and how to resize; defaults to growing 9x at a load factor of 3.
+        :param hasher: A function turning a key into an int, such as one from hashers.py; defaults to hash().
         """
-        self.alpha = 3  ## A decent alpha for a chaining hashtable
+        self.hasher = hash if hasher is None else hasher
+        """Turns a key into the int that picks its bucket"""
+        self.policy = policy if policy is not None else GrowthPolicy()
+        """Decides when and how this hashtable grows or shrinks"""
+        self.alpha = self.policy.max_load_factor  ## 3 is a decent alpha for a chaining hashtable
         """This is a 'target' value-- if the load factor ever gets bigger than this, resize. """
-        self.num_buckets = num_buckets
+        self.num_buckets = self.policy.rounded(num_buckets)
         """Number of buckets ('chains') in this hashtable """
+        self.mask = self.policy.mask(self.num_buckets)
+        """num_buckets - 1 when the policy uses powers of two (so `hash & mask` picks a bucket); 0 otherwise"""
         self.num_elements = 0
         """Number of elements stored in this hashtable"""
         self.buckets = [[] for _ in range(self.num_buckets)]  ## List of lists
         """The buckets that store the data"""
-        pass
+        self.incremental_resize = incremental_resize
+        """Whether resizes are spread out over later operations"""
+        self.migration_step = migration_step
+        """Number of old buckets moved per operation during an incremental resize"""
+        self.old_buckets = None
+        """The buckets being migrated away from during an incremental resize; None otherwise"""
+        self.migration_index = 0
+        """Index of the next old bucket to migrate"""
+        self.stats = None
+        """The HashtableStats being collected, or None (the default) if stats are off"""
 
     def put(self, key: str, value):
         """
-        Put a Key/Value into the hashtable.
+        Put a Key/Value into the hashtable. If the key already exists, its value is replaced.
         :param key: The key
         :param value: The value to store with the key
         :return:
         """
         ## Use the Key to determine which bucket the data goes into, but store the data as a KeyValuePair.
-        target_bucket = hash(key) % self.num_buckets
-        #bucket = self.buckets[target_bucket]
+        key_hash = self.hasher(key)
+        if self.old_buckets is not None:
+            self._migrate(key_hash)
+        target_bucket = key_hash & self.mask if self.mask else key_hash % self.num_buckets
+        bucket = self.buckets[target_bucket]
+        if bucket is None:
+            ## Buckets of an incrementally-resized table are only allocated once used
+            bucket = self.buckets[target_bucket] = []
+        # If the key already exists, just update its value
+        for kvp in bucket:
+            if kvp.hash == key_hash and kvp.key == key:
+                kvp.value = value
+                return
         # If the key doesn't exist, add a new KeyValuePair
-        self.buckets[target_bucket].append(KeyValuePair(key,value))
+        bucket.append(KeyValuePair(key, value, key_hash))
         self.num_elements += 1  # Increment the element count
         # Check if resizing is needed based on the load factor
         if self.load_factor() >= self.alpha:  # Ensure parentheses are used
             self.resize()
             
         
-    def get(self, key: str):
+    def get(self, key: str, default=None):
         """
         Given a key, return the value associated with it.
-        If the key is not in the Hashtable, raise a KeyError.
+        If the key is not in the Hashtable, return the default.
         :param key: The key that the data is stored by.
+        :param default: What to return if the key is not in the Hashtable; defaults to None.
         :return: The value associated with the given key.
         """
         ## Note: A KeyValuePair is stored in the Hashtable, but only return the *value*, not the KeyValuePair.
-        target_bucket = hash(key) % self.num_buckets
-        #bucket = self.buckets[target_bucket]
-        
-        #print(f"Looking for key: {key} in bucket {target_bucket}. Current bucket contents: {bucket}")
-        # Check if the key already exists in the bucket
-        for kvp in self.buckets[target_bucket]:
-            if kvp.key == key:
+        key_hash = self.hasher(key)
+        ## Same as self._bucket_for(key_hash), inlined because this is the hot path
+        bucket = None
+        if self.old_buckets is not None:
+            bucket = self.old_buckets[key_hash % len(self.old_buckets)]
+        if bucket is None:
+            bucket = self.buckets[key_hash & self.mask if self.mask else key_hash % self.num_buckets]
+        # Check if the key already exists in the bucket; comparing the cached hashes first skips most __eq__ calls
+        for kvp in bucket or ():
+            if kvp.hash == key_hash and kvp.key == key:
                 return kvp.value # Return the value associated with the key
 
-        # Raise a KeyError if the key is not found
-        return None
+        # Return the default if the key is not found
+        return default
         #raise KeyError(f"Key {key} not found.")
 
+    def _bucket_for(self, key_hash: int):
+        """
+        Internal helper that finds the bucket a key is stored in, without changing anything: during an
+        incremental resize, that is its old bucket until that bucket has been migrated.
+        Reads never migrate, so they are safe while the table is being iterated.
+        :param key_hash: The hash of the key
+        :return: The bucket (None if it was never allocated)
+        """
+        old_buckets = self.old_buckets
+        if old_buckets is not None:
+            old_bucket = old_buckets[key_hash % len(old_buckets)]
+            if old_bucket is not None:
+                return old_bucket
+        return self.buckets[key_hash & self.mask if self.mask else key_hash % self.num_buckets]
+
+    @classmethod
+    def from_items(cls, items, **kwargs):
+        """
+        Creates a new hashtable holding the given key/value pairs, sized for them up front.
+        :param items: An iterable of (key, value) pairs
+        :param kwargs: Any other arguments to pass to the constructor
+        :return: The new hashtable
+        """
+        hashtable = cls(**kwargs)
+        hashtable.put_many(items)
+        return hashtable
+
+    def put_many(self, items) -> None:
+        """
+        Puts many Key/Values into the hashtable. If the number of items is known (or can be
+        estimated with len() / __length_hint__), the buckets are grown once, before inserting,
+        instead of being resized several times along the way.
+        :param items: An iterable of (key, value) pairs
+        """
+        self.reserve(self.num_elements + length_hint(items))
+        put = self.put
+        for key, value in items:
+            put(key, value)
+
+    def get_many(self, keys) -> list:
+        """
+        Looks up many keys at once.
+        :param keys: An iterable of keys
+        :return: A list with the value for each key, in order; None for keys that are not in the Hashtable.
+        """
+        get = self.get
+        return [get(key) for key in keys]
+
+    def reserve(self, num_elements: int) -> None:
+        """
+        Makes sure this Hashtable can hold num_elements elements without resizing.
+        :param num_elements: The total number of elements the table should be able to hold
+        """
+        new_num_buckets = self.policy.buckets_to_fit(num_elements)
+        if new_num_buckets > self.num_buckets:
+            self.finish_resize()
+            self._rehash(new_num_buckets)
+
     def key_exists(self, key:str) -> bool:
         """
         If the provided key exists in the Hashtable, return True; otherwise return False.
+        A key stored with a value of None still exists.
         :param key: The key to look for in this Hashtable
         :return: True if the provided key exists in the Hashtable.
         """
+        return key in self
+
+    def __contains__(self, key) -> bool:
+        """
+        Checks whether a key is in this Hashtable, with a single lookup.
+        :param key: The key to look for
+        :return: True if the key is stored here, even if its value is None.
+        """
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __getitem__(self, key):
+        """
+        table[key]: like get(), but raises a KeyError for a missing key.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        """
+        table[key] = value: the same as put().
+        """
+        self.put(key, value)
+
+    def __delitem__(self, key):
+        """
+        del table[key]: like remove(), but raises a KeyError for a missing key.
+        """
         try:
-            value = self.get(key)
-            if value is None:
-                return False
-            else:
-                return True
-        except KeyError:
-            return False
+            self.remove(key)
+        except NotImplementedError:
+            raise KeyError(key) from None
+
+    def __len__(self) -> int:
+        """
+        :return: The number of elements in this Hashtable, without counting them.
+        """
+        return self.num_elements
+
+    def __eq__(self, other):
+        """
+        table == other: True if other is a Hashtable or Mapping with the same keys and values.
+        """
+        if not isinstance(other, (Hashtable, Mapping)):
+            return NotImplemented
+        return len(self) == len(other) and dict(self.items()) == dict(other.items())
+
+    __hash__ = None
+
+    def update(self, other=(), /, **kwargs) -> None:
+        """
+        Like dict.update().
+        :param other: A Hashtable, a mapping or an iterable of (key, value) pairs
+        :param kwargs: More keys and values
+        """
+        pairs = other
+        if isinstance(other, Hashtable):
+            pairs = other.items()
+        elif hasattr(other, 'keys'):
+            pairs = ((key, other[key]) for key in other.keys())
+        for key, value in pairs:
+            self[key] = value
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def pop(self, key, default=_MISSING):
+        """
+        Removes a key and returns its value, like dict.pop().
+        :param key: The key to remove
+        :param default: What to return if the key is not in the Hashtable; without one, a KeyError is raised.
+        :return: The value that was stored with the key
+        """
+        try:
+            return self.remove(key).value
+        except NotImplementedError:
+            if default is _MISSING:
+                raise KeyError(key) from None
+            return default
+
+    def setdefault(self, key, default=None):
+        """
+        Returns the value of a key, first storing default with it if the key isn't there, like dict.setdefault().
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            self.put(key, default)
+            return default
+        return value
+
+    def popitem(self):
+        """
+        Removes and returns some (key, value) pair. Raises a KeyError if the Hashtable is empty.
+        """
+        for kvp in self:
+            self.remove(kvp.key)
+            return kvp.key, kvp.value
+        raise KeyError("popitem(): hashtable is empty")
+
+    def clear(self) -> None:
+        """
+        Removes everything from this Hashtable, keeping the current number of buckets.
+        """
+        self.old_buckets = None
+        self.buckets = [[] for _ in range(self.num_buckets)]
+        self.num_elements = 0
 
     def load_factor(self):
         """
@@ -98,6 +525,9 @@ class Hashtable:
     def resize(self) -> None:
         """
         Resizes this Hashtable to improve performance.
+        Entries are moved using their cached hashes, so no key is hashed again.
+        With incremental_resize, this only swaps in the new (empty) buckets; the entries
+        are moved over by later operations.
         """
         ## If the load factor is > threshold
         ## Create a new hashtable
@@ -105,16 +535,7 @@ class Hashtable:
         ## Set self equal to the new hashtable
 
         # Create a new Hashtable with more buckets
-        new_num_buckets = self.num_buckets * 9
-        new_buckets = [[] for _ in range(new_num_buckets)]
-
-        for bucket in self.buckets:
-            for kvp in bucket:
-                target_bucket = hash(kvp.key) % new_num_buckets
-                new_buckets[target_bucket].append(kvp)
-        
-        self.num_buckets = new_num_buckets
-        self.buckets = new_buckets
+        self._start_resize(self.policy.grown(self.num_buckets))
         # Replace the current hashtable's properties with the new one
         #self.__dict__.update(new_num_buckets.__dict__) ## <--- This is how you "set slef equal to the new hashtable"
 
@@ -127,6 +548,159 @@ class Hashtable:
         #
         # self.buckets = new_buckets
 
+    def _start_resize(self, new_num_buckets: int) -> None:
+        """
+        Internal helper to switch to a new number of buckets, either right away or,
+        with incremental_resize, by starting a migration.
+        :param new_num_buckets: The number of buckets to switch to
+        """
+        if not self.incremental_resize:
+            self._rehash(new_num_buckets)
+            return
+        if self.old_buckets is not None:
+            self.finish_resize()  ## Only one migration runs at a time
+        self.old_buckets = self.buckets
+        self.migration_index = 0
+        self.buckets = [None] * new_num_buckets
+        self.num_buckets = new_num_buckets
+        self.mask = self.policy.mask(new_num_buckets)
+
+    def _rehash(self, new_num_buckets: int) -> None:
+        """
+        Internal helper to move every entry into a freshly allocated set of buckets in one pass.
+        :param new_num_buckets: The number of buckets to move to
+        """
+        new_buckets = [[] for _ in range(new_num_buckets)]
+
+        for bucket in self.buckets:
+            for kvp in bucket or ():
+                target_bucket = kvp.hash % new_num_buckets
+                new_buckets[target_bucket].append(kvp)
+
+        self.num_buckets = new_num_buckets
+        self.mask = self.policy.mask(new_num_buckets)
+        self.buckets = new_buckets
+
+    def compact(self) -> None:
+        """
+        Rebuilds this Hashtable with a snug number of buckets for the elements it currently holds,
+        giving back memory after many keys have been removed. Also finishes any incremental resize.
+        """
+        self.finish_resize()
+        self._rehash(self.policy.buckets_for(self.num_elements))
+
+    def _maybe_shrink(self) -> None:
+        """
+        Internal helper called after a remove: shrinks the table if the policy asks for it.
+        """
+        shrink_load_factor = self.policy.shrink_load_factor
+        if shrink_load_factor is None or self.load_factor() >= shrink_load_factor:
+            return
+        new_num_buckets = self.policy.buckets_for(self.num_elements)
+        if new_num_buckets < self.num_buckets:
+            self._start_resize(new_num_buckets)
+
+    def _migrate_bucket(self, index: int) -> None:
+        """
+        Internal helper to move one old bucket into the current buckets during an incremental resize.
+        :param index: The index of the old bucket to move
+        """
+        old_bucket = self.old_buckets[index]
+        if old_bucket is None:
+            return
+        self.old_buckets[index] = None
+        buckets = self.buckets
+        num_buckets = self.num_buckets
+        for kvp in old_bucket:
+            target_bucket = kvp.hash % num_buckets
+            bucket = buckets[target_bucket]
+            if bucket is None:
+                buckets[target_bucket] = [kvp]
+            else:
+                bucket.append(kvp)
+
+    def _migrate(self, key_hash: int) -> None:
+        """
+        Internal helper called by put/remove while an incremental resize is running.
+        Moves the next migration_step old buckets, plus the old bucket for the key being
+        used, so the operation itself only has to look at the current buckets.
+        :param key_hash: The hash of the key the current operation is about
+        """
+        old_buckets = self.old_buckets
+        stop = min(self.migration_index + self.migration_step, len(old_buckets))
+        for index in range(self.migration_index, stop):
+            self._migrate_bucket(index)
+        self.migration_index = stop
+        if stop == len(old_buckets):
+            self.old_buckets = None
+            return
+        self._migrate_bucket(key_hash % len(old_buckets))
+
+    def finish_resize(self) -> None:
+        """
+        Moves any remaining old buckets over, completing an incremental resize right away.
+        Does nothing if no incremental resize is running.
+        """
+        if self.old_buckets is None:
+            return
+        for index in range(self.migration_index, len(self.old_buckets)):
+            self._migrate_bucket(index)
+        self.old_buckets = None
+
+    def resize_progress(self) -> float:
+        """
+        Reports how far along the current incremental resize is.
+        :return: The fraction (0.0 to 1.0) of old buckets migrated so far; 1.0 if no resize is running.
+        """
+        if self.old_buckets is None:
+            return 1.0
+        return self.migration_index / len(self.old_buckets)
+
+    def enable_stats(self) -> HashtableStats:
+        """
+        Starts collecting HashtableStats for this table. Stats are collected by wrapping this
+        table's get/put/remove and resizing methods, so a table with stats off pays nothing for them.
+        :return: The HashtableStats being collected (the same object if stats were already on)
+        """
+        if self.stats is None:
+            stats = HashtableStats()
+            self.get = stats._wrap_lookup(self, self.get)
+            self.put = stats._wrap_put(self, self.put)
+            self.remove = stats._wrap_remove(self, self.remove)
+            self._start_resize = stats._wrap_resize(self._start_resize)
+            self._rehash = stats._wrap_resize(self._rehash)
+            self.stats = stats
+        return self.stats
+
+    def disable_stats(self) -> None:
+        """
+        Stops collecting stats, removing the wrappers installed by enable_stats().
+        """
+        for name in ('get', 'put', 'remove', '_start_resize', '_rehash'):
+            self.__dict__.pop(name, None)
+        self.stats = None
+
+    def _probe_length(self, key) -> int:
+        """
+        Internal helper used for stats: how many entries a lookup of this key has to look at.
+        :param key: The key
+        :return: The key's position in its chain, or the length of the chain if the key isn't there
+        """
+        key_hash = self.hasher(key)
+        bucket = self._bucket_for(key_hash) or ()  ## The chain get() would look at, even mid-resize
+        for position, kvp in enumerate(bucket, 1):
+            if kvp.hash == key_hash and kvp.key == key:
+                return position
+        return len(bucket)
+
+    def bucket_histogram(self) -> dict:
+        """
+        Describes how evenly the entries are spread over the buckets.
+        :return: A dict of chain length -> number of buckets with that many entries
+        """
+        buckets = chain(self.old_buckets or (), self.buckets)
+        return dict(sorted(Counter(len(bucket) if bucket else 0 for bucket in buckets).items()))
+
     def num_elems(self) -> int:
         """
         Calculates the actual number of elements in this Hashtable.
@@ -142,14 +716,19 @@ class Hashtable:
         :param key: The key of which data to remove.
         :return: The KeyValuePair that was removed from this Hashtable.
         """
-        target_bucket = hash(key) % self.num_buckets  # Determine bucket index
-        bucket = self.buckets[target_bucket]
+        key_hash = self.hasher(key)
+        if self.old_buckets is not None:
+            self._migrate(key_hash)
+        target_bucket = key_hash & self.mask if self.mask else key_hash % self.num_buckets  # Determine bucket index
+        bucket = self.buckets[target_bucket] or []
 
         # Search for the key and remove it if found
         for idx, kvp in enumerate(bucket):
-            if kvp.key == key:
+            if kvp.hash == key_hash and kvp.key == key:
                 self.num_elements -= 1
-                return bucket.pop(idx)  # Remove and return the KeyValuePair
+                removed = bucket.pop(idx)  # Remove and return the KeyValuePair
+                self._maybe_shrink()
+                return removed
 
         # Raise error if key is not found
         raise NotImplementedError(f"Key {key} not found.")
@@ -157,39 +736,506 @@ class Hashtable:
     def __iter__(self):
         """
         Helper function to provide easy iteration over the elements of this Hashtable.
-        :return: A HashtableIterator that provides the elements in this Hashtable.
+        :return: An iterator over the KeyValuePairs in this Hashtable.
         """
-        return HashtableIterator(self)
-        
+        ## Flatten the buckets (including any not yet migrated by an incremental resize),
+        ##   skipping empty and unallocated ones without recursing
+        buckets = chain(self.old_buckets or (), self.buckets)
+        return chain.from_iterable(bucket for bucket in buckets if bucket)
+
+    def _iter_keys(self):
+        """Internal helper used by the keys() view."""
+        return (kvp.key for kvp in self)
+
+    def _iter_values(self):
+        """Internal helper used by the values() view."""
+        return (kvp.value for kvp in self)
+
+    def _iter_items(self):
+        """Internal helper used by the items() view."""
+        return ((kvp.key, kvp.value) for kvp in self)
+
+    def keys(self) -> KeysView:
+        """
+        Returns a live view of all the keys in this Hashtable; nothing is copied.
+        :return: A HashtableKeysView
+        """
+        return HashtableKeysView(self)
+
+    def values(self) -> ValuesView:
+        """
+        Returns a live view of all the values in this Hashtable; nothing is copied.
+        :return: A HashtableValuesView
+        """
+        return HashtableValuesView(self)
 
-    def keys(self) -> [str]:
+    def items(self) -> ItemsView:
         """
-        Returns a list of all the keys in this Hashtable.
-        :return: A list of all the keys
+        Returns a live view of all the (key, value) pairs in this Hashtable; nothing is copied.
+        :return: A HashtableItemsView
         """
-        return [item.key for index, item in enumerate(self)] 
+        return HashtableItemsView(self)
 
 
 class HashtableIterator:
     """
     An iterator that provides iteration over all the elements in this Hashtable.
+    Kept for callers that create one directly; Hashtable.__iter__ no longer needs it.
     """
 
     def __init__(self, hashtable):
-        self.bucket_iterator = hashtable.buckets.__iter__()  ## Let us iterate through the buckets
-        self.list_iterator = self.bucket_iterator.__next__().__iter__()
+        self.entries = iter(hashtable)
 
     def __iter__(self):
         return self
 
     def __next__(self):
+        return next(self.entries)
+
+
+class HashtableKeysView(KeysView):
+    """
+    A dict-style view of the keys in a Hashtable. Supports len(), `in` (a single lookup) and set operations.
+    """
+
+    def __len__(self):
+        return len(self._mapping)
+
+    def __contains__(self, key):
+        return self._mapping.get(key, _MISSING) is not _MISSING
+
+    def __iter__(self):
+        return self._mapping._iter_keys()
+
+
+class HashtableValuesView(ValuesView):
+    """
+    A dict-style view of the values in a Hashtable. Supports len() and `in` (which has to scan).
+    """
+
+    def __len__(self):
+        return len(self._mapping)
+
+    def __contains__(self, value):
+        return any(stored is value or stored == value for stored in self._mapping._iter_values())
+
+    def __iter__(self):
+        return self._mapping._iter_values()
+
+
+class HashtableItemsView(ItemsView):
+    """
+    A dict-style view of the (key, value) pairs in a Hashtable. Supports len(), `in` (a single lookup)
+    and set operations.
+    """
+
+    def __len__(self):
+        return len(self._mapping)
+
+    def __contains__(self, item):
+        key, value = item
+        stored = self._mapping.get(key, _MISSING)
+        return stored is not _MISSING and (stored is value or stored == value)
+
+    def __iter__(self):
+        return self._mapping._iter_items()
+
+
+_EMPTY = object()
+"""Marker for an open-addressing slot that has never held an entry."""
+_DELETED = object()
+"""Marker (tombstone) for an open-addressing slot whose entry was removed."""
+
+
+class OpenAddressingHashtable(Hashtable):
+    """
+    A Hashtable that stores its entries in flat parallel key/value/hash arrays, using open
+    addressing with linear probing instead of a list of KeyValuePairs per bucket.
+    Lookups walk contiguous slots, and there is no per-entry object to allocate.
+    Removing a key leaves a tombstone behind so that probe sequences stay intact.
+    """
+
+    def __init__(self, num_buckets=8, policy: GrowthPolicy = None, hasher=None):
+        """
+        Create a new instance of an open-addressing hashtable.
+        :param num_buckets: The number of slots to start with, rounded up to a power of two; defaults to 8.
+        :param policy: The GrowthPolicy deciding when and how to resize; it must use power-of-two
+            bucket counts and a max_load_factor below 1. Defaults to doubling once 60% of the slots are used.
+        :param hasher: A function turning a key into an int, such as one from hashers.py; defaults to hash().
+        """
+        if policy is None:
+            ## Linear probing degrades quickly past ~0.7 full
+            policy = GrowthPolicy(max_load_factor=0.6, growth_factor=2, power_of_two=True, min_buckets=8)
+        if not policy.power_of_two or policy.max_load_factor >= 1:
+            raise ValueError("OpenAddressingHashtable needs a power-of-two policy with a max_load_factor below 1")
+        self.policy = policy
+        """Decides when and how this hashtable grows or shrinks"""
+        self.hasher = hash if hasher is None else hasher
+        """Turns a key into the int that picks its first slot"""
+        self.alpha = self.policy.max_load_factor
+        """This is a 'target' value-- if the fraction of used slots ever gets bigger than this, resize. """
+        self.num_buckets = self.policy.rounded(num_buckets)
+        """Number of slots in this hashtable; always a power of two so we can mask instead of using %"""
+        self.num_elements = 0
+        """Number of elements stored in this hashtable"""
+        self.num_tombstones = 0
+        """Number of slots holding a tombstone left behind by remove()"""
+        self.slot_keys = [_EMPTY] * self.num_buckets
+        """The key stored in each slot, or _EMPTY / _DELETED"""
+        self.slot_values = [None] * self.num_buckets
+        """The value stored in each slot"""
+        self.slot_hashes = [0] * self.num_buckets
+        """The cached hash of the key stored in each slot"""
+        self.old_buckets = None
+        """Always None; open addressing resizes in one pass"""
+        self.stats = None
+        """The HashtableStats being collected, or None (the default) if stats are off"""
+
+    def _probe(self, key, key_hash: int):
+        """
+        Internal helper that walks the probe sequence for a key.
+        :param key: The key to look for
+        :param key_hash: self.hasher(key)
+        :return: A tuple (slot of the key or -1 if absent, first slot the key could be inserted into)
+        """
+        mask = self.num_buckets - 1
+        keys = self.slot_keys
+        hashes = self.slot_hashes
+        slot = key_hash & mask
+        first_free = -1
+        while True:
+            slot_key = keys[slot]
+            if slot_key is _EMPTY:
+                return -1, (slot if first_free < 0 else first_free)
+            if slot_key is _DELETED:
+                if first_free < 0:
+                    first_free = slot
+            elif hashes[slot] == key_hash and (slot_key is key or slot_key == key):
+                return slot, slot
+            slot = (slot + 1) & mask
+
+    def put(self, key: str, value):
+        """
+        Put a Key/Value into the hashtable. If the key already exists, its value is replaced.
+        :param key: The key
+        :param value: The value to store with the key
+        :return:
+        """
+        key_hash = self.hasher(key)
+        slot, free = self._probe(key, key_hash)
+        if slot >= 0:
+            self.slot_values[slot] = value
+            return
+        if self.slot_keys[free] is _DELETED:
+            self.num_tombstones -= 1
+        self.slot_keys[free] = key
+        self.slot_values[free] = value
+        self.slot_hashes[free] = key_hash
+        self.num_elements += 1
+        if (self.num_elements + self.num_tombstones) / self.num_buckets >= self.alpha:
+            self.resize()
+
+    def get(self, key: str, default=None):
+        """
+        Given a key, return the value associated with it.
+        :param key: The key that the data is stored by.
+        :param default: What to return if the key is not in the Hashtable; defaults to None.
+        :return: The value associated with the given key, or the default if the key is not in the Hashtable.
+        """
+        slot, _ = self._probe(key, self.hasher(key))
+        if slot < 0:
+            return default
+        return self.slot_values[slot]
+
+    def resize(self) -> None:
+        """
+        Rebuilds the slot arrays, dropping all tombstones. The table grows by the policy's growth
+        factor unless most of the used slots were tombstones, in which case it is rebuilt at the same size.
+        """
+        new_num_buckets = self.num_buckets
+        if self.load_factor() >= self.alpha / self.policy.growth_factor:
+            new_num_buckets = self.policy.grown(self.num_buckets)
+        self._rehash(new_num_buckets)
+
+    def _start_resize(self, new_num_buckets: int) -> None:
+        """
+        Internal helper to switch to a new number of slots; open addressing always does this in one pass.
+        :param new_num_buckets: The number of slots to switch to
+        """
+        self._rehash(new_num_buckets)
+
+    def _rehash(self, new_num_buckets: int) -> None:
+        """
+        Internal helper to move every live entry into freshly allocated slot arrays.
+        Uses the cached hashes, so no key is hashed again.
+        :param new_num_buckets: The new number of slots (a power of two)
+        """
+        old_keys, old_values, old_hashes = self.slot_keys, self.slot_values, self.slot_hashes
+        keys = [_EMPTY] * new_num_buckets
+        values = [None] * new_num_buckets
+        hashes = [0] * new_num_buckets
+        mask = new_num_buckets - 1
+        for old_slot, key in enumerate(old_keys):
+            if key is _EMPTY or key is _DELETED:
+                continue
+            key_hash = old_hashes[old_slot]
+            slot = key_hash & mask
+            while keys[slot] is not _EMPTY:
+                slot = (slot + 1) & mask
+            keys[slot] = key
+            values[slot] = old_values[old_slot]
+            hashes[slot] = key_hash
+        self.num_buckets = new_num_buckets
+        self.num_tombstones = 0
+        self.slot_keys, self.slot_values, self.slot_hashes = keys, values, hashes
+
+    def remove(self, key: str) -> KeyValuePair:
+        """
+        Removes the data associated with the provided Key from this Hashtable.
+        :param key: The key of which data to remove.
+        :return: The KeyValuePair that was removed from this Hashtable.
+        """
+        slot, _ = self._probe(key, self.hasher(key))
+        if slot < 0:
+            raise NotImplementedError(f"Key {key} not found.")
+        removed = KeyValuePair(self.slot_keys[slot], self.slot_values[slot], self.slot_hashes[slot])
+        self.slot_values[slot] = None
+        mask = self.num_buckets - 1
+        if self.slot_keys[(slot + 1) & mask] is _EMPTY:
+            ## Nothing probes past this slot, so it (and any tombstones right before it) can become empty again
+            self.slot_keys[slot] = _EMPTY
+            slot = (slot - 1) & mask
+            while self.slot_keys[slot] is _DELETED:
+                self.slot_keys[slot] = _EMPTY
+                self.num_tombstones -= 1
+                slot = (slot - 1) & mask
+        else:
+            self.slot_keys[slot] = _DELETED
+            self.num_tombstones += 1
+        self.num_elements -= 1
+        self._maybe_shrink()
+        return removed
+
+    def __iter__(self):
+        """
+        Helper function to provide easy iteration over the elements of this Hashtable.
+        :return: A generator of the KeyValuePairs in this Hashtable.
+        """
+        values = self.slot_values
+        hashes = self.slot_hashes
+        for slot, key in enumerate(self.slot_keys):
+            if key is not _EMPTY and key is not _DELETED:
+                yield KeyValuePair(key, values[slot], hashes[slot])
+
+    def clear(self) -> None:
+        """
+        Removes everything from this Hashtable, keeping the current number of slots.
+        """
+        self.slot_keys = [_EMPTY] * self.num_buckets
+        self.slot_values = [None] * self.num_buckets
+        self.slot_hashes = [0] * self.num_buckets
+        self.num_elements = 0
+        self.num_tombstones = 0
+
+    def _probe_length(self, key) -> int:
+        """
+        Internal helper used for stats: how many slots a lookup of this key has to look at.
+        :param key: The key
+        :return: The number of slots probed, up to and including the key's slot or the first empty slot
+        """
+        key_hash = self.hasher(key)
+        mask = self.num_buckets - 1
+        keys = self.slot_keys
+        slot = key_hash & mask
+        probed = 1
+        while keys[slot] is not _EMPTY:
+            if keys[slot] is not _DELETED and self.slot_hashes[slot] == key_hash and keys[slot] == key:
+                break
+            slot = (slot + 1) & mask
+            probed += 1
+        return probed
+
+    def bucket_histogram(self) -> dict:
+        """
+        Describes how far entries sit from the slot their hash points at.
+        :return: A dict of probe length (1 means in its home slot) -> number of entries
+        """
+        mask = self.num_buckets - 1
+        hashes = self.slot_hashes
+        return dict(sorted(Counter(((slot - hashes[slot]) & mask) + 1
+                                   for slot, key in enumerate(self.slot_keys)
+                                   if key is not _EMPTY and key is not _DELETED).items()))
+
+    def _iter_keys(self):
+        """Internal helper used by the keys() view; reads the key array directly."""
+        return (key for key in self.slot_keys if key is not _EMPTY and key is not _DELETED)
+
+    def _iter_values(self):
+        """Internal helper used by the values() view; reads the slot arrays directly."""
+        values = self.slot_values
+        return (values[slot] for slot, key in enumerate(self.slot_keys)
+                if key is not _EMPTY and key is not _DELETED)
+
+    def _iter_items(self):
+        """Internal helper used by the items() view; reads the slot arrays directly."""
+        values = self.slot_values
+        return ((key, values[slot]) for slot, key in enumerate(self.slot_keys)
+                if key is not _EMPTY and key is not _DELETED)
+
+
+class ConcurrentHashtable(Hashtable):
+    """
+    A thread-safe Hashtable using the same bucket model as Hashtable.
+    Writers lock one of num_stripes locks, picked by the key's hash, so writers to different
+    stripes don't wait on each other. Readers take no lock at all: buckets are copy-on-write
+    (a writer swaps in a new list rather than changing one a reader might be walking), and a
+    resize builds a whole new bucket array before swapping it in, so readers are never blocked.
+    Incremental resizing is not supported.
+    """
+
+    def __init__(self, num_buckets=9, num_stripes=16, policy: GrowthPolicy = None, hasher=None):
+        """
+        Create a new instance of a thread-safe hashtable.
+        :param num_buckets: The number of buckets to start with; rounded up to a multiple of num_stripes.
+        :param num_stripes: The number of locks to spread writers over; defaults to 16.
+        :param policy: The GrowthPolicy deciding when and how to resize.
+        :param hasher: A function turning a key into an int, such as one from hashers.py; defaults to hash().
+        """
+        if num_stripes < 1:
+            raise ValueError(f"num_stripes must be at least 1, got {num_stripes}")
+        if policy is not None and policy.power_of_two and num_stripes & (num_stripes - 1):
+            raise ValueError("A power-of-two policy needs a power-of-two num_stripes")
+        self.num_stripes = num_stripes
+        """Number of locks writers are spread over"""
+        self.policy = policy if policy is not None else GrowthPolicy()
+        ## Every bucket count is a multiple of num_stripes, so each bucket is always guarded by the
+        ##   same lock: (hash % num_buckets) % num_stripes == hash % num_stripes
+        super().__init__(self._stripe_multiple(num_buckets), policy=self.policy, hasher=hasher)
+        self.locks = [RLock() for _ in range(num_stripes)]
+        """The stripe locks; the lock for a key is locks[hasher(key) % num_stripes]"""
+        self.count_lock = Lock()
+        """Guards num_elements, which every stripe updates"""
+
+    def _stripe_multiple(self, num_buckets: int) -> int:
+        """
+        Internal helper that rounds a bucket count (as chosen by the policy) up to a multiple of num_stripes.
+        :param num_buckets: The bucket count chosen by the policy
+        :return: The bucket count to use
+        """
+        num_buckets = self.policy.rounded(num_buckets)
+        if num_buckets % self.num_stripes:
+            num_buckets = self.policy.rounded(num_buckets + self.num_stripes - num_buckets % self.num_stripes)
+        return num_buckets
+
+    @contextmanager
+    def _all_locks(self):
+        """
+        Internal helper that holds every stripe lock (always taken in the same order), blocking all writers.
+        """
+        for lock in self.locks:
+            lock.acquire()
         try:
-            return self.list_iterator.__next__()
-        except StopIteration:
-            ## No more elements in this bucket; go to the next one
-            try:
-                self.list_iterator = self.bucket_iterator.__next__().__iter__()
-                return self.__next__()  ## Recursive call so we can move on from an empty bucket
-            except StopIteration:
-                ## No more buckets left to visit
-                raise StopIteration
+            yield
+        finally:
+            for lock in reversed(self.locks):
+                lock.release()
+
+    def put(self, key: str, value):
+        """
+        Put a Key/Value into the hashtable. If the key already exists, its value is replaced.
+        :param key: The key
+        :param value: The value to store with the key
+        :return:
+        """
+        key_hash = self.hasher(key)
+        with self.locks[key_hash % self.num_stripes]:
+            buckets = self.buckets  ## Can't be swapped out while we hold a stripe lock
+            target_bucket = key_hash % len(buckets)
+            bucket = buckets[target_bucket]
+            for kvp in bucket:
+                if kvp.hash == key_hash and kvp.key == key:
+                    kvp.value = value
+                    return
+            buckets[target_bucket] = bucket + [KeyValuePair(key, value, key_hash)]
+            with self.count_lock:
+                self.num_elements += 1
+        ## Resize only after letting go of our stripe, since resizing takes all of them
+        if self.load_factor() >= self.alpha:
+            self.resize()
+
+    def get(self, key: str, default=None):
+        """
+        Given a key, return the value associated with it. Takes no lock.
+        :param key: The key that the data is stored by.
+        :param default: What to return if the key is not in the Hashtable; defaults to None.
+        :return: The value associated with the given key.
+        """
+        key_hash = self.hasher(key)
+        buckets = self.buckets  ## Read once: a resize swaps in a whole new array
+        for kvp in buckets[key_hash % len(buckets)]:
+            if kvp.hash == key_hash and kvp.key == key:
+                return kvp.value
+        return default
+
+    def remove(self, key: str) -> KeyValuePair:
+        """
+        Removes the data associated with the provided Key from this Hashtable.
+        :param key: The key of which data to remove.
+        :return: The KeyValuePair that was removed from this Hashtable.
+        """
+        key_hash = self.hasher(key)
+        with self.locks[key_hash % self.num_stripes]:
+            buckets = self.buckets
+            target_bucket = key_hash % len(buckets)
+            bucket = buckets[target_bucket]
+            for idx, kvp in enumerate(bucket):
+                if kvp.hash == key_hash and kvp.key == key:
+                    buckets[target_bucket] = bucket[:idx] + bucket[idx + 1:]
+                    with self.count_lock:
+                        self.num_elements -= 1
+                    break
+            else:
+                raise NotImplementedError(f"Key {key} not found.")
+        self._maybe_shrink()
+        return kvp
+
+    def resize(self) -> None:
+        """
+        Grows this Hashtable. Writers wait until it is done; readers keep using the old buckets until then.
+        """
+        with self._all_locks():
+            ## Another writer may have grown the table while we were waiting for the locks
+            if self.load_factor() >= self.alpha:
+                self._rehash(self.policy.grown(self.num_buckets))
+
+    def _start_resize(self, new_num_buckets: int) -> None:
+        """
+        Internal helper to switch to a new number of buckets; always done in one pass.
+        :param new_num_buckets: The number of buckets to switch to
+        """
+        self._rehash(new_num_buckets)
+
+    def _rehash(self, new_num_buckets: int) -> None:
+        """
+        Internal helper to move every entry into a new bucket array, then swap it in.
+        The old bucket lists are left untouched for any reader still walking them.
+        :param new_num_buckets: The number of buckets to move to (rounded up to a multiple of num_stripes)
+        """
+        new_num_buckets = self._stripe_multiple(new_num_buckets)
+        with self._all_locks():
+            new_buckets = [[] for _ in range(new_num_buckets)]
+            for bucket in self.buckets:
+                for kvp in bucket:
+                    new_buckets[kvp.hash % new_num_buckets].append(kvp)
+            self.num_buckets = new_num_buckets
+            self.mask = self.policy.mask(new_num_buckets)
+            self.buckets = new_buckets
+
+    def clear(self) -> None:
+        """
+        Removes everything from this Hashtable, keeping the current number of buckets.
+        """
+        with self._all_locks():
+            self.buckets = [[] for _ in range(self.num_buckets)]
+            with self.count_lock:
+                self.num_elements = 0
@@ -0,0 +1,318 @@
+"""
+Benchmarks for hashtable.py, comparing the Hashtable engines against the builtin dict.
+
+Measures put/get/remove/iterate throughput, the longest single put (which is where resize
+pauses show up), and bytes per entry, for several table sizes, key shapes, lookup
+distributions and hit ratios. --threads measures the throughput of a ConcurrentHashtable under
+mixed puts, gets and removes from several threads at once.
+
+Examples:
+    python hashtable_benchmark.py
+    python hashtable_benchmark.py --sizes 1000 100000 10000000 --json results.json
+    python hashtable_benchmark.py --json new.json --compare results.json
+    python hashtable_benchmark.py --memory-only --sizes 10000000 --shapes int
+    python hashtable_benchmark.py --sizes 1000 --threads 1 2 4 8 --json results.json
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from itertools import accumulate
+
+from hashtable import ConcurrentHashtable, Hashtable, OpenAddressingHashtable
+
+IMPLEMENTATIONS = {
+    'dict': dict,
+    'Hashtable': Hashtable,
+    'Hashtable(incremental)': lambda: Hashtable(incremental_resize=True),
+    'OpenAddressingHashtable': OpenAddressingHashtable,
+}
+"""Name -> zero-argument factory for every table being compared"""
+
+
+def make_keys(shape: str, count: int, rng: random.Random) -> list:
+    """
+    Creates distinct keys of a given shape.
+    :param shape: 'int' for random ints, 'str' for random 16-character strings,
+        or 'date' for "YYYY-MM" strings followed by a counter, like MusicIndex-style keys
+    :param count: How many keys to create
+    :param rng: The random number generator to use
+    :return: A list of distinct keys
+    """
+    if shape == 'int':
+        return rng.sample(range(count * 10), count)
+    if shape == 'str':
+        alphabet = 'abcdefghijklmnopqrstuvwxyz0123456789'
+        keys = set()
+        while len(keys) < count:
+            keys.add(''.join(rng.choices(alphabet, k=16)))
+        return list(keys)
+    if shape == 'date':
+        return [f"{1900 + i % 125:04d}-{1 + i % 12:02d}/{i}" for i in range(count)]
+    raise ValueError(f"Unknown key shape: {shape}")
+
+
+def make_lookups(keys: list, misses: list, count: int, distribution: str, hit_ratio: float,
+                 rng: random.Random) -> list:
+    """
+    Creates a list of keys to look up.
+    :param keys: The keys stored in the table
+    :param misses: Keys that are not in the table
+    :param count: How many lookups to create
+    :param distribution: 'uniform', or 'skewed' for a Zipf-like distribution where a few keys
+        get most of the lookups
+    :param hit_ratio: The fraction of lookups that should find their key
+    :param rng: The random number generator to use
+    :return: A list of keys
+    """
+    if distribution == 'uniform':
+        hits = [keys[rng.randrange(len(keys))] for _ in range(count)]
+    elif distribution == 'skewed':
+        cumulative = list(accumulate(1 / rank for rank in range(1, len(keys) + 1)))
+        total = cumulative[-1]
+        hits = [keys[min(bisect_left(cumulative, rng.random() * total), len(keys) - 1)] for _ in range(count)]
+    else:
+        raise ValueError(f"Unknown distribution: {distribution}")
+    return [hit if rng.random() < hit_ratio else misses[i % len(misses)] for i, hit in enumerate(hits)]
+
+
+def bytes_per_entry(factory, keys: list) -> float:
+    """
+    Measures how much memory a table allocates per entry (not counting the keys themselves).
+    :param factory: Creates an empty table
+    :param keys: The keys to store
+    :return: Bytes allocated per entry
+    """
+    gc.collect()
+    tracemalloc.start()
+    table = factory()
+    for key in keys:
+        table[key] = None
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del table
+    return current / len(keys)
+
+
+def run_case(name: str, factory, keys: list, lookups: list, measure_memory: bool) -> dict:
+    """
+    Runs every measurement for one table implementation.
+    :param name: The implementation's name
+    :param factory: Creates an empty table
+    :param keys: The keys to store
+    :param lookups: The keys to look up
+    :param measure_memory: Whether to also measure bytes per entry (slow for big tables)
+    :return: The results, as a dict
+    """
+    gc.collect()
+    table = factory()
+    put = table.__setitem__
+    clock = time.perf_counter
+    worst_put = 0.0
+    start = clock()
+    for key in keys:
+        before = clock()
+        put(key, key)
+        elapsed = clock() - before
+        if elapsed > worst_put:
+            worst_put = elapsed
+    put_seconds = clock() - start
+
+    get = table.get
+    start = clock()
+    for key in lookups:
+        get(key)
+    get_seconds = clock() - start
+
+    entries = table.items() if isinstance(table, dict) else table
+    start = clock()
+    for _ in entries:
+        pass
+    iterate_seconds = clock() - start
+
+    remove = table.__delitem__
+    start = clock()
+    for key in keys:
+        remove(key)
+    remove_seconds = clock() - start
+
+    result = {
+        'implementation': name,
+        'put_ops_per_sec': len(keys) / put_seconds,
+        'get_ops_per_sec': len(lookups) / get_seconds,
+        'remove_ops_per_sec': len(keys) / remove_seconds,
+        'iterate_entries_per_sec': len(keys) / iterate_seconds if iterate_seconds else float('inf'),
+        'worst_put_ms': worst_put * 1000,
+    }
+    if measure_memory:
+        result['bytes_per_entry'] = bytes_per_entry(factory, keys)
+    return result
+
+
+def run(sizes, shapes, distributions, hit_ratios, implementations, seed=0, memory_limit=1_000_000) -> list:
+    """
+    Runs the whole benchmark matrix.
+    :return: A list of result dicts, one per case
+    """
+    results = []
+    for size in sizes:
+        for shape in shapes:
+            rng = random.Random(seed)
+            all_keys = make_keys(shape, size + max(1, size // 10), rng)
+            keys, misses = all_keys[:size], all_keys[size:]
+            for distribution in distributions:
+                for hit_ratio in hit_ratios:
+                    lookups = make_lookups(keys, misses, size, distribution, hit_ratio, rng)
+                    for name in implementations:
+                        result = run_case(name, IMPLEMENTATIONS[name], keys, lookups, size <= memory_limit)
+                        result.update(size=size, key_shape=shape, distribution=distribution, hit_ratio=hit_ratio)
+                        results.append(result)
+                        print(format_result(result), file=sys.stderr)
+    return results
+
+
+def run_memory(sizes, shapes, implementations, seed=0) -> list:
+    """
+    Only measures bytes per entry, which is much quicker than the whole matrix for huge tables.
+    :return: A list of result dicts, one per case
+    """
+    results = []
+    for size in sizes:
+        for shape in shapes:
+            keys = make_keys(shape, size, random.Random(seed))
+            for name in implementations:
+                result = {'implementation': name, 'size': size, 'key_shape': shape,
+                          'bytes_per_entry': bytes_per_entry(IMPLEMENTATIONS[name], keys)}
+                results.append(result)
+                print(f"{name:<24} n={size:<9} {shape:<4} {result['bytes_per_entry']:7.1f} B/entry", file=sys.stderr)
+    return results
+
+
+def run_threads(thread_counts, ops_per_thread=20_000) -> list:
+    """
+    Measures a ConcurrentHashtable shared by several threads, each putting, getting and
+    removing (every other one of) its own keys.
+    :param thread_counts: The numbers of threads to run at once
+    :param ops_per_thread: How many keys each thread puts
+    :return: A list of result dicts, one per thread count
+    """
+    results = []
+    for num_threads in thread_counts:
+        hashtable = ConcurrentHashtable()
+
+        def worker(thread_id):
+            for i in range(ops_per_thread):
+                key = (thread_id, i)
+                hashtable.put(key, i)
+                hashtable.get(key)
+                if i % 2:
+                    hashtable.remove(key)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(num_threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        result = {'implementation': 'ConcurrentHashtable', 'size': ops_per_thread, 'key_shape': 'tuple',
+                  'threads': num_threads, 'ops_per_sec': num_threads * ops_per_thread * 2.5 / elapsed}
+        results.append(result)
+        print(f"{'ConcurrentHashtable':<24} threads={num_threads:<3} {result['ops_per_sec']:>12,.0f} ops/s",
+              file=sys.stderr)
+    return results
+
+
+def format_result(result: dict) -> str:
+    """
+    :return: A one-line, human-readable summary of a result
+    """
+    memory = f"{result['bytes_per_entry']:7.1f} B/entry" if 'bytes_per_entry' in result else ''
+    return (f"{result['implementation']:<24} n={result['size']:<9} {result['key_shape']:<4} "
+            f"{result['distribution']:<7} hit={result['hit_ratio']:<4} "
+            f"put {result['put_ops_per_sec']:>12,.0f}/s  get {result['get_ops_per_sec']:>12,.0f}/s  "
+            f"remove {result['remove_ops_per_sec']:>12,.0f}/s  "
+            f"iterate {result['iterate_entries_per_sec']:>12,.0f}/s  "
+            f"worst put {result['worst_put_ms']:8.2f} ms  {memory}")
+
+
+def case_id(result: dict) -> tuple:
+    """
+    :return: What identifies a case, so results from two runs can be matched up
+    """
+    return (result['implementation'], result['size'], result['key_shape'],
+            result.get('distribution'), result.get('hit_ratio'), result.get('threads'))
+
+
+def compare(baseline: list, results: list, threshold: float) -> list:
+    """
+    Finds throughput and memory regressions against an earlier run.
+    :param baseline: Results from an earlier run
+    :param results: Results from this run
+    :param threshold: How much slower or bigger (as a fraction, e.g. 0.2 for 20%) counts as a regression
+    :return: A list of human-readable regression descriptions
+    """
+    earlier = {case_id(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = earlier.get(case_id(result))
+        if old is None:
+            continue
+        for metric in ('put_ops_per_sec', 'get_ops_per_sec', 'remove_ops_per_sec', 'iterate_entries_per_sec',
+                       'ops_per_sec'):
+            if metric in result and metric in old and result[metric] < old[metric] * (1 - threshold):
+                regressions.append(f"{case_id(result)} {metric}: {old[metric]:,.0f} -> {result[metric]:,.0f}")
+        metric = 'bytes_per_entry'
+        if metric in result and metric in old and result[metric] > old[metric] * (1 + threshold):
+            regressions.append(f"{case_id(result)} {metric}: {old[metric]:,.1f} -> {result[metric]:,.1f}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--shapes', nargs='+', default=['int', 'str', 'date'], choices=['int', 'str', 'date'])
+    parser.add_argument('--distributions', nargs='+', default=['uniform', 'skewed'], choices=['uniform', 'skewed'])
+    parser.add_argument('--hit-ratios', type=float, nargs='+', default=[1.0, 0.5])
+    parser.add_argument('--implementations', nargs='+', default=list(IMPLEMENTATIONS), choices=list(IMPLEMENTATIONS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--memory-limit', type=int, default=1_000_000,
+                        help="Only measure bytes per entry for sizes up to this (it is slow)")
+    parser.add_argument('--memory-only', action='store_true',
+                        help="Only measure bytes per entry, for every size (ignores --memory-limit)")
+    parser.add_argument('--threads', type=int, nargs='+',
+                        help="Also measure a ConcurrentHashtable shared by each of these numbers of threads")
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--compare', help="A --json file from an earlier run to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Slowdown (as a fraction) that counts as a regression; defaults to 0.2")
+    args = parser.parse_args(argv)
+
+    if args.memory_only:
+        results = run_memory(args.sizes, args.shapes, args.implementations, args.seed)
+    else:
+        results = run(args.sizes, args.shapes, args.distributions, args.hit_ratios, args.implementations,
+                      args.seed, args.memory_limit)
+    if args.threads:
+        results.extend(run_threads(args.threads))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'results': results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f)['results'], results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 from hashtable import *
 
+import threading
 import pytest
 
 class TestHashtable:
@@ -36,11 +37,11 @@ class TestHashtable:
         hashtable.put(key, "a")
         hashtable.put(key, "b")
         target_bucket = hash(key) % hashtable.num_buckets
-        print(hashtable.get(key))
-        assert hashtable.get(key) == "a" # Value should be updated
-        assert hashtable.num_elements == 2  # Element count should remain the same
-        assert hashtable.buckets[target_bucket][1].value == "b"
-        assert hashtable.buckets[target_bucket][1].key == 1
+        assert hashtable.get(key) == "b" # Value should be updated
+        assert hashtable.num_elements == 1  # Element count should remain the same
+        assert len(hashtable.buckets[target_bucket]) == 1
+        assert hashtable.buckets[target_bucket][0].value == "b"
+        assert hashtable.buckets[target_bucket][0].key == 1
         
     def test_put_multiple_items(self):
         """Test inserting multiple items with no hash collisions."""
@@ -180,6 +181,464 @@ class TestHashtable:
         for i in range(1,7):
             assert hashtable.get(i) == f"value{i}"
 
+    def test_entries_cache_hash(self):
+        hashtable = Hashtable(5)
+        hashtable.put("key", "value")
+        target_bucket = hash("key") % hashtable.num_buckets
+        assert hashtable.buckets[target_bucket][0].hash == hash("key")
+
+    def test_resize_does_not_rehash_keys(self):
+        class CountingKey:
+            hash_calls = 0
+
+            def __init__(self, n):
+                self.n = n
+
+            def __hash__(self):
+                CountingKey.hash_calls += 1
+                return self.n
+
+            def __eq__(self, other):
+                return isinstance(other, CountingKey) and self.n == other.n
+
+        hashtable = Hashtable(3)
+        keys = [CountingKey(i) for i in range(20)]
+        for key in keys:
+            hashtable.put(key, key.n)
+        assert hashtable.num_buckets == 27 ## One resize happened
+        assert CountingKey.hash_calls == 20 ## Once per put, none from the resize
+        for key in keys:
+            assert hashtable.get(key) == key.n
+
+    def test_entries_are_slotted(self):
+        kvp = KeyValuePair("key", "value")
+        assert not hasattr(kvp, '__dict__')
+        with pytest.raises(AttributeError):
+            kvp.extra = 1
+        kvp.value = "new value"
+        assert (kvp.key, kvp.value, kvp.hash) == ("key", "new value", hash("key"))
+
+
+class TestGrowthPolicy:
+
+    def test_default_policy_matches_original(self):
+        hashtable = Hashtable()
+        assert hashtable.alpha == 3
+        assert hashtable.policy.growth_factor == 9
+        assert hashtable.mask == 0
+
+    def test_custom_growth(self):
+        hashtable = Hashtable(4, policy=GrowthPolicy(max_load_factor=1, growth_factor=2))
+        for i in range(4):
+            hashtable.put(i, i)
+        assert hashtable.num_buckets == 8
+        for i in range(4):
+            assert hashtable.get(i) == i
+
+    def test_power_of_two_buckets(self):
+        hashtable = Hashtable(5, policy=GrowthPolicy(power_of_two=True))
+        assert hashtable.num_buckets == 8
+        assert hashtable.mask == 7
+        key = -13
+        hashtable.put(key, "value")
+        assert hashtable.buckets[key & 7][0].value == "value"
+        assert hashtable.get(key) == "value"
+
+    def test_shrink_on_remove(self):
+        policy = GrowthPolicy(max_load_factor=2, growth_factor=2, shrink_load_factor=0.25)
+        hashtable = Hashtable(4, policy=policy)
+        for i in range(100):
+            hashtable.put(i, i)
+        grown_buckets = hashtable.num_buckets
+        for i in range(95):
+            hashtable.remove(i)
+        assert hashtable.num_buckets < grown_buckets
+        for i in range(95, 100):
+            assert hashtable.get(i) == i
+
+    def test_compact(self):
+        hashtable = Hashtable(3)
+        for i in range(100):
+            hashtable.put(i, i)
+        for i in range(90):
+            hashtable.remove(i)
+        hashtable.compact()
+        assert hashtable.num_buckets == hashtable.policy.buckets_for(10)
+        assert hashtable.num_buckets < 243
+        for i in range(90, 100):
+            assert hashtable.get(i) == i
+
+    def test_policy_rejects_thrashing(self):
+        with pytest.raises(ValueError):
+            GrowthPolicy(max_load_factor=3, growth_factor=2, shrink_load_factor=2)
+
+    def test_policy_rejects_no_buckets(self):
+        with pytest.raises(ValueError):
+            GrowthPolicy(min_buckets=0)
+        hashtable = Hashtable(0)
+        assert hashtable.num_buckets == 1
+        hashtable.put("a", 1)
+        assert hashtable.get("a") == 1
+
+    def test_open_addressing_compact(self):
+        hashtable = OpenAddressingHashtable()
+        for i in range(1000):
+            hashtable.put(i, i)
+        for i in range(990):
+            hashtable.remove(i)
+        hashtable.compact()
+        assert hashtable.num_buckets == 64
+        assert hashtable.num_tombstones == 0
+        assert sorted(hashtable.keys()) == list(range(990, 1000))
+
+
+class TestBulkOperations:
+
+    def test_put_many_resizes_once(self, mocker):
+        hashtable = Hashtable(3)
+        mocker.spy(hashtable, '_rehash')
+        hashtable.put_many([(i, f"value{i}") for i in range(1000)])
+
+        assert hashtable._rehash.call_count == 1
+        assert hashtable.num_elements == 1000
+        assert hashtable.load_factor() < hashtable.alpha
+        for i in range(1000):
+            assert hashtable.get(i) == f"value{i}"
+
+    def test_put_many_without_length_hint(self):
+        hashtable = Hashtable(3)
+        hashtable.put_many((i, f"value{i}") for i in range(1000))
+        assert hashtable.num_elements == 1000
+        assert hashtable.get(999) == "value999"
+
+    def test_put_many_upserts(self):
+        hashtable = Hashtable()
+        hashtable.put(1, "old")
+        hashtable.put_many([(1, "new"), (2, "two")])
+        assert hashtable.get(1) == "new"
+        assert hashtable.num_elements == 2
+
+    def test_from_items(self):
+        hashtable = Hashtable.from_items([("a", 1), ("b", 2)], num_buckets=2)
+        assert isinstance(hashtable, Hashtable)
+        assert hashtable.get("a") == 1
+        assert hashtable.get("b") == 2
+
+        hashtable = OpenAddressingHashtable.from_items((i, i) for i in range(100))
+        assert isinstance(hashtable, OpenAddressingHashtable)
+        assert hashtable.get(99) == 99
+
+    def test_get_many(self):
+        hashtable = Hashtable.from_items([(i, i * i) for i in range(10)])
+        assert hashtable.get_many([3, 11, 0]) == [9, None, 0]
+
+
+class TestIncrementalResize:
+
+    def test_resize_keeps_old_buckets(self):
+        hashtable = Hashtable(3, incremental_resize=True, migration_step=1)
+        for i in range(9):
+            hashtable.put(i, f"testing{i}")
+        assert hashtable.num_buckets == 27
+        assert len(hashtable.old_buckets) == 3
+        assert hashtable.resize_progress() == 0.0
+
+    def test_operations_migrate_buckets(self):
+        hashtable = Hashtable(3, incremental_resize=True, migration_step=1)
+        for i in range(9):
+            hashtable.put(i, f"testing{i}")
+
+        assert hashtable.get(0) == "testing0"
+        assert hashtable.resize_progress() == 0.0  ## Reads don't migrate
+        hashtable.remove(1)
+        assert 0 < hashtable.resize_progress() < 1.0
+        hashtable.put(100, "old")
+        hashtable.put(100, "testing100")
+        assert hashtable.resize_progress() == 1.0
+        assert hashtable.old_buckets is None
+
+        assert hashtable.num_elements == 9
+        for i in range(2, 9):
+            assert hashtable.get(i) == f"testing{i}"
+        assert hashtable.get(100) == "testing100"
+        assert hashtable.get(1) is None
+
+    def test_iterate_during_migration(self):
+        hashtable = Hashtable(3, incremental_resize=True, migration_step=1)
+        for i in range(10):
+            hashtable.put(i, f"value{i}")
+        assert hashtable.old_buckets is not None
+        assert sorted(hashtable.keys()) == list(range(10))
+
+    def test_reads_while_iterating_during_migration(self):
+        hashtable = Hashtable(3, incremental_resize=True, migration_step=1)
+        for i in range(9):
+            hashtable.put(i, f"value{i}")
+        assert hashtable.old_buckets is not None
+        seen = []
+        for key in hashtable.keys():
+            assert hashtable[key] == f"value{key}" and key in hashtable
+            seen.append(key)
+        assert sorted(seen) == list(range(9))
+        assert sorted((kvp.key for kvp in hashtable if hashtable.get(kvp.key) is not None)) == list(range(9))
+
+    def test_finish_resize(self):
+        hashtable = Hashtable(3, incremental_resize=True)
+        for i in range(9):
+            hashtable.put(i, i)
+        hashtable.finish_resize()
+        assert hashtable.resize_progress() == 1.0
+        for i in range(9):
+            assert hashtable.get(i) == i
+
+    def test_many_resizes(self):
+        hashtable = Hashtable(3, incremental_resize=True, migration_step=1)
+        for i in range(2000):
+            hashtable.put(i, i)
+        assert hashtable.num_elements == 2000
+        assert hashtable.num_buckets == 3 * 9 ** 3
+        for i in range(2000):
+            assert hashtable.get(i) == i
+
+
+class TestMappingProtocol:
+
+    def test_is_not_a_mapping(self):
+        ## Iterating gives KeyValuePairs, which would break the Mapping contract
+        from collections.abc import Mapping
+        assert not isinstance(Hashtable(), Mapping)
+        assert not isinstance(OpenAddressingHashtable(), Mapping)
+        hashtable = Hashtable()
+        hashtable.put("a", 1)
+        assert [(kvp.key, kvp.value) for kvp in hashtable] == [("a", 1)]
+        assert dict(hashtable) == {"a": 1}
+        assert hashtable == {"a": 1} and {"a": 1} == hashtable
+        assert hashtable != {"a": 2} and hashtable != ["a"]
+
+    def test_getitem_setitem_delitem(self):
+        hashtable = Hashtable()
+        hashtable["a"] = 1
+        assert hashtable["a"] == 1
+        assert len(hashtable) == 1
+        del hashtable["a"]
+        assert len(hashtable) == 0
+        with pytest.raises(KeyError):
+            hashtable["a"]
+        with pytest.raises(KeyError):
+            del hashtable["a"]
+
+    def test_contains_none_value(self):
+        hashtable = Hashtable()
+        hashtable.put("key", None)
+        assert "key" in hashtable
+        assert hashtable.key_exists("key")
+        assert "other" not in hashtable
+        assert not hashtable.key_exists("other")
+        assert hashtable["key"] is None
+
+    def test_contains_is_one_lookup(self, mocker):
+        hashtable = Hashtable()
+        hashtable.put("key", "value")
+        mocker.spy(hashtable, 'get')
+        assert "key" in hashtable
+        assert hashtable.get.call_count == 1
+
+    def test_mixin_methods(self):
+        hashtable = Hashtable()
+        hashtable.update({"a": 1, "b": 2})
+        assert hashtable.setdefault("c", 3) == 3
+        assert hashtable.pop("a") == 1
+        assert hashtable.pop("a", "gone") == "gone"
+        assert hashtable == {"b": 2, "c": 3}
+        assert dict(hashtable) == {"b": 2, "c": 3}
+
+        key, value = hashtable.popitem()
+        assert key in ("b", "c")
+        assert len(hashtable) == 1
+
+        hashtable.clear()
+        assert len(hashtable) == 0
+        with pytest.raises(KeyError):
+            hashtable.popitem()
+
+    def test_update_from_hashtable(self):
+        source = OpenAddressingHashtable()
+        source.update({"a": 1, "b": 2})
+        hashtable = Hashtable()
+        hashtable.put("a", 0)
+        hashtable.update(source, c=3)
+        assert dict(hashtable) == {"a": 1, "b": 2, "c": 3}
+        copy = OpenAddressingHashtable()
+        copy.update(hashtable)
+        assert copy == hashtable
+
+    def test_open_addressing_mapping(self):
+        hashtable = OpenAddressingHashtable()
+        hashtable.update((i, i) for i in range(20))
+        assert len(hashtable) == 20
+        del hashtable[5]
+        assert 5 not in hashtable
+        assert 6 in hashtable
+        hashtable.clear()
+        assert len(hashtable) == 0
+        assert 6 not in hashtable
+
+
+class TestHashtableStats:
+
+    def test_stats_off_by_default(self):
+        hashtable = Hashtable()
+        assert hashtable.stats is None
+        assert 'get' not in hashtable.__dict__  ## No wrappers installed
+
+    def test_hits_misses_and_probe_lengths(self):
+        hashtable = Hashtable(1, policy=GrowthPolicy(max_load_factor=100))  ## Every key in the same chain
+        stats = hashtable.enable_stats()
+        for i in range(3):
+            hashtable.put(i, i)
+        assert hashtable.get(2) == 2
+        assert hashtable.get(7) is None
+        assert hashtable.get(7, "default") == "default"
+        with pytest.raises(NotImplementedError):
+            hashtable.remove(7)
+        assert 1 in hashtable  ## Goes through get()
+
+        report = stats.as_dict()
+        assert report['operations'] == {'put': 3, 'get': 4, 'remove': 1}
+        assert report['hits'] == 2
+        assert report['misses'] == 3
+        ## puts at chain positions 1, 2, 3; get(2) is 3rd; misses look at the whole chain of 3; 1 is 2nd
+        assert report['probe_lengths'] == {1: 1, 2: 2, 3: 5}
+
+    def test_resize_telemetry(self):
+        hashtable = Hashtable(3)
+        stats = hashtable.enable_stats()
+        for i in range(100):
+            hashtable.put(i, i)
+        assert stats.resizes == 2
+        assert stats.resize_seconds > 0
+        hashtable.compact()
+        assert stats.resizes == 3
+
+    def test_hooks(self):
+        hashtable = Hashtable()
+        calls = []
+        hashtable.enable_stats().add_hook(lambda operation, key, seconds: calls.append((operation, key)))
+        hashtable.put("a", 1)
+        hashtable.get("a")
+        hashtable.remove("a")
+        assert calls == [('put', 'a'), ('get', 'a'), ('remove', 'a')]
+
+    def test_disable_stats(self):
+        hashtable = Hashtable()
+        hashtable.enable_stats()
+        hashtable.disable_stats()
+        assert hashtable.stats is None
+        assert 'get' not in hashtable.__dict__
+        hashtable.put("a", 1)
+        assert hashtable.get("a") == 1
+
+    def test_bucket_histogram(self):
+        hashtable = Hashtable(4)
+        for key in (0, 4, 8, 1):
+            hashtable.put(key, key)
+        assert hashtable.bucket_histogram() == {0: 2, 1: 1, 3: 1}
+
+    def test_open_addressing_stats(self):
+        hashtable = OpenAddressingHashtable(8)
+        stats = hashtable.enable_stats()
+        for key in (1, 9, 17):
+            hashtable.put(key, key)
+        assert hashtable.get(17) == 17
+        assert hashtable.bucket_histogram() == {1: 1, 2: 1, 3: 1}
+        assert stats.as_dict()['probe_lengths'] == {1: 1, 2: 1, 3: 2}
+
+    def test_probe_lengths_during_incremental_resize(self):
+        hashtable = Hashtable(3, incremental_resize=True, migration_step=1)
+        for i in range(9):
+            hashtable.put(i, i)
+        assert hashtable.old_buckets is not None
+        stats = hashtable.enable_stats()
+        assert hashtable.get(6) == 6  ## Third in its old, not yet migrated, chain [0, 3, 6]
+        assert stats.as_dict()['probe_lengths'] == {3: 1}
+
+
+class TestOpenAddressingHashtable:
+
+    def test_create(self):
+        hashtable = OpenAddressingHashtable(5)
+        assert hashtable.num_buckets == 8 ## Rounded up to a power of two
+        assert hashtable.num_elements == 0
+        assert len(hashtable.slot_keys) == 8
+
+    def test_put_get(self):
+        hashtable = OpenAddressingHashtable()
+        hashtable.put(1, "a")
+        hashtable.put("two", "b")
+        assert hashtable.get(1) == "a"
+        assert hashtable.get("two") == "b"
+        assert hashtable.get(3) is None
+        assert hashtable.num_elements == 2
+
+    def test_put_existing_key_overwrites(self):
+        hashtable = OpenAddressingHashtable()
+        hashtable.put(1, "a")
+        hashtable.put(1, "b")
+        assert hashtable.get(1) == "b"
+        assert hashtable.num_elements == 1
+
+    def test_remove_keeps_probe_sequence(self):
+        hashtable = OpenAddressingHashtable(8)
+        ## 1, 9 and 17 all land in slot 1 of an 8-slot table
+        hashtable.put(1, "a")
+        hashtable.put(9, "b")
+        hashtable.put(17, "c")
+
+        removed_kvp = hashtable.remove(9)
+        assert removed_kvp.key == 9
+        assert removed_kvp.value == "b"
+        assert hashtable.num_tombstones == 1
+        assert hashtable.get(17) == "c"
+        assert hashtable.get(9) is None
+
+        ## The tombstone gets reused by the next insert along the same probe sequence
+        hashtable.put(25, "d")
+        assert hashtable.num_tombstones == 0
+        assert hashtable.get(25) == "d"
+        assert hashtable.num_elements == 3
+
+    def test_remove_nonexistent_key(self):
+        hashtable = OpenAddressingHashtable()
+        hashtable.put(1, "a")
+        with pytest.raises(NotImplementedError):
+            hashtable.remove(3)
+
+    def test_resize(self):
+        hashtable = OpenAddressingHashtable(8)
+        for i in range(100):
+            hashtable.put(i, f"testing{i}")
+        assert hashtable.num_elements == 100
+        assert hashtable.num_buckets >= 100 / hashtable.alpha
+        for i in range(100):
+            assert hashtable.get(i) == f"testing{i}"
+
+    def test_churn_does_not_grow(self):
+        hashtable = OpenAddressingHashtable(8)
+        for i in range(1000):
+            hashtable.put(i, i)
+            hashtable.remove(i)
+        assert hashtable.num_elements == 0
+        assert hashtable.num_buckets == 8
+
+    def test_iterator(self):
+        hashtable = OpenAddressingHashtable()
+        for i in range(10):
+            hashtable.put(i, f"value{i}")
+        hashtable.remove(4)
+        items = {item.key: item.value for item in hashtable}
+        assert items == {i: f"value{i}" for i in range(10) if i != 4}
+        assert sorted(hashtable.keys()) == [i for i in range(10) if i != 4]
+
 
 class TestHashtableIterator():
 
@@ -214,3 +673,139 @@ class TestHashtableIterator():
         ## Ensures that all items were seen
         for item in seen:
             assert item
+
+    def test_sparse_table_does_not_recurse(self):
+        hashtable = Hashtable(100000)
+        hashtable.put(1, "value1")
+        assert [item.key for item in hashtable] == [1]
+
+    def test_empty_table(self):
+        assert list(Hashtable()) == []
+        assert list(Hashtable(0)) == []
+
+
+class TestHashtableViews():
+
+    def test_keys_view(self):
+        hashtable = Hashtable.from_items([(i, f"value{i}") for i in range(10)])
+        keys = hashtable.keys()
+        assert len(keys) == 10
+        assert 3 in keys
+        assert 10 not in keys
+        assert sorted(keys) == list(range(10))
+        assert keys & {1, 2, 42} == {1, 2}
+
+        ## Views are live, not copies
+        hashtable.put(10, "value10")
+        assert len(keys) == 11
+        assert 10 in keys
+
+    def test_keys_view_with_none_value(self):
+        hashtable = Hashtable()
+        hashtable.put("key", None)
+        assert "key" in hashtable.keys()
+        assert "other" not in hashtable.keys()
+
+    def test_values_view(self):
+        hashtable = Hashtable.from_items([(i, i * 10) for i in range(5)])
+        values = hashtable.values()
+        assert len(values) == 5
+        assert 40 in values
+        assert 41 not in values
+        assert sorted(values) == [0, 10, 20, 30, 40]
+
+    def test_items_view(self):
+        hashtable = Hashtable.from_items([(i, i * 10) for i in range(5)])
+        items = hashtable.items()
+        assert len(items) == 5
+        assert (2, 20) in items
+        assert (2, 21) not in items
+        assert (7, 70) not in items
+        assert sorted(items) == [(i, i * 10) for i in range(5)]
+
+    def test_open_addressing_views(self):
+        hashtable = OpenAddressingHashtable.from_items([(i, i * 10) for i in range(5)])
+        hashtable.remove(0)
+        assert sorted(hashtable.keys()) == [1, 2, 3, 4]
+        assert sorted(hashtable.values()) == [10, 20, 30, 40]
+        assert sorted(hashtable.items()) == [(i, i * 10) for i in range(1, 5)]
+        assert 0 not in hashtable.keys()
+        assert len(hashtable.items()) == 4
+
+
+class TestConcurrentHashtable():
+
+    def test_basic_operations(self):
+        hashtable = ConcurrentHashtable(num_stripes=4)
+        assert hashtable.num_buckets % 4 == 0
+        for i in range(100):
+            hashtable.put(i, f"value{i}")
+        assert len(hashtable) == 100
+        assert hashtable.num_buckets % 4 == 0
+        assert hashtable.get(42) == "value42"
+        hashtable.put(42, "new")
+        assert hashtable[42] == "new"
+        assert hashtable.remove(42).value == "new"
+        assert 42 not in hashtable
+        with pytest.raises(NotImplementedError):
+            hashtable.remove(42)
+        assert sorted(hashtable.keys()) == [i for i in range(100) if i != 42]
+
+    def test_power_of_two_stripes(self):
+        with pytest.raises(ValueError):
+            ConcurrentHashtable(num_stripes=3, policy=GrowthPolicy(power_of_two=True))
+        hashtable = ConcurrentHashtable(5, num_stripes=8, policy=GrowthPolicy(power_of_two=True))
+        assert hashtable.num_buckets == 8
+
+    def test_readers_see_every_key_during_resizes(self):
+        hashtable = ConcurrentHashtable(num_stripes=8, policy=GrowthPolicy(max_load_factor=1, growth_factor=2))
+        for i in range(100):
+            hashtable.put(("stable", i), i)
+        missing = []
+        done = threading.Event()
+
+        def reader():
+            while not done.is_set():
+                for i in range(100):
+                    if hashtable.get(("stable", i)) != i:
+                        missing.append(i)
+
+        readers = [threading.Thread(target=reader) for _ in range(4)]
+        for thread in readers:
+            thread.start()
+        for i in range(5000):  ## Forces several resizes while the readers run
+            hashtable.put(i, i)
+        done.set()
+        for thread in readers:
+            thread.join()
+        assert missing == []
+
+    def test_stress(self):
+        """Mixed puts/gets/removes from several threads; hashtable_benchmark.py --threads measures their throughput."""
+        ops_per_thread = 4000
+        for num_threads in (1, 2, 4, 8):
+            hashtable = ConcurrentHashtable()
+            errors = []
+
+            def worker(thread_id):
+                try:
+                    for i in range(ops_per_thread):
+                        key = (thread_id, i)
+                        hashtable.put(key, i)
+                        assert hashtable.get(key) == i
+                        if i % 2:
+                            hashtable.remove(key)
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=worker, args=(n,)) for n in range(num_threads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert errors == []
+            assert len(hashtable) == num_threads * ops_per_thread // 2
+            for thread_id in range(num_threads):
+                for i in range(0, ops_per_thread, 2):
+                    assert hashtable.get((thread_id, i)) == i
@@ -1,12 +1,27 @@
-from os import walk, listdir, makedirs
-from os.path import join, isfile, isdir, dirname
+from abc import ABCMeta
+import argparse
+from array import array
+import asyncio
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import aclosing
+from functools import partial
+from itertools import accumulate, groupby, repeat
+import csv
+import gc
+import json
+from os import walk, makedirs, scandir
+from os.path import join, dirname
 import shutil
 import os
+import sys
 
 from hashtable import Hashtable, KeyValuePair
+from music_search import SearchIndex, normalize_name, normalize_track_name
 
 
-class Track:
+class Track(metaclass=ABCMeta):
     """
     A Track represents an audio file, with a name (including the extension, such as "01 Track.m4p") and a
     filename that includes a relative path to the file.
@@ -29,7 +44,7 @@ class Track:
         shutil.copy(self.file_with_path,new_file_path)
 
 
-class Album:
+class Album(metaclass=ABCMeta):
     """
     An album that has an Artist, AlbumName, ReleaseDate, and a set of Tracks.
     """
@@ -60,10 +75,373 @@ class Album:
         :param new_dir: The new directory to write this albums tracks to.
         :return: None
         """
-        prefix = f"{self.release_date}_{self.artist}_{self.album_name}_"
+        prefix = self.playlist_prefix()
         for track in self.tracks:
             track.copy_track_to_new_directory(new_dir, prefix)
 
+    def playlist_prefix(self) -> str:
+        """
+        :return: What goes before each track name when this album is written to a playlist
+        """
+        return f"{self.release_date}_{self.artist}_{self.album_name}_"
+
+
+
+def _replacing(link):
+    """
+    Internal helper that makes a link function overwrite an existing file, like shutil.copy does.
+    """
+    def export(source, destination):
+        try:
+            link(source, destination)
+        except FileExistsError:
+            os.remove(destination)
+            link(source, destination)
+    return export
+
+
+def fast_copy(source: str, destination: str) -> None:
+    """
+    Copies a file without moving its bytes through Python: os.copy_file_range lets the kernel do
+    the copy, and share the blocks instead (a reflink) on file systems that can, such as btrfs and XFS.
+    Falls back to shutil.copyfile (which itself uses os.sendfile on Linux) where that isn't supported.
+    The copy is written next to the destination and then renamed over it, so a hard link or symlink
+    left there by an earlier export is replaced rather than written through (which would truncate the source).
+    :param source: The file to copy
+    :param destination: Where to write the copy
+    """
+    partial_file = destination + '.part'
+    if os.path.lexists(partial_file):
+        os.remove(partial_file)
+    try:
+        _copy_file(source, partial_file)
+        os.replace(partial_file, destination)
+    except BaseException:
+        if os.path.lexists(partial_file):
+            os.remove(partial_file)
+        raise
+
+
+def _copy_file(source: str, destination: str) -> None:
+    """
+    Internal helper for fast_copy that copies a file to a new destination.
+    """
+    if hasattr(os, 'copy_file_range'):
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            try:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                else:
+                    return
+            except OSError:
+                pass  ## e.g. different file systems on an old kernel; start again the usual way
+    shutil.copyfile(source, destination)
+
+
+EXPORT_STRATEGIES = {
+    'copy': shutil.copy,
+    'fastcopy': fast_copy,
+    'hardlink': _replacing(os.link),
+    'symlink': _replacing(lambda source, destination: os.symlink(os.path.abspath(source), destination)),
+}
+"""How write_playlist can put a track into a playlist: name -> function(source, destination).
+'copy' is a full copy (the default); 'fastcopy' lets the kernel copy (or reflink) the file;
+'hardlink' and 'symlink' don't copy any data (hard links need the playlist on the same file system)."""
+
+
+def _run_bounded(function, items, workers: int) -> None:
+    """
+    Internal helper that calls function(item) for every item on a pool of threads, keeping only
+    a few calls queued per thread so a huge (or lazy) list of items isn't all submitted at once.
+    The first exception raised by a call is raised here.
+    :param function: The function to call
+    :param items: An iterable of arguments
+    :param workers: The number of threads
+    """
+    if workers <= 1:
+        for item in items:
+            function(item)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for item in items:
+            if len(pending) >= workers * 4:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            pending.add(executor.submit(function, item))
+        for future in pending:
+            future.result()
+
+
+_SNAPSHOT_MAGIC = b'MUSICIX1'
+_U32 = 'I' if array('I').itemsize == 4 else 'L'
+_I32 = 'i' if array('i').itemsize == 4 else 'l'
+
+
+def _write_varint(f, value: int) -> None:
+    """
+    Internal helper that writes a non-negative int in as few bytes as it needs, 7 bits per byte.
+    """
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    f.write(out)
+
+
+def _read_varint(f) -> int:
+    """
+    Internal helper that reads an int written by _write_varint.
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = f.read(1)
+        if not byte:
+            raise ValueError("Truncated MusicIndex snapshot")
+        value |= (byte[0] & 0x7F) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+def _write_column(f, column: array) -> None:
+    """
+    Internal helper that writes an array of 4-byte ints: its length as a varint, then the raw little-endian ints.
+    """
+    _write_varint(f, len(column))
+    if sys.byteorder == 'big':
+        column = array(column.typecode, column)
+        column.byteswap()
+    f.write(column.tobytes())
+
+
+def _read_column(f, typecode: str) -> array:
+    """
+    Internal helper that reads an array written by _write_column.
+    """
+    column = array(typecode)
+    count = _read_varint(f)
+    data = f.read(count * column.itemsize)
+    if len(data) != count * column.itemsize:
+        raise ValueError("Truncated MusicIndex snapshot")
+    column.frombytes(data)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column
+
+
+def _pack_date(release_date: str) -> int:
+    """
+    Internal helper that packs a "YYYY-MM" date into one int (year * 12 + month), or returns 0 if
+    the date isn't in that form.
+    """
+    if len(release_date) == 7 and release_date[4] == '-' and release_date[:4].isdigit() \
+            and release_date[5:].isdigit() and 1 <= int(release_date[5:]) <= 12:
+        return int(release_date[:4]) * 12 + int(release_date[5:])
+    return 0
+
+
+def _unpack_date(packed: int) -> str:
+    """
+    Internal helper that turns an int from _pack_date back into a "YYYY-MM" date.
+    """
+    year, month = divmod(packed - 1, 12)
+    return f"{year:04d}-{month + 1:02d}"
+
+
+class TrackView:
+    """
+    A Track stored in a Catalog; its name and path are looked up in the catalog's columns when read.
+    It is registered as a Track rather than inheriting from one, so it really has only its two slots.
+    """
+    __slots__ = ('_catalog', '_number')
+
+    copy_track_to_new_directory = Track.copy_track_to_new_directory
+
+    def __init__(self, catalog: 'Catalog', number: int):
+        self._catalog = catalog
+        self._number = number
+
+    @property
+    def name(self) -> str:
+        """The track name from the file, something like '04 Okay.m4p'"""
+        catalog = self._catalog
+        return catalog._string(catalog._track_name_ids[self._number])
+
+    @property
+    def file_with_path(self) -> str:
+        """The file path to the audio file for this track """
+        catalog = self._catalog
+        folder_id = catalog._track_folder_ids[self._number]
+        if folder_id < 0:
+            return catalog._string(-1 - folder_id)
+        return join(catalog._string(folder_id), self.name)
+
+    def __eq__(self, other):
+        return isinstance(other, TrackView) and other._catalog is self._catalog and other._number == self._number
+
+    def __hash__(self):
+        return hash((id(self._catalog), self._number))
+
+
+class AlbumView:
+    """
+    An Album stored in a Catalog; its fields are looked up in the catalog's columns when read,
+    and its tracks are TrackViews. Like TrackView, it is registered as an Album and borrows its methods.
+    """
+    __slots__ = ('_catalog', '_number')
+
+    __repr__ = Album.__repr__
+    write_to_new_dir = Album.write_to_new_dir
+    playlist_prefix = Album.playlist_prefix
+
+    def __init__(self, catalog: 'Catalog', number: int):
+        self._catalog = catalog
+        self._number = number
+
+    @property
+    def artist(self) -> str:
+        """The Artist who produced this album"""
+        return self._catalog._string(self._catalog._artist_ids[self._number])
+
+    @property
+    def release_date(self) -> str:
+        """The Year/Month of the release of this album; YYYY-MM"""
+        date = self._catalog._dates[self._number]
+        return _unpack_date(date) if date > 0 else self._catalog._string(-1 - date)
+
+    @property
+    def album_name(self) -> str:
+        """Name of the Album"""
+        return self._catalog._string(self._catalog._album_name_ids[self._number])
+
+    @property
+    def tracks(self) -> [TrackView]:
+        """A list of the tracks on this album"""
+        starts = self._catalog._track_starts
+        return [TrackView(self._catalog, number) for number in range(starts[self._number], starts[self._number + 1])]
+
+    def __eq__(self, other):
+        return isinstance(other, AlbumView) and other._catalog is self._catalog and other._number == self._number
+
+    def __hash__(self):
+        return hash((id(self._catalog), self._number))
+
+
+Track.register(TrackView)
+Album.register(AlbumView)
+
+
+class Catalog:
+    """
+    Compact, column-oriented storage for a large library, read back through AlbumViews and TrackViews.
+    It uses the same layout as a MusicIndex snapshot: strings are kept UTF-8 encoded in one shared
+    buffer (each artist and album folder only once), albums and tracks are rows of 4-byte ints pointing
+    into it, and release dates are packed into ints. A track stores its name and its album's folder,
+    rather than a whole path. Rows are only ever added.
+    """
+
+    def __init__(self):
+        self._text = bytearray()
+        """Every string, UTF-8 encoded, each followed by a NUL"""
+        self._text_starts = array(_U32)
+        """String id -> where that string starts in self._text"""
+        self._string_ids = {}
+        """Interned string -> its string id"""
+        self._artist_ids = array(_U32)
+        """Album number -> string id of its artist"""
+        self._album_name_ids = array(_U32)
+        """Album number -> string id of its name"""
+        self._dates = array(_I32)
+        """Album number -> its release date, packed by _pack_date, or -(string id + 1) if it doesn't pack"""
+        self._track_starts = array(_U32, [0])
+        """Album number -> its first track number; the album's tracks end where the next album's start"""
+        self._track_name_ids = array(_U32)
+        """Track number -> string id of its name"""
+        self._track_folder_ids = array(_I32)
+        """Track number -> string id of its folder, or -(string id + 1) of its whole path if that
+        doesn't end with the track name"""
+
+    def __len__(self) -> int:
+        """
+        :return: The number of albums in the catalog
+        """
+        return len(self._artist_ids)
+
+    def __getitem__(self, number: int) -> AlbumView:
+        """
+        :param number: The album number, in the order the albums were added
+        :return: A view of the album
+        """
+        if not 0 <= number < len(self._artist_ids):
+            raise IndexError(f"Catalog has no album {number}")
+        return AlbumView(self, number)
+
+    def __iter__(self):
+        for number in range(len(self._artist_ids)):
+            yield AlbumView(self, number)
+
+    @property
+    def num_tracks(self) -> int:
+        """The number of tracks in the catalog"""
+        return len(self._track_name_ids)
+
+    def _string(self, string_id: int) -> str:
+        """
+        Internal helper that reads a string out of the shared buffer.
+        """
+        start = self._text_starts[string_id]
+        return self._text[start:self._text.index(0, start)].decode('utf-8')
+
+    def _add_string(self, text: str, intern: bool = True) -> int:
+        """
+        Internal helper that stores a string, or finds it if it was interned before.
+        :param intern: Look for (and remember) an equal string, for strings that repeat
+        :return: The string id
+        """
+        if intern:
+            string_id = self._string_ids.get(text)
+            if string_id is not None:
+                return string_id
+        string_id = len(self._text_starts)
+        self._text_starts.append(len(self._text))
+        self._text += text.encode('utf-8')
+        self._text.append(0)
+        if intern:
+            self._string_ids[text] = string_id
+        return string_id
+
+    def add_album(self, album: Album) -> AlbumView:
+        """
+        Copies an album and its tracks into the catalog.
+        :param album: The Album
+        :return: A view of the copy
+        """
+        ## Only artists and odd dates are interned across albums; keeping every folder and album name
+        ##   in self._string_ids would take more memory than storing the few repeats twice
+        self._artist_ids.append(self._add_string(album.artist))
+        self._album_name_ids.append(self._add_string(album.album_name, intern=False))
+        self._dates.append(_pack_date(album.release_date) or -1 - self._add_string(album.release_date))
+        folder_ids = {}  ## An album's tracks are almost always all in one folder
+        for track in album.tracks:
+            self._track_name_ids.append(self._add_string(track.name, intern=False))
+            folder = dirname(track.file_with_path)
+            if join(folder, track.name) == track.file_with_path:
+                folder_id = folder_ids.get(folder)
+                if folder_id is None:
+                    folder_id = folder_ids[folder] = self._add_string(folder, intern=False)
+                self._track_folder_ids.append(folder_id)
+            else:
+                self._track_folder_ids.append(-1 - self._add_string(track.file_with_path, intern=False))
+        self._track_starts.append(len(self._track_name_ids))
+        return AlbumView(self, len(self._artist_ids) - 1)
 
 
 class MusicIndex(Hashtable):
@@ -71,9 +449,325 @@ class MusicIndex(Hashtable):
     A data structure that stores Albums efficiently, keyed by the release date.
     A MusicIndex extends a Hashtable, with a KVP where the Key is the ReleaseDate
     and the value is a list of Albums.
+    Alongside the hashtable it keeps the release dates in sorted order, so a range of
+    dates can be found with a binary search instead of scanning every bucket, and secondary
+    Hashtables keyed by artist, album name and track name (see normalize_name), and a full-text
+    SearchIndex. Those are built the first time they are queried, so building or loading an index
+    that is never searched that way costs nothing extra; from then on every change keeps them up to date.
+    An index can also keep its albums in a Catalog, which takes far less memory for a big library.
     """
-    def __init__(self):
+    def __init__(self, catalog: Catalog = None):
+        """
+        :param catalog: If given, add_album copies each album into this Catalog and stores a view
+            of the copy, instead of the Album itself
+        """
         super().__init__()
+        self.catalog = catalog
+        """The Catalog that add_album stores albums in, or None to store the Albums themselves"""
+        self._dates = []
+        """Every release date stored in this index, sorted; "YYYY-MM" strings sort by date"""
+        self._by_artist = None
+        """Normalized artist name -> list of that artist's Albums; None until first queried"""
+        self._by_album_name = None
+        """Normalized album name -> list of Albums with that name; None until first queried"""
+        self._by_track_name = None
+        """Normalized track name -> list of (Album, Track) tuples for tracks with that name; None until first queried"""
+        self._search_index = None
+        """Full-text index over every name; None until first searched"""
+
+    def put(self, key: str, value):
+        """
+        Put a release date and its list of Albums into the index, keeping the sorted dates and
+        the secondary indexes up to date.
+        :param key: The release date
+        :param value: The list of Albums released then
+        :return:
+        """
+        num_elements = self.num_elements
+        indexed = self._by_artist is not None or self._search_index is not None
+        replaced = self.get(key) if indexed else None
+        super().put(key, value)
+        if self.num_elements != num_elements:
+            ## There are only as many dates as distinct release months, so inserting into a list is cheap
+            insort(self._dates, key)
+        if indexed:
+            for album in replaced or ():
+                self._unindex_album(album)
+            for album in value:
+                self._index_album(album)
+
+    def remove(self, key: str) -> KeyValuePair:
+        """
+        Remove a release date and its Albums from the index.
+        :param key: The release date
+        :return: The KeyValuePair that was removed.
+        """
+        removed = super().remove(key)
+        del self._dates[bisect_left(self._dates, key)]
+        if self._by_artist is not None or self._search_index is not None:
+            for album in removed.value:
+                self._unindex_album(album)
+        return removed
+
+    def clear(self) -> None:
+        """
+        Removes every Album from this index.
+        """
+        super().clear()
+        self._dates = []
+        self._by_artist = self._by_album_name = self._by_track_name = None
+        self._search_index = None
+
+    @staticmethod
+    def _add_to(index: Hashtable, key: str, item) -> None:
+        """
+        Internal helper that appends an item to the list stored under a key in a secondary index.
+        """
+        items = index.get(key)
+        if items is None:
+            index.put(key, [item])
+        else:
+            items.append(item)
+
+    @staticmethod
+    def _remove_from(index: Hashtable, key: str, item) -> None:
+        """
+        Internal helper that takes an item back out of the list stored under a key in a secondary index.
+        """
+        items = index.get(key)
+        if items is None:
+            return
+        for position, stored in enumerate(items):
+            if stored is item or stored == item:
+                del items[position]
+                break
+        if not items:
+            index.remove(key)
+
+    def _index_album(self, album: Album) -> None:
+        """
+        Internal helper that adds an album (and its tracks) to the secondary indexes, if they are built.
+        """
+        if self._search_index is not None:
+            self._search_index.add_album(album)
+        if self._by_artist is None:
+            return
+        self._add_to(self._by_artist, normalize_name(album.artist), album)
+        self._add_to(self._by_album_name, normalize_name(album.album_name), album)
+        for track in album.tracks:
+            self._add_to(self._by_track_name, normalize_track_name(track.name), (album, track))
+
+    def _unindex_album(self, album: Album) -> None:
+        """
+        Internal helper that takes an album (and its tracks) back out of the secondary indexes, if they are built.
+        """
+        if self._search_index is not None:
+            self._search_index.remove_album(album)
+        if self._by_artist is None:
+            return
+        self._remove_from(self._by_artist, normalize_name(album.artist), album)
+        self._remove_from(self._by_album_name, normalize_name(album.album_name), album)
+        for track in album.tracks:
+            self._remove_from(self._by_track_name, normalize_track_name(track.name), (album, track))
+
+    def _secondary_indexes(self) -> None:
+        """
+        Internal helper that builds the secondary indexes from every album, unless they already exist.
+        """
+        if self._by_artist is not None:
+            return
+        by_artist, by_album_name, by_track_name = {}, {}, {}
+        artist_keys = {}
+        gc_was_enabled = gc.isenabled()
+        gc.disable()  ## Like load: millions of new lists and KeyValuePairs, none of them garbage
+        try:
+            ## Group everything first, so each secondary index is sized once and gets one put per key
+            for release_date in self._dates:
+                for album in self.get(release_date):
+                    artist_key = artist_keys.get(album.artist)
+                    if artist_key is None:
+                        artist_key = artist_keys[album.artist] = normalize_name(album.artist)
+                    by_artist.setdefault(artist_key, []).append(album)
+                    by_album_name.setdefault(normalize_name(album.album_name), []).append(album)
+                    for track in album.tracks:
+                        by_track_name.setdefault(normalize_track_name(track.name), []).append((album, track))
+            self._by_artist = Hashtable.from_items(by_artist.items())
+            self._by_album_name = Hashtable.from_items(by_album_name.items())
+            self._by_track_name = Hashtable.from_items(by_track_name.items())
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def albums_by_artist(self, artist: str) -> [Album]:
+        """
+        Returns all the albums by an artist, in the order they were added.
+        :param artist: The artist; matched ignoring case, accents and extra spaces
+        :return: A list of Albums (empty if there are none)
+        """
+        self._secondary_indexes()
+        return list(self._by_artist.get(normalize_name(artist), ()))
+
+    def albums_named(self, album_name: str) -> [Album]:
+        """
+        Returns all the albums with a name, whoever released them.
+        :param album_name: The album name; matched ignoring case, accents and extra spaces
+        :return: A list of Albums (empty if there are none)
+        """
+        self._secondary_indexes()
+        return list(self._by_album_name.get(normalize_name(album_name), ()))
+
+    def tracks_named(self, track_name: str) -> list:
+        """
+        Returns every track with a name, on any album.
+        :param track_name: The track name, with or without its number and file extension
+            ("Debaser", "01 Debaser.m4a"); matched ignoring case, accents and extra spaces
+        :return: A list of (Album, Track) tuples (empty if there are none)
+        """
+        self._secondary_indexes()
+        return list(self._by_track_name.get(normalize_track_name(track_name), ()))
+
+    def search(self, query: str, limit: int = 10, prefix: bool = True) -> list:
+        """
+        Finds tracks by words from their artist, album and track names, such as "float on" or
+        "modest mo"; see SearchIndex.search.
+        :param query: The words to look for; every one must match, and the last may be the start of a word
+        :param limit: The most results to return
+        :param prefix: Let the last word of the query match the start of a longer word
+        :return: A list of (Album, Track) tuples, best match first; Track is None for an album without tracks
+        """
+        if self._search_index is None:
+            self._search_index = SearchIndex(album for release_date in self._dates for album in self.get(release_date))
+        return self._search_index.search(query, limit, prefix)
+
+    def range(self, start_date: str, end_date: str):
+        """
+        Returns the Albums released between two dates, in release date order.
+        Finding the dates costs O(log n), then each date is a single hashtable lookup.
+        :param start_date: The start date (inclusive), in YYYY-MM format
+        :param end_date: The end date (inclusive), in YYYY-MM format
+        :return: A generator of Albums
+        """
+        dates = self._dates
+        for index in range(bisect_left(dates, start_date), bisect_right(dates, end_date)):
+            yield from self.get(dates[index], [])
+
+    def save(self, path: str) -> None:
+        """
+        Writes this index to a compact binary snapshot that MusicIndex.load can read back.
+        Every string (artist, album name, track name, track folder) is stored once in a string
+        table; albums and tracks are stored as columns of 4-byte ints pointing into it, with
+        release dates packed into ints, so loading is mostly a few bulk reads.
+        :param path: The file to write
+        :return:
+        """
+        string_ids = {}
+        intern = lambda text: string_ids.setdefault(text, len(string_ids))
+        artist_ids, album_name_ids, dates, track_counts = array(_U32), array(_U32), array(_I32), array(_U32)
+        track_name_ids, track_folder_ids = array(_U32), array(_I32)
+        for release_date in self._dates:
+            for album in self.get(release_date):
+                artist_ids.append(intern(album.artist))
+                album_name_ids.append(intern(album.album_name))
+                ## A date that doesn't pack is stored as -(string id + 1)
+                dates.append(_pack_date(release_date) or -1 - intern(release_date))
+                track_counts.append(len(album.tracks))
+                for track in album.tracks:
+                    track_name_ids.append(intern(track.name))
+                    folder = dirname(track.file_with_path)
+                    if join(folder, track.name) == track.file_with_path:
+                        track_folder_ids.append(intern(folder))
+                    else:
+                        ## The path doesn't end with the track name; store all of it
+                        track_folder_ids.append(-1 - intern(track.file_with_path))
+        strings = '\0'.join(string_ids).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(_SNAPSHOT_MAGIC)
+            _write_varint(f, len(string_ids))
+            _write_varint(f, len(strings))
+            f.write(strings)
+            for column in (artist_ids, album_name_ids, dates, track_counts, track_name_ids, track_folder_ids):
+                _write_column(f, column)
+
+    @classmethod
+    def load(cls, path: str, columnar: bool = False) -> 'MusicIndex':
+        """
+        Reads an index written by MusicIndex.save.
+        :param path: The snapshot file
+        :param columnar: Keep the albums in a Catalog (see MusicIndex.catalog), which the snapshot's
+            columns go into almost as they are, instead of making an Album and Tracks for each
+        :return: A new MusicIndex holding the same albums
+        """
+        with open(path, 'rb') as f:
+            if f.read(len(_SNAPSHOT_MAGIC)) != _SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a MusicIndex snapshot")
+            num_strings = _read_varint(f)
+            text = f.read(_read_varint(f))
+            artist_ids, album_name_ids = _read_column(f, _U32), _read_column(f, _U32)
+            dates, track_counts = _read_column(f, _I32), _read_column(f, _U32)
+            track_name_ids, track_folder_ids = _read_column(f, _U32), _read_column(f, _I32)
+        catalog = None
+        if columnar:
+            ## The snapshot's string table and columns are already laid out the way a Catalog keeps them,
+            ##   so its strings are only decoded when they are read
+            text.decode('utf-8')  ## Still reject a damaged table now
+            encoded_strings = text.split(b'\0') if num_strings else []
+            if len(encoded_strings) != num_strings:
+                raise ValueError(f"{path} has a damaged string table")
+            catalog = Catalog()
+            if num_strings:
+                catalog._text = bytearray(text)
+                catalog._text.append(0)
+                ## Each string starts just past the NUL that ends the one before
+                catalog._text_starts = array(_U32, accumulate(map((1).__add__, map(len, encoded_strings[:-1])),
+                                                              initial=0))
+            del encoded_strings
+            string = catalog._string
+            ## Loaded strings aren't interned, so albums added later don't share them; that only costs space
+            catalog._artist_ids, catalog._album_name_ids, catalog._dates = artist_ids, album_name_ids, dates
+            catalog._track_starts = array(_U32, accumulate(track_counts, initial=0))
+            catalog._track_name_ids, catalog._track_folder_ids = track_name_ids, track_folder_ids
+        else:
+            strings = text.decode('utf-8').split('\0') if num_strings else []
+            if len(strings) != num_strings:
+                raise ValueError(f"{path} has a damaged string table")
+            string = strings.__getitem__
+
+        ## Loading makes millions of objects and no garbage; without this the cyclic garbage
+        ##   collector would keep scanning them all, which takes longer than the loading itself
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            if catalog is None:
+                all_tracks = [Track(strings[name_id], join(strings[folder_id], strings[name_id])
+                                    if folder_id >= 0 else strings[-1 - folder_id])
+                              for name_id, folder_id in zip(track_name_ids, track_folder_ids)]
+            music_index = cls(catalog)
+            ## Every album of a date is saved together, so each date is only unpacked once, and each
+            ##   run of albums is built by map() rather than a loop over the albums
+            if catalog is None:
+                track_starts = list(accumulate(track_counts, initial=0))
+                album_tracks = list(map(all_tracks.__getitem__, map(slice, track_starts, track_starts[1:])))
+            start = 0
+            for date, run in groupby(dates):
+                end = start + len(list(run))
+                release_date = _unpack_date(date) if date > 0 else string(-1 - date)
+                if catalog is None:
+                    run_albums = list(map(Album, map(strings.__getitem__, artist_ids[start:end]),
+                                          repeat(release_date, end - start),
+                                          map(strings.__getitem__, album_name_ids[start:end]),
+                                          album_tracks[start:end]))
+                else:
+                    run_albums = list(map(AlbumView, repeat(catalog, end - start), range(start, end)))
+                albums = music_index.get(release_date)
+                if albums is None:
+                    music_index.put(release_date, run_albums)
+                else:
+                    albums.extend(run_albums)
+                start = end
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return music_index
 
     def add_album(self, album: Album):
         """
@@ -87,13 +781,14 @@ class MusicIndex(Hashtable):
         ## Otherwise, put this album into a new list and store in the index.
         ## Hint: Be sure to use your Hashtable.get() and Hashtable.put() functions!
         # 找到目標 bucket
-        if self.key_exists(album.release_date):
-            albums = self.get(album.release_date)
-            albums.append(album)
-            self.put(album.release_date, albums)
-            self.num_elements -= 1
-        else:
+        if self.catalog is not None:
+            album = self.catalog.add_album(album)
+        albums = self.get(album.release_date)  ## One lookup: the stored list is updated in place
+        if albums is None:
             self.put(album.release_date, [album])
+        else:
+            albums.append(album)
+            self._index_album(album)
         '''
         target_bucket = hash(album.release_date) % self.num_buckets
         bucket = self.buckets[target_bucket]
@@ -134,10 +829,7 @@ class MusicIndex(Hashtable):
                     return kvp.value
             return objects
             '''
-            if self.key_exists(release_date):
-                return self.get(release_date)
-            else:
-                return []
+            return self.get(release_date, [])
         except KeyError:
             return []
         
@@ -153,22 +845,119 @@ class MusicIndex(Hashtable):
             music_set = item.value
             music_set.print()
 
-    def write_playlist(self, base_dir, start_date: str = "1900-01", end_date: str = "2025-01"):
+    def write_playlist(self, base_dir, start_date: str = "1900-01", end_date: str = "2025-01",
+                       strategy: str = 'copy', workers: int = 1):
         """
         Write out a playlist to a specified location. The playlist will be written to a folder
         of the format "Music {start_date} through {end_date}" in the base_dir folder.
         :param base_dir: Where the new playlist folder should be created
         :param start_date: The start date (inclusive) of albums to write, in YYYY-MM format
         :param end_date: The end date (inclusive) of albums to write, in YYYY-MM format
+        :param strategy: How each track gets into the playlist; one of EXPORT_STRATEGIES
+            ('copy', 'fastcopy', 'hardlink' or 'symlink'); defaults to 'copy'.
+        :param workers: How many tracks to export at once; defaults to 1.
         :return:
         """
+        if strategy not in EXPORT_STRATEGIES:
+            raise ValueError(f"Unknown export strategy {strategy!r}; expected one of {sorted(EXPORT_STRATEGIES)}")
         playlist_dir = join(base_dir,f"Music {start_date} through {end_date}")
         makedirs(playlist_dir,exist_ok=True)
-        for item in self:
-            release_date=item.key
-            if start_date <= release_date <= end_date:
-                for album in item.value:
-                    album.write_to_new_dir(playlist_dir)
+        if strategy == 'copy' and workers <= 1:
+            for album in self.range(start_date, end_date):
+                album.write_to_new_dir(playlist_dir)
+            return
+        ## The folder was made once above, so each job is just the one file operation
+        export = EXPORT_STRATEGIES[strategy]
+        jobs = ((track.file_with_path, join(playlist_dir, f"{album.playlist_prefix()}{track.name}"))
+                for album, track in self.playlist_tracks(start_date, end_date))
+        _run_bounded(lambda job: export(*job), jobs, workers)
+
+    async def write_playlist_async(self, base_dir, start_date: str = "1900-01", end_date: str = "2025-01",
+                                   strategy: str = 'copy', workers: int = 4, progress=None, executor=None) -> int:
+        """
+        Like write_playlist, for use in an asyncio program: the tracks are exported on threads,
+        at most `workers` at once, so the event loop is never blocked.
+        Cancelling the task stops the export: tracks not yet started are skipped (the playlist is
+        left partly written), and the CancelledError is raised here.
+        :param base_dir: Where the new playlist folder should be created
+        :param start_date: The start date (inclusive) of albums to write, in YYYY-MM format
+        :param end_date: The end date (inclusive) of albums to write, in YYYY-MM format
+        :param strategy: How each track gets into the playlist; one of EXPORT_STRATEGIES
+        :param workers: How many tracks to export at once
+        :param progress: If given, called on the event loop as progress('write', tracks done, total tracks)
+            after each track
+        :param executor: The executor to export on; defaults to a new pool of `workers` threads
+        :return: The number of tracks written
+        """
+        if strategy not in EXPORT_STRATEGIES:
+            raise ValueError(f"Unknown export strategy {strategy!r}; expected one of {sorted(EXPORT_STRATEGIES)}")
+        playlist_dir = join(base_dir, f"Music {start_date} through {end_date}")
+        await asyncio.get_running_loop().run_in_executor(executor, partial(makedirs, playlist_dir, exist_ok=True))
+        jobs = [(track.file_with_path, join(playlist_dir, f"{album.playlist_prefix()}{track.name}"))
+                for album, track in self.playlist_tracks(start_date, end_date)]
+        done = 0
+        async with aclosing(_map_async(EXPORT_STRATEGIES[strategy], jobs, workers, executor, ordered=False)) as results:
+            async for _ in results:
+                done += 1
+                if progress is not None:
+                    progress('write', done, len(jobs))
+        return done
+
+    def playlist_tracks(self, start_date: str = "1900-01", end_date: str = "2025-01"):
+        """
+        Returns every track of the albums released between two dates, in release date order.
+        :param start_date: The start date (inclusive), in YYYY-MM format
+        :param end_date: The end date (inclusive), in YYYY-MM format
+        :return: A generator of (Album, Track) tuples
+        """
+        for album in self.range(start_date, end_date):
+            for track in album.tracks:
+                yield album, track
+
+    def write_playlist_manifest(self, output, start_date: str = "1900-01", end_date: str = "2025-01",
+                                playlist_format: str = None) -> int:
+        """
+        Writes a playlist as a list of the tracks' paths instead of copies of the audio files.
+        Lines are written as the index is walked, so nothing is built up in memory.
+        :param output: A file name, or an open text file to write to
+        :param start_date: The start date (inclusive) of albums to list, in YYYY-MM format
+        :param end_date: The end date (inclusive) of albums to list, in YYYY-MM format
+        :param playlist_format: 'm3u', 'jsonl' or 'csv'; defaults to going by the file extension
+            (.m3u/.m3u8, .jsonl or .csv). Required when output is an open file.
+        :return: The number of tracks written
+        """
+        if playlist_format is None:
+            if not isinstance(output, str):
+                raise ValueError("playlist_format is needed when writing to an open file")
+            extension = os.path.splitext(output)[1].lower()
+            playlist_format = {'.m3u': 'm3u', '.m3u8': 'm3u', '.jsonl': 'jsonl', '.csv': 'csv'}.get(extension)
+        if playlist_format not in ('m3u', 'jsonl', 'csv'):
+            raise ValueError(f"Unknown playlist format {playlist_format!r}; expected 'm3u', 'jsonl' or 'csv'")
+        if isinstance(output, str):
+            with open(output, 'w', encoding='utf-8', newline='') as f:
+                return self.write_playlist_manifest(f, start_date, end_date, playlist_format)
+
+        count = 0
+        tracks = self.playlist_tracks(start_date, end_date)
+        if playlist_format == 'm3u':
+            output.write("#EXTM3U\n")
+            for album, track in tracks:
+                output.write(f"#EXTINF:-1,{album.artist} - {track.name}\n{os.path.abspath(track.file_with_path)}\n")
+                count += 1
+        elif playlist_format == 'jsonl':
+            for album, track in tracks:
+                output.write(json.dumps({'release_date': album.release_date, 'artist': album.artist,
+                                         'album': album.album_name, 'track': track.name,
+                                         'path': os.path.abspath(track.file_with_path)}) + "\n")
+                count += 1
+        else:
+            writer = csv.writer(output)
+            writer.writerow(['release_date', 'artist', 'album', 'track', 'path'])
+            for album, track in tracks:
+                writer.writerow([album.release_date, album.artist, album.album_name, track.name,
+                                 os.path.abspath(track.file_with_path)])
+                count += 1
+        return count
 
 
 def get_release_date_from_file(fileptr):
@@ -212,13 +1001,13 @@ def get_release_date(artist, album, music_library_folder='') -> str:
     album_folder = join(music_library_folder, album)  # 正確拼接 album 文件夾
     details_file = join(album_folder, "details.txt")
 
-    # 檢查 details.txt 是否存在
-    if not isfile(details_file):
-        raise FileNotFoundError(f"Expected details file not found: {details_file}")
-
     # 讀取 details.txt 的第一行作為 release date
-    with open(details_file, 'r') as f:
-        return f.readline().strip()
+    ## No isfile() check first: open() already fails if it is missing, without an extra stat
+    try:
+        with open(details_file, 'r') as f:
+            return f.readline().strip()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Expected details file not found: {details_file}") from None
 
 
 def get_album_from_folder(album_name, album_folder, artist) -> Album:
@@ -229,12 +1018,15 @@ def get_album_from_folder(album_name, album_folder, artist) -> Album:
     :param artist: The artist who released this album
     :return: An Album containing all the Tracks
     """
-    release_date = get_release_date(artist, album_name, album_folder)
-    tracks = [
-        Track(name=track, path=join(album_folder, track))
-        for track in listdir(album_folder)
-        if isfile(join(album_folder, track)) and track != "details.txt"
-    ]
+    ## get_release_date joins album_name onto the folder it is given, so hand it the artist folder
+    release_date = get_release_date(artist, album_name, dirname(album_folder))
+    ## scandir gets each entry's type along with its name, so telling tracks from folders needs no stat
+    with scandir(album_folder) as entries:
+        tracks = [
+            Track(name=entry.name, path=entry.path)
+            for entry in entries
+            if entry.is_file() and entry.name != "details.txt"
+        ]
     return Album(artist=artist, release_date=release_date, album_name=album_name, tracks=tracks)
     '''
     details_file = join(album_folder, "details.txt")
@@ -251,48 +1043,158 @@ def get_album_from_folder(album_name, album_folder, artist) -> Album:
     return Album(artist=artist, release_date=release_date, album_name=album_name, tracks=tracks)
     '''
     
-def get_albums_for_artist(artist, artist_folder) -> [Album]:
+def _load_album(album_name, album_folder, artist):
     """
-    Returns all the albums for a given artist with data in the given artist_folder
+    Internal helper that loads an album with get_album_from_folder, printing a warning instead of
+    failing if the folder isn't a valid album.
+    :return: The Album, or None if it couldn't be loaded
+    """
+    try:
+        # 嘗試從文件夾中加載專輯
+        return get_album_from_folder(album_name, album_folder, artist)
+    except FileNotFoundError as e:
+        # 專輯缺少 details.txt 或其他問題，忽略這個文件夾
+        print(f"Warning: Could not load album from {album_folder}: {e}")
+    except Exception as e:
+        # 捕捉其他潛在問題
+        print(f"Error: Unexpected issue with {album_folder}: {e}")
+    return None
+
+
+def iter_albums_for_artist(artist, artist_folder):
+    """
+    Yields the albums for a given artist with data in the given artist_folder, one at a time as
+    they are loaded.
     :param artist: The Artist to load Albums for
     :param artist_folder: The folder where the artist's album live
-    :return: A list of Albums
+    :return: A generator of Albums
     """
-    albums = []
-
     try:
         # 遍歷 artist_folder 下的所有專輯文件夾
-        for album_name in listdir(artist_folder):
-            album_folder = join(artist_folder, album_name)
-            
-            # 檢查是否為有效的專輯文件夾
-            if isdir(album_folder):
-                try:
-                    # 嘗試從文件夾中加載專輯
-                    album = get_album_from_folder(album_name, album_folder, artist)
-                    albums.append(album)
-                except FileNotFoundError as e:
-                    # 專輯缺少 details.txt 或其他問題，忽略這個文件夾
-                    print(f"Warning: Could not load album from {album_folder}: {e}")
-                except Exception as e:
-                    # 捕捉其他潛在問題
-                    print(f"Error: Unexpected issue with {album_folder}: {e}")
+        ## Read the folder in one pass; is_dir() uses the type scandir already got, so no stat per album
+        with scandir(artist_folder) as entries:
+            album_entries = [entry for entry in entries if entry.is_dir()]  # 檢查是否為有效的專輯文件夾
     except FileNotFoundError as e:
         print(f"Error: Artist folder not found: {artist_folder}")
+        return
     except Exception as e:
         print(f"Error: Unexpected issue with artist folder {artist_folder}: {e}")
+        return
+    for entry in album_entries:
+        album = _load_album(entry.name, entry.path, artist)
+        if album is not None:
+            yield album
 
-    return albums
 
+def get_albums_for_artist(artist, artist_folder) -> [Album]:
+    """
+    Returns all the albums for a given artist with data in the given artist_folder
+    :param artist: The Artist to load Albums for
+    :param artist_folder: The folder where the artist's album live
+    :return: A list of Albums
+    """
+    return list(iter_albums_for_artist(artist, artist_folder))
 
 
-def get_albums(starting_dir: str) -> [Album]:
+def _iter_bounded(function, arguments, workers: int):
+    """
+    Internal helper that calls function(*args) for each args in arguments on a pool of threads,
+    yielding the results in order. Only a few calls run ahead of the result being consumed, so
+    results don't pile up when the consumer is slower than the scanning.
+    """
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        for args in arguments:
+            pending.append(executor.submit(function, *args))
+            if len(pending) > workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        ## If the consumer stops early, don't start the calls still queued
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def _map_async(function, arguments, workers: int, executor=None, ordered: bool = True):
+    """
+    Internal helper, the asyncio version of _iter_bounded: runs function(*args) for each args in
+    arguments on threads, at most `workers` at once, and yields the results without ever blocking
+    the event loop. If the caller is cancelled (or stops early), calls that haven't started are
+    cancelled; ones already running on a thread finish in the background.
+    :param executor: The executor to run the calls on; defaults to a new pool of `workers` threads
+    :param ordered: Yield results in the order of arguments, rather than as they finish
+    """
+    loop = asyncio.get_running_loop()
+    own_executor = ThreadPoolExecutor(max_workers=workers) if executor is None else None
+    run = partial(loop.run_in_executor, executor or own_executor, function)
+    pending = []
+    try:
+        for args in arguments:
+            pending.append(run(*args))
+            while len(pending) >= workers:
+                yield await _next_result(pending, ordered)
+        while pending:
+            yield await _next_result(pending, ordered)
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor is not None:
+            own_executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _next_result(pending: list, ordered: bool):
+    """
+    Internal helper for _map_async: waits for the first (or, unordered, any) pending future,
+    takes it out of pending and returns its result.
+    """
+    if ordered:
+        future = pending[0]
+        await asyncio.wait([future])
+    else:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        future = next(future for future in pending if future in done)
+    pending.remove(future)
+    return future.result()
+
+
+def iter_albums(starting_dir: str, workers: int = 1):
+    """
+    Yields the albums in a music library as they are found, in the same order as get_albums.
+    Consuming them as they come (as create_index does) means the whole library never has to be
+    held in a list; only the albums of the artist being scanned (one per worker) are.
+    :param starting_dir: The directory where all the Artist/Album/Track files are stored.
+    :param workers: How many artist folders to scan at once; see get_albums.
+    :return: A generator of Albums
+    """
+    artists = _artist_folders(starting_dir)
+    if workers > 1:
+        for albums in _iter_bounded(get_albums_for_artist, artists, workers):
+            yield from albums
+        return
+    for artist, artist_folder in artists:
+        yield from get_albums_for_artist(artist, artist_folder)
+
+
+def _artist_folders(starting_dir: str) -> list:
+    """
+    Internal helper that lists the artist folders of a music library.
+    :return: A list of (artist, artist folder) tuples
+    """
+    with scandir(starting_dir) as entries:
+        return [(entry.name, entry.path) for entry in entries if entry.is_dir()]
+
+
+def get_albums(starting_dir: str, workers: int = 1) -> [Album]:
     """
     Creates albums from the specified starting location. Assumes that
     the files and folders are as specified in the "MyMusic" example ("MyMusic" is starting_dir,
     which holds Artists; each Artist dir holders Albums; each Album dir holds "details.txt" and track files).
     :param starting_dir: The directory where all the Artist/Album/Track files are stored.
-    :return: A list of Albums
+    :param workers: How many artist folders to scan at once; defaults to 1 (one after another).
+        Scanning is almost all waiting on the file system, so threads help a lot on slow
+        (e.g. network-mounted) libraries even with the GIL.
+    :return: A list of Albums, in the same order whatever the number of workers
     """
     '''
     albums = []
@@ -305,25 +1207,215 @@ def get_albums(starting_dir: str) -> [Album]:
                     albums.append(get_album_from_folder(album_name, album_folder, artist))
     return albums
     '''
+    return list(iter_albums(starting_dir, workers))
+
+
+MANIFEST_VERSION = 1
+"""Bumped whenever the manifest layout changes; a manifest with another version is ignored"""
+
+
+def load_manifest(manifest_path: str) -> dict:
+    """
+    Reads a manifest written by save_manifest.
+    :param manifest_path: The manifest file
+    :return: The manifest, or an empty one if the file is missing, unreadable or out of date
+    """
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'version': MANIFEST_VERSION, 'artists': {}}
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return {'version': MANIFEST_VERSION, 'artists': {}}
+    return manifest
+
+
+def save_manifest(manifest: dict, manifest_path: str) -> None:
+    """
+    Writes a manifest, replacing the old one in one step so a crash never leaves half a manifest.
+    :param manifest: The manifest, as returned by get_albums_incremental
+    :param manifest_path: Where to write it
+    """
+    manifest_dir = dirname(manifest_path)
+    if manifest_dir:
+        makedirs(manifest_dir, exist_ok=True)
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, manifest_path)
+
+
+def _mtime_ns(path: str):
+    """
+    :return: The modification time of a file or folder in nanoseconds, or None if it doesn't exist
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _get_albums_for_artist_incremental(artist, artist_folder, artist_mtime, previous) -> tuple:
+    """
+    Internal helper for get_albums_incremental: loads one artist's albums, reusing what the
+    previous manifest recorded for every album folder that hasn't changed since.
+    :param artist: The Artist to load Albums for
+    :param artist_folder: The folder where the artist's album live
+    :param artist_mtime: The artist folder's st_mtime_ns
+    :param previous: This artist's entry in the previous manifest, or None
+    :return: A tuple (list of Albums, this artist's entry for the new manifest)
+    """
+    previous_albums = previous['albums'] if previous else {}
     albums = []
-    for artist in listdir(starting_dir):
-        artist_folder = join(starting_dir, artist)
-        if isdir(artist_folder):
-            albums.extend(get_albums_for_artist(artist, artist_folder))
-    return albums
+    entry = {'mtime_ns': artist_mtime, 'albums': {}}
+    try:
+        if previous and previous['mtime_ns'] == artist_mtime:
+            ## No album folder was added, removed or renamed, so no need to read the folder
+            album_names = list(previous_albums)
+        else:
+            with scandir(artist_folder) as entries:
+                album_names = [album_entry.name for album_entry in entries if album_entry.is_dir()]
+    except OSError as e:
+        print(f"Error: Unexpected issue with artist folder {artist_folder}: {e}")
+        return albums, entry
+    for album_name in album_names:
+        album_folder = join(artist_folder, album_name)
+        ## Adding, removing or renaming a track changes the folder's mtime; editing details.txt
+        ##   in place only changes its own
+        album_mtime = _mtime_ns(album_folder)
+        details_mtime = _mtime_ns(join(album_folder, "details.txt"))
+        recorded = previous_albums.get(album_name)
+        if (recorded is not None and album_mtime is not None and recorded['mtime_ns'] == album_mtime
+                and recorded['details_mtime_ns'] == details_mtime):
+            album = None
+            if recorded['release_date'] is not None:
+                tracks = [Track(name=track, path=join(album_folder, track)) for track in recorded['tracks']]
+                album = Album(artist=artist, release_date=recorded['release_date'], album_name=album_name,
+                              tracks=tracks)
+        else:
+            album = _load_album(album_name, album_folder, artist)
+        if album is not None:
+            albums.append(album)
+        if album_mtime is not None:
+            ## Folders that aren't valid albums are recorded too (with no release date), so they
+            ##   are looked at again once they change, even if the artist folder doesn't
+            entry['albums'][album_name] = {'mtime_ns': album_mtime, 'details_mtime_ns': details_mtime,
+                                           'release_date': album.release_date if album else None,
+                                           'tracks': [track.name for track in album.tracks] if album else []}
+    return albums, entry
+
+
+def get_albums_incremental(starting_dir: str, manifest: dict, workers: int = 1) -> tuple:
+    """
+    Like get_albums, but only rescans the album folders that changed since a previous scan.
+    An album whose folder and details.txt have the same modification times as recorded in the
+    manifest is rebuilt from the manifest; an artist folder whose modification time is unchanged
+    isn't even read, since its set of albums can't have changed.
+    :param starting_dir: The directory where all the Artist/Album/Track files are stored.
+    :param manifest: The manifest from the previous scan (see load_manifest); may be empty
+    :param workers: How many artist folders to scan at once; see get_albums.
+    :return: A tuple (list of Albums, the manifest describing this scan)
+    """
+    new_manifest = {'version': MANIFEST_VERSION, 'artists': {}}
+    albums = list(_iter_albums_incremental(starting_dir, manifest, new_manifest, workers))
+    return albums, new_manifest
 
 
-def create_index(music_library_dir: str) -> MusicIndex:
+def _incremental_arguments(starting_dir: str, manifest: dict) -> list:
+    """
+    Internal helper that lists the artist folders of a music library, with what
+    _get_albums_for_artist_incremental needs to know about each.
+    :return: A list of (artist, artist folder, folder st_mtime_ns, previous manifest entry) tuples
+    """
+    previous_artists = manifest.get('artists', {})
+    with scandir(starting_dir) as entries:
+        return [(entry.name, entry.path, entry.stat().st_mtime_ns, previous_artists.get(entry.path))
+                for entry in entries if entry.is_dir()]
+
+
+def _iter_albums_incremental(starting_dir: str, manifest: dict, new_manifest: dict, workers: int = 1):
+    """
+    Internal helper that does the work of get_albums_incremental, yielding the albums as they are
+    found like iter_albums; new_manifest is filled in along the way, and is complete once every
+    album has been yielded.
+    """
+    arguments = _incremental_arguments(starting_dir, manifest)
+    if workers > 1:
+        per_artist = _iter_bounded(_get_albums_for_artist_incremental, arguments, workers)
+    else:
+        per_artist = (_get_albums_for_artist_incremental(*args) for args in arguments)
+    for (_, artist_folder, _, _), (artist_albums, entry) in zip(arguments, per_artist):
+        new_manifest['artists'][artist_folder] = entry
+        yield from artist_albums
+
+
+def create_index(music_library_dir: str, workers: int = 1, manifest_path: str = None,
+                 columnar: bool = False) -> MusicIndex:
     """
     Starts in the directory that holds the Music Library and returns a
     MusicIndex, populated with all the albums in that library.
     :param music_library_dir: The folder that holds the music files (Artist/Album/Track)
+    :param workers: How many artist folders to scan at once; see get_albums.
+    :param manifest_path: If given, a manifest of what was scanned is kept in this file, and later
+        calls only rescan the album folders that changed since (see get_albums_incremental).
+    :param columnar: Keep the albums in a Catalog, which takes far less memory (see MusicIndex.catalog)
     :return: A MusicIndex with all the albums from the Music Library directory
     """
-    music_index = MusicIndex()
-    albums = get_albums(music_library_dir)
-    for album in albums:
-        music_index.add_album(album)
+    music_index = MusicIndex(Catalog() if columnar else None)
+    ## Each album goes into the index as soon as it is found, so the library is never also held in a list
+    if manifest_path is None:
+        for album in iter_albums(music_library_dir, workers):
+            music_index.add_album(album)
+    else:
+        manifest = {'version': MANIFEST_VERSION, 'artists': {}}
+        for album in _iter_albums_incremental(music_library_dir, load_manifest(manifest_path), manifest, workers):
+            music_index.add_album(album)
+        save_manifest(manifest, manifest_path)
+    return music_index
+
+
+async def create_index_async(music_library_dir: str, workers: int = 4, manifest_path: str = None,
+                             columnar: bool = False, progress=None, executor=None) -> MusicIndex:
+    """
+    Like create_index, for use in an asyncio program: every file system call runs on a thread,
+    so a rescan never blocks the event loop. Albums go into the index on the event loop, one
+    artist at a time, in the same order as create_index.
+    Cancelling the task stops the scan: artist folders not yet started are skipped, no manifest
+    is written, and the CancelledError is raised here.
+    :param music_library_dir: The folder that holds the music files (Artist/Album/Track)
+    :param workers: How many artist folders to scan at once
+    :param manifest_path: If given, only rescan what changed since the last scan; see create_index
+    :param columnar: Keep the albums in a Catalog; see create_index
+    :param progress: If given, called on the event loop as progress('scan', artists done, total artists)
+        after each artist folder
+    :param executor: The executor to run file system calls on; defaults to a new pool of `workers` threads
+    :return: A MusicIndex with all the albums from the Music Library directory
+    """
+    loop = asyncio.get_running_loop()
+    music_index = MusicIndex(Catalog() if columnar else None)
+    if manifest_path is None:
+        artists = await loop.run_in_executor(executor, _artist_folders, music_library_dir)
+        scan_artist = get_albums_for_artist
+    else:
+        previous = await loop.run_in_executor(executor, load_manifest, manifest_path)
+        artists = await loop.run_in_executor(executor, _incremental_arguments, music_library_dir, previous)
+        scan_artist = _get_albums_for_artist_incremental
+        manifest = {'version': MANIFEST_VERSION, 'artists': {}}
+    done = 0
+    async with aclosing(_map_async(scan_artist, artists, workers, executor)) as results:
+        async for result in results:
+            if manifest_path is None:
+                albums = result
+            else:
+                albums, entry = result
+                manifest['artists'][artists[done][1]] = entry
+            for album in albums:
+                music_index.add_album(album)
+            done += 1
+            if progress is not None:
+                progress('scan', done, len(artists))
+    if manifest_path is not None:
+        await loop.run_in_executor(executor, save_manifest, manifest, manifest_path)
     return music_index
 
 
@@ -359,11 +1451,19 @@ if __name__ == "__main__":
         for album in album_list:
             assert album.release_date == "2021-03"
         '''
+        parser = argparse.ArgumentParser(
+            description="Asks for a music library, a date range and an output directory, then writes a playlist "
+                        "of the albums released in that range.")
+        parser.add_argument('--manifest', metavar='PATH',
+                            help="Keep a manifest of the library's folders in this file, so the next run with "
+                                 "the same manifest only rescans the artists that changed. Off by default.")
+        args = parser.parse_args()
+
         music_library_dir = input("Input the path to your Music Library directory: ")
         start_date = input("Input the start date in YYYY-MM format: ")
         end_date = input("Input the end date in YYYY-MM format: ")
         output_dir = input("Input the directory to create the playlist: ")
 
-        index = create_index(music_library_dir)
+        index = create_index(music_library_dir, manifest_path=args.manifest)
         index.write_playlist(output_dir, start_date, end_date)
         print(f"Playlist Output Path: {output_dir}")
\ No newline at end of file
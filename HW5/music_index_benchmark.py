@@ -0,0 +1,578 @@
+"""
+Benchmarks for building a MusicIndex from a music library on disk.
+
+Generates a synthetic library (Artist/Album/tracks plus details.txt, laid out like MyMusic)
+and times create_index over it with different numbers of scanning workers, checking that
+every run builds the same index. --count-calls also counts the file system calls
+(stat, listdir, scandir, open...) one scan makes, by wrapping the os functions.
+--reindex keeps a manifest, changes a fraction of the albums, and times the incremental re-index
+against the full scans. --snapshot times MusicIndex.save/load of the scanned index against pickle
+(and against the scan); --snapshot-albums does the same for a big synthetic index built in memory.
+--export times write_playlist of the whole library with each export strategy and worker count.
+--lookup-albums times the artist / album name / track name lookups on a synthetic index, against
+finding the same thing by scanning every album, and full-text searches on the same index.
+--async scans from inside an asyncio event loop, with create_index_async and with a plain
+create_index call, and reports the longest time the event loop was stalled.
+--peak-memory measures the peak memory of indexing the library when every album is collected in a
+list first, against create_index consuming iter_albums as it goes (with and without a Catalog).
+--catalog-albums measures the memory a synthetic index takes with Album and Track objects, and
+with its albums kept in a Catalog.
+
+A local disk answers from the page cache in microseconds, which hides what a network mount
+costs; --latency-ms adds a delay to every file system call the loader makes, to stand in
+for the round trip to a file server.
+
+Examples:
+    python music_index_benchmark.py
+    python music_index_benchmark.py --artists 1000 --albums 10 --workers 1 8 32 --latency-ms 1
+    python music_index_benchmark.py --library /tmp/big_library --keep --json scan.json
+    python music_index_benchmark.py --count-calls --workers 1
+    python music_index_benchmark.py --artists 5000 --workers 1 --reindex 0.01 --latency-ms 0.5
+    python music_index_benchmark.py --artists 100 --workers 1 --snapshot --snapshot-albums 1000000 --tracks 0
+    python music_index_benchmark.py --artists 250 --track-kb 512 --workers 1 8 --export copy fastcopy hardlink symlink
+    python music_index_benchmark.py --artists 10 --workers 1 --lookup-albums 1000000 --tracks 1
+    python music_index_benchmark.py --artists 10 --workers 1 --catalog-albums 100000 --tracks 10
+    python music_index_benchmark.py --artists 2000 --albums 10 --workers 1 --peak-memory
+    python music_index_benchmark.py --artists 1000 --workers 4 16 --async --latency-ms 1
+"""
+import argparse
+import asyncio
+import builtins
+import gc
+import json
+import os
+import pickle
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from os.path import join
+
+import music_index
+from music_index import Album, Catalog, MusicIndex, Track, create_index
+
+
+def generate_library(root: str, num_artists: int, albums_per_artist: int, tracks_per_album: int,
+                     seed: int = 0, track_bytes: int = 0) -> int:
+    """
+    Writes a synthetic music library.
+    :param root: The library folder; created if needed
+    :param num_artists: How many artist folders to create
+    :param albums_per_artist: How many album folders each artist gets
+    :param tracks_per_album: How many track files each album gets
+    :param seed: Seed for the random release dates
+    :param track_bytes: The size of each track file; 0 (the default) when only the tree shape matters
+    :return: The number of albums written
+    """
+    rng = random.Random(seed)
+    data = os.urandom(track_bytes)
+    for artist in range(num_artists):
+        for album in range(albums_per_artist):
+            album_folder = join(root, f"Artist {artist:05d}", f"Album {album:03d}")
+            os.makedirs(album_folder, exist_ok=True)
+            with open(join(album_folder, "details.txt"), 'w') as f:
+                f.write(f"{rng.randint(1950, 2024):04d}-{rng.randint(1, 12):02d}\n")
+            for track in range(tracks_per_album):
+                with open(join(album_folder, f"{track + 1:02d} Track {track + 1}.m4a"), 'wb') as f:
+                    f.write(data)
+    return num_artists * albums_per_artist
+
+
+_FS_CALLS = [(os, 'stat'), (os, 'lstat'), (os, 'listdir'), (os, 'scandir'),
+             (music_index, 'scandir'), (music_index, 'open')]
+"""Every function the loader can reach the file system through; os.path.isdir/isfile go through os.stat"""
+
+
+@contextmanager
+def wrapped_fs_calls(wrap):
+    """
+    Replaces every file system call the loader makes with wrap(name, function) while in the with block.
+    :param wrap: Given a call's name and the real function, returns the function to use instead
+    """
+    originals = [(module, name, module.__dict__.get(name)) for module, name in _FS_CALLS]
+    for module, name, original in originals:
+        ## music_index uses the builtin open(), so that one is shadowed by a module global
+        function = original or getattr(builtins, name, None)
+        if function is not None:
+            setattr(module, name, wrap(name, function))
+    try:
+        yield
+    finally:
+        for module, name, original in originals:
+            if original is None:
+                module.__dict__.pop(name, None)
+            else:
+                setattr(module, name, original)
+
+
+@contextmanager
+def simulated_latency(seconds: float):
+    """
+    Makes every file system call the loader makes sleep first, like a round trip to a file server.
+    :param seconds: The delay per call; 0 leaves everything alone
+    """
+    if not seconds:
+        yield
+        return
+
+    def delayed(name, function):
+        def call(*args, **kwargs):
+            time.sleep(seconds)
+            return function(*args, **kwargs)
+        return call
+
+    with wrapped_fs_calls(delayed):
+        yield
+
+
+@contextmanager
+def count_fs_calls():
+    """
+    Counts the file system calls the loader makes while in the with block.
+    :return: A Counter of call name -> number of calls, filled in as calls are made
+    """
+    counts = Counter()
+    lock = threading.Lock()
+
+    def counted(name, function):
+        def call(*args, **kwargs):
+            with lock:
+                counts[name] += 1
+            return function(*args, **kwargs)
+        return call
+
+    with wrapped_fs_calls(counted):
+        yield counts
+
+
+def change_albums(root: str, fraction: float, seed: int = 0) -> int:
+    """
+    Adds a track to a random fraction of the albums in a library made by generate_library.
+    :return: The number of albums changed
+    """
+    rng = random.Random(seed)
+    album_folders = sorted(join(root, artist, album) for artist in os.listdir(root)
+                           for album in os.listdir(join(root, artist)))
+    changed = rng.sample(album_folders, round(len(album_folders) * fraction))
+    for album_folder in changed:
+        open(join(album_folder, "99 Bonus Track.m4a"), 'w').close()
+    return len(changed)
+
+
+def make_index(num_albums: int, tracks_per_album: int, seed: int = 0, columnar: bool = False) -> MusicIndex:
+    """
+    Builds a synthetic MusicIndex in memory, shaped like one create_index would build.
+    :param columnar: Keep the albums in a Catalog, like create_index(columnar=True)
+    :return: The index
+    """
+    rng = random.Random(seed)
+    index = MusicIndex(Catalog() if columnar else None)
+    for number in range(num_albums):
+        artist, album_name = f"Artist {number // 4:07d}", f"Album {number:07d}"
+        album_folder = join("MyMusic", artist, album_name)
+        tracks = [Track(f"{track + 1:02d} Song {number}-{track + 1}.m4a",
+                        join(album_folder, f"{track + 1:02d} Song {number}-{track + 1}.m4a"))
+                  for track in range(tracks_per_album)]
+        release_date = f"{rng.randint(1950, 2024):04d}-{rng.randint(1, 12):02d}"
+        index.add_album(Album(artist, release_date, album_name, tracks))
+    return index
+
+
+def time_snapshot(index: MusicIndex, directory: str) -> dict:
+    """
+    Times MusicIndex.save/load against pickle for one index, and checks the loaded copy matches.
+    :param index: The index to save
+    :param directory: Where to write the files
+    :return: The results, as a dict
+    """
+    clock = time.perf_counter
+    path = join(directory, "index.snapshot")
+    start = clock()
+    index.save(path)
+    save_seconds = clock() - start
+    start = clock()
+    loaded = MusicIndex.load(path)
+    load_seconds = clock() - start
+    if summarize(loaded) != summarize(index):
+        raise AssertionError("MusicIndex.load built a different index")
+    del loaded
+    start = clock()
+    loaded = MusicIndex.load(path, columnar=True)
+    columnar_load_seconds = clock() - start
+    if summarize(loaded) != summarize(index):
+        raise AssertionError("MusicIndex.load(columnar=True) built a different index")
+    del loaded
+
+    pickle_path = join(directory, "index.pickle")
+    start = clock()
+    with open(pickle_path, 'wb') as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    pickle_save_seconds = clock() - start
+    start = clock()
+    with open(pickle_path, 'rb') as f:
+        pickle.load(f)
+    pickle_load_seconds = clock() - start
+    return {'albums': sum(len(item.value) for item in index),
+            'snapshot_save_seconds': save_seconds, 'snapshot_load_seconds': load_seconds,
+            'snapshot_columnar_load_seconds': columnar_load_seconds,
+            'snapshot_bytes': os.path.getsize(path),
+            'pickle_save_seconds': pickle_save_seconds, 'pickle_load_seconds': pickle_load_seconds,
+            'pickle_bytes': os.path.getsize(pickle_path)}
+
+
+def format_snapshot(result: dict) -> str:
+    """
+    :return: A one-line, human-readable summary of a time_snapshot result
+    """
+    return (f"snapshot of {result['albums']} albums: save {result['snapshot_save_seconds']:.3f} s, "
+            f"load {result['snapshot_load_seconds']:.3f} s (columnar {result['snapshot_columnar_load_seconds']:.3f} s), "
+            f"{result['snapshot_bytes']:,} bytes | "
+            f"pickle: save {result['pickle_save_seconds']:.3f} s, load {result['pickle_load_seconds']:.3f} s, "
+            f"{result['pickle_bytes']:,} bytes")
+
+
+def time_export(index: MusicIndex, strategy: str, workers: int) -> float:
+    """
+    Times writing the whole index out as one playlist, into a fresh temporary folder.
+    :return: The seconds it took
+    """
+    out_dir = tempfile.mkdtemp(prefix="music_index_export_")
+    try:
+        start = time.perf_counter()
+        index.write_playlist(out_dir, strategy=strategy, workers=workers)
+        return time.perf_counter() - start
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def time_lookups(index: MusicIndex, num_albums: int, num_lookups: int, seed: int = 0) -> list:
+    """
+    Times the secondary index lookups of an index from make_index, and the same lookups done
+    by scanning every album (only a few of those, since each one visits the whole index).
+    The first lookup builds the secondary indexes; that is timed on its own as 'build_s'.
+    :return: A list of result dicts, one per kind of lookup
+    """
+    rng = random.Random(seed)
+    numbers = [rng.randrange(num_albums) for _ in range(num_lookups)]
+    queries = {
+        'artist': (index.albums_by_artist, [f"Artist {number // 4:07d}" for number in numbers],
+                   lambda album, query: album.artist == query),
+        'album_name': (index.albums_named, [f"Album {number:07d}" for number in numbers],
+                       lambda album, query: album.album_name == query),
+        'track_name': (index.tracks_named, [f"Song {number}-1" for number in numbers],
+                       lambda album, query: any(track.name.endswith(f" {query}.m4a") for track in album.tracks)),
+    }
+    results = []
+    clock = time.perf_counter
+    start = clock()
+    index.albums_by_artist("")
+    build_seconds = clock() - start
+    for kind, (lookup, lookups, matches) in queries.items():
+        start = clock()
+        for query in lookups:
+            lookup(query)
+        lookup_seconds = (clock() - start) / len(lookups)
+        scans = lookups[:3]
+        start = clock()
+        for query in scans:
+            [album for album in index.range("0000-01", "9999-12") if matches(album, query)]
+        scan_seconds = (clock() - start) / len(scans)
+        results.append({'lookup': kind, 'albums': num_albums, 'lookup_us': lookup_seconds * 1e6,
+                        'scan_us': scan_seconds * 1e6, 'build_s': build_seconds})
+    return results
+
+
+def time_search(index: MusicIndex, num_albums: int, num_queries: int, seed: int = 0) -> list:
+    """
+    Times MusicIndex.search on an index from make_index, for a few shapes of query. The first
+    search builds the SearchIndex; that is timed on its own as 'build_s'.
+    :return: A list of result dicts, one per shape of query
+    """
+    rng = random.Random(seed)
+    numbers = [rng.randrange(num_albums) for _ in range(num_queries)]
+    queries = {
+        'two whole words': [f"artist {number // 4:07d}" for number in numbers],
+        'prefix': [f"album {number:07d}"[:-2] for number in numbers],
+        'common + rare prefix': [f"song {number}" for number in numbers],
+        'common word only': ["song"] * 5,
+    }
+    clock = time.perf_counter
+    start = clock()
+    index.search("")
+    index.search("warm up")
+    build_seconds = clock() - start
+    results = []
+    for kind, searches in queries.items():
+        start = clock()
+        for query in searches:
+            index.search(query)
+        seconds = (clock() - start) / len(searches)
+        results.append({'search': kind, 'albums': num_albums, 'search_us': seconds * 1e6, 'build_s': build_seconds})
+    return results
+
+
+def measure_memory(num_albums: int, tracks_per_album: int, seed: int = 0) -> dict:
+    """
+    Measures how much memory a synthetic index takes with Album and Track objects, and with a Catalog.
+    :return: A result dict
+    """
+    result = {'albums': num_albums, 'tracks': num_albums * tracks_per_album}
+    for columnar in (False, True):
+        gc.collect()
+        tracemalloc.start()
+        index = make_index(num_albums, tracks_per_album, seed, columnar)
+        gc.collect()
+        result['columnar_bytes' if columnar else 'object_bytes'] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del index
+    result['ratio'] = result['object_bytes'] / result['columnar_bytes']
+    return result
+
+
+def measure_scan_peak(library: str) -> dict:
+    """
+    Measures the peak memory of indexing a library: collecting every album in a list first
+    (get_albums, then add_album for each), against create_index consuming the iter_albums stream,
+    each with and without a Catalog.
+    :return: A result dict
+    """
+    def from_list(columnar):
+        index = MusicIndex(Catalog() if columnar else None)
+        for album in music_index.get_albums(library):
+            index.add_album(album)
+        return index
+
+    result = {}
+    for kind, build in (('list', lambda: from_list(False)), ('stream', lambda: create_index(library)),
+                        ('list_columnar', lambda: from_list(True)),
+                        ('stream_columnar', lambda: create_index(library, columnar=True))):
+        gc.collect()
+        tracemalloc.start()
+        index = build()
+        result[f'{kind}_final_bytes'], result[f'{kind}_peak_bytes'] = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['albums'] = sum(len(item.value) for item in index)
+        del index
+    return result
+
+
+def summarize(index) -> dict:
+    """
+    :return: Release date -> sorted album names, to check two indexes hold the same albums
+    """
+    return {item.key: sorted(f"{album.artist}/{album.album_name}" for album in item.value) for item in index}
+
+
+def time_scan(library: str, workers: int, repeat: int):
+    """
+    Times create_index over a library, keeping the best of several runs.
+    :return: A tuple (best seconds, the index built)
+    """
+    best = float('inf')
+    index = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        index = create_index(library, workers=workers)
+        best = min(best, time.perf_counter() - start)
+    return best, index
+
+
+def time_event_loop_scan(library: str, workers: int, use_async: bool) -> dict:
+    """
+    Scans a library from inside an asyncio event loop, with create_index_async or by calling
+    create_index directly, while a ticker coroutine measures the longest time the loop was stalled.
+    :return: A result dict
+    """
+    async def scan():
+        longest_stall = 0.0
+
+        async def ticker():
+            nonlocal longest_stall
+            last = time.perf_counter()
+            while True:
+                await asyncio.sleep(0.001)
+                now = time.perf_counter()
+                longest_stall = max(longest_stall, now - last)
+                last = now
+
+        ticking = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        if use_async:
+            index = await music_index.create_index_async(library, workers=workers)
+        else:
+            index = create_index(library, workers=workers)
+        seconds = time.perf_counter() - start
+        await asyncio.sleep(0.002)  ## Let the ticker see the end of a blocking scan
+        ticking.cancel()
+        return index, seconds, longest_stall
+
+    index, seconds, longest_stall = asyncio.run(scan())
+    return {'event_loop_scan': 'create_index_async' if use_async else 'create_index', 'workers': workers,
+            'albums': sum(len(item.value) for item in index), 'seconds': seconds,
+            'longest_stall_ms': longest_stall * 1000}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--artists', type=int, default=500)
+    parser.add_argument('--albums', type=int, default=4, help="Albums per artist")
+    parser.add_argument('--tracks', type=int, default=10, help="Tracks per album")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help="Delay added to every file system call, to imitate a network mount")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per case; the best is kept")
+    parser.add_argument('--count-calls', action='store_true',
+                        help="Also count the file system calls a single scan makes")
+    parser.add_argument('--reindex', type=float, metavar='FRACTION',
+                        help="Also time an incremental re-index after changing this fraction of the albums")
+    parser.add_argument('--snapshot', action='store_true',
+                        help="Also time MusicIndex.save/load of the scanned index, against pickle")
+    parser.add_argument('--snapshot-albums', type=int, metavar='N',
+                        help="Also time MusicIndex.save/load of a synthetic in-memory index of N albums")
+    parser.add_argument('--lookup-albums', type=int, metavar='N',
+                        help="Also time secondary index lookups and searches on a synthetic in-memory index of N albums")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="Also scan from inside an asyncio event loop, with create_index_async and with "
+                             "create_index, measuring how long the loop is stalled")
+    parser.add_argument('--peak-memory', action='store_true',
+                        help="Also measure peak memory while indexing the library, with and without streaming")
+    parser.add_argument('--catalog-albums', type=int, metavar='N',
+                        help="Also measure the memory of a synthetic index of N albums, with and without a Catalog")
+    parser.add_argument('--export', nargs='+', choices=list(music_index.EXPORT_STRATEGIES),
+                        help="Also time write_playlist of the whole library with these strategies, "
+                             "once per --workers count")
+    parser.add_argument('--track-kb', type=int, default=0, help="Size of each generated track file")
+    parser.add_argument('--library', help="Where to generate the library; defaults to a temporary folder")
+    parser.add_argument('--keep', action='store_true', help="Don't delete the generated library")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    library = args.library or tempfile.mkdtemp(prefix="music_index_benchmark_")
+    try:
+        num_albums = generate_library(library, args.artists, args.albums, args.tracks, args.seed,
+                                      args.track_kb * 1024)
+        results = []
+        expected = None
+        fs_calls = None
+        if args.count_calls:
+            with count_fs_calls() as counts:
+                create_index(library)
+            fs_calls = dict(counts)
+            num_folders = 1 + args.artists + num_albums
+            print(f"file system calls for {num_folders} folders and {num_albums} albums: "
+                  + ", ".join(f"{name} {count}" for name, count in sorted(counts.items()))
+                  + f" (total {sum(counts.values())})", file=sys.stderr)
+        with simulated_latency(args.latency_ms / 1000):
+            for workers in args.workers:
+                seconds, index = time_scan(library, workers, args.repeat)
+                contents = summarize(index)
+                if expected is None:
+                    expected = contents
+                elif contents != expected:
+                    print(f"workers={workers} built a different index", file=sys.stderr)
+                    return 1
+                result = {'workers': workers, 'albums': num_albums, 'latency_ms': args.latency_ms,
+                          'seconds': seconds, 'albums_per_sec': num_albums / seconds}
+                results.append(result)
+                print(f"workers={workers:<4} albums={num_albums:<8} latency={args.latency_ms}ms  "
+                      f"{seconds:8.3f} s  {result['albums_per_sec']:>10,.0f} albums/s", file=sys.stderr)
+        if args.use_async:
+            with simulated_latency(args.latency_ms / 1000):
+                for workers in args.workers:
+                    for use_async in (False, True):
+                        result = time_event_loop_scan(library, workers, use_async)
+                        results.append(result)
+                        print(f"event loop: {result['event_loop_scan']:<18} workers={workers:<4} "
+                              f"{result['seconds']:8.3f} s  longest stall {result['longest_stall_ms']:9.1f} ms",
+                              file=sys.stderr)
+        if args.reindex is not None:
+            manifest_path = library.rstrip(os.sep) + '.manifest.json'
+            create_index(library, manifest_path=manifest_path)
+            changed = change_albums(library, args.reindex, args.seed)
+            with simulated_latency(args.latency_ms / 1000), count_fs_calls() as counts:
+                start = time.perf_counter()
+                index = create_index(library, workers=args.workers[0], manifest_path=manifest_path)
+                seconds = time.perf_counter() - start
+            os.remove(manifest_path)
+            if summarize(index) != summarize(create_index(library)):
+                print("the incremental re-index built a different index", file=sys.stderr)
+                return 1
+            result = {'workers': args.workers[0], 'albums': num_albums, 'latency_ms': args.latency_ms,
+                      'reindex_changed_albums': changed, 'seconds': seconds,
+                      'albums_per_sec': num_albums / seconds, 'fs_calls': dict(counts)}
+            results.append(result)
+            print(f"re-index with {changed} of {num_albums} albums changed, workers={args.workers[0]}: "
+                  f"{seconds:8.3f} s, {sum(counts.values())} file system calls "
+                  f"({', '.join(f'{name} {count}' for name, count in sorted(counts.items()))})", file=sys.stderr)
+        for strategy in args.export or ():
+            num_tracks = num_albums * args.tracks
+            for workers in args.workers:
+                seconds = time_export(index, strategy, workers)
+                result = {'export_strategy': strategy, 'workers': workers, 'tracks': num_tracks,
+                          'track_kb': args.track_kb, 'seconds': seconds, 'tracks_per_sec': num_tracks / seconds}
+                results.append(result)
+                print(f"export {strategy:<9} workers={workers:<4} tracks={num_tracks:<8} {args.track_kb} KB each  "
+                      f"{seconds:8.3f} s  {result['tracks_per_sec']:>10,.0f} tracks/s", file=sys.stderr)
+        if args.lookup_albums:
+            lookup_index = make_index(args.lookup_albums, args.tracks, args.seed)
+            for result in time_lookups(lookup_index, args.lookup_albums, 10_000, args.seed):
+                results.append(result)
+                print(f"lookup by {result['lookup']:<10} albums={result['albums']:<8} "
+                      f"{result['lookup_us']:8.2f} us  (scanning: {result['scan_us'] / 1000:10.1f} ms, "
+                      f"building the indexes: {result['build_s']:.2f} s)",
+                      file=sys.stderr)
+            for result in time_search(lookup_index, args.lookup_albums, 1_000, args.seed):
+                results.append(result)
+                print(f"search {result['search']:<20} albums={result['albums']:<8} {result['search_us']:10.1f} us  "
+                      f"(building the search index: {result['build_s']:.2f} s)", file=sys.stderr)
+            del lookup_index
+        if args.peak_memory:
+            result = measure_scan_peak(library)
+            results.append(result)
+            print(f"indexing {result['albums']} albums, peak (final) MiB: "
+                  + ", ".join(f"{kind} {result[f'{kind}_peak_bytes'] / 2 ** 20:.1f} "
+                              f"({result[f'{kind}_final_bytes'] / 2 ** 20:.1f})"
+                              for kind in ('list', 'stream', 'list_columnar', 'stream_columnar')),
+                  file=sys.stderr)
+        if args.catalog_albums:
+            result = measure_memory(args.catalog_albums, args.tracks, args.seed)
+            results.append(result)
+            print(f"memory albums={result['albums']:<8} tracks={result['tracks']:<9} "
+                  f"objects {result['object_bytes'] / 2 ** 20:9.1f} MiB  "
+                  f"catalog {result['columnar_bytes'] / 2 ** 20:9.1f} MiB  ({result['ratio']:.1f}x smaller)",
+                  file=sys.stderr)
+        if args.snapshot or args.snapshot_albums:
+            snapshot_dir = tempfile.mkdtemp(prefix="music_index_snapshot_")
+            try:
+                if args.snapshot:
+                    result = time_snapshot(index, snapshot_dir)
+                    result['scan_seconds'] = results[0]['seconds']
+                    results.append(result)
+                    print(format_snapshot(result) + f" | scan {result['scan_seconds']:.3f} s", file=sys.stderr)
+                if args.snapshot_albums:
+                    result = time_snapshot(make_index(args.snapshot_albums, args.tracks, args.seed), snapshot_dir)
+                    results.append(result)
+                    print(format_snapshot(result), file=sys.stderr)
+            finally:
+                shutil.rmtree(snapshot_dir, ignore_errors=True)
+    finally:
+        if not args.keep:
+            shutil.rmtree(library, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'fs_calls': fs_calls, 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
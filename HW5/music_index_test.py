@@ -1,9 +1,42 @@
 
+import asyncio
+import csv
+import io
+import json
+import os
 import pytest
+import time
 from os import makedirs
 from unittest.mock import patch
 import music_index
-from music_index import MusicIndex, Album, Track, get_album_from_folder
+from music_index import MusicIndex, Album, Track, Catalog, AlbumView, TrackView, get_album_from_folder
+
+
+class FakeDirEntry:
+    """
+    Stands in for an os.DirEntry, so scandir can be mocked without touching the disk.
+    """
+    def __init__(self, folder, name, is_dir=False):
+        self.name = name
+        self.path = f"{folder}/{name}"
+        self._is_dir = is_dir
+
+    def is_dir(self):
+        return self._is_dir
+
+    def is_file(self):
+        return not self._is_dir
+
+
+class FakeScandir(list):
+    """
+    A list of FakeDirEntrys that can be used in a with statement, like the iterator scandir returns.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
 
 
 class TestTracks():
@@ -217,6 +250,32 @@ class TestMusicIndex():
         music_index.Album.write_to_new_dir.assert_called_with('MyPlaylist/Music 2000-01 through 2020-01')
         assert music_index.Album.write_to_new_dir.call_count == 1
 
+    def test_range(self):
+        test_music_index = MusicIndex()
+        for release_date in ["2023-12", "1999-03", "2010-03", "2010-03", "2004-04"]:
+            test_music_index.add_album(Album("Artist", release_date, f"Album {release_date}"))
+
+        assert [album.release_date for album in test_music_index.range("2000-01", "2020-01")] == \
+               ["2004-04", "2010-03", "2010-03"]
+        assert [album.release_date for album in test_music_index.range("2010-03", "2010-03")] == \
+               ["2010-03", "2010-03"]
+        assert list(test_music_index.range("2011-01", "2020-01")) == []
+        assert len(list(test_music_index.range("1900-01", "2025-01"))) == 5
+
+    def test_range_after_remove_and_clear(self):
+        test_music_index = MusicIndex()
+        for year in range(1990, 2010):
+            test_music_index.add_album(Album("Artist", f"{year}-06", f"Album {year}"))
+        test_music_index.remove("1995-06")
+        del test_music_index["1996-06"]
+        test_music_index["1997-06"] = [Album("Other", "1997-06", "Replacement")]
+
+        assert [album.release_date for album in test_music_index.range("1994-01", "1998-01")] == \
+               ["1994-06", "1997-06"]
+        assert [album.album_name for album in test_music_index.range("1997-06", "1997-06")] == ["Replacement"]
+        test_music_index.clear()
+        assert list(test_music_index.range("1900-01", "2025-01")) == []
+
 
 class TestMisc():
     def test_get_release_date(self):
@@ -224,10 +283,11 @@ class TestMisc():
 
     def test_get_album_from_folder(self, mocker):
         ## Mock so these don't actually *do* anything
-        mocker.patch('music_index.listdir')
-        ## If listdir is called, return this fake list of "tracks"
-        music_index.listdir.return_value = ['track1', 'track2', 'details.txt']
-        mocker.patch('music_index.isfile')
+        mocker.patch('music_index.scandir')
+        ## If scandir is called, return this fake list of "tracks"
+        music_index.scandir.return_value = FakeScandir(
+            [FakeDirEntry('folder', 'track1'), FakeDirEntry('folder', 'track2'),
+             FakeDirEntry('folder', 'details.txt'), FakeDirEntry('folder', 'artwork', is_dir=True)])
         mocker.patch('music_index.get_release_date')
         ## Don't actually open up and read the details.txt file, just return something to test
         music_index.get_release_date.return_value = '2005-04'
@@ -238,14 +298,15 @@ class TestMisc():
         assert new_album.artist == 'artist'
         assert new_album.album_name == 'album'
         assert len(new_album.tracks) == 2
+        assert new_album.tracks[1].file_with_path == 'folder/track2'
+        music_index.scandir.assert_called_once_with('folder')
 
 
     def test_get_albums(self, mocker):
         ## Mock so these don't actually *do* anything
-        mocker.patch('music_index.listdir')
-        music_index.listdir.return_value = ['Artist1', 'Artist2', 'Artist3']
-        mocker.patch('music_index.isdir')
-        music_index.isdir.return_value = True
+        mocker.patch('music_index.scandir')
+        music_index.scandir.return_value = FakeScandir(
+            [FakeDirEntry('My Music', artist, is_dir=True) for artist in ['Artist1', 'Artist2', 'Artist3']])
         ## Mock so these don't actually *do* anything
         mocker.patch('music_index.get_albums_for_artist')
         music_index.get_albums_for_artist.return_value = []
@@ -254,9 +315,80 @@ class TestMisc():
 
         assert music_index.get_albums_for_artist.call_count == 3 ## 1 call for each Artist
 
+    def test_get_albums_parallel(self, mocker):
+        mocker.patch('music_index.scandir')
+        music_index.scandir.return_value = FakeScandir(
+            [FakeDirEntry('My Music', artist, is_dir=True) for artist in ['Artist1', 'Artist2', 'Artist3']] +
+            [FakeDirEntry('My Music', 'notes.txt')])
+        mocker.patch('music_index.get_albums_for_artist', side_effect=lambda artist, folder: [artist])
+
+        albums = music_index.get_albums('My Music', workers=4)
+
+        assert albums == ['Artist1', 'Artist2', 'Artist3']  ## Same order as a serial scan
+        assert music_index.get_albums_for_artist.call_count == 3
+        music_index.get_albums_for_artist.assert_called_with('Artist3', 'My Music/Artist3')
+
+    def test_iter_albums_streams(self, tmp_path):
+        for artist in ["Pixies", "Modest Mouse", "Björk"]:
+            for album in ["First", "Second"]:
+                album_folder = tmp_path / artist / album
+                album_folder.mkdir(parents=True)
+                (album_folder / "details.txt").write_text("2004-04\n")
+        albums = music_index.iter_albums(str(tmp_path))
+        assert not isinstance(albums, list)
+        assert isinstance(next(albums), Album)
+        assert [repr(album) for album in music_index.iter_albums(str(tmp_path), workers=2)] == \
+               [repr(album) for album in music_index.get_albums(str(tmp_path))]
+        assert len(music_index.get_albums(str(tmp_path))) == 6
+
+    def test_iter_albums_parallel_stops_early(self, mocker):
+        mocker.patch('music_index.scandir')
+        music_index.scandir.return_value = FakeScandir(
+            [FakeDirEntry('My Music', f"Artist{number}", is_dir=True) for number in range(50)])
+        mocker.patch('music_index.get_albums_for_artist', side_effect=lambda artist, folder: [artist])
+
+        albums = music_index.iter_albums('My Music', workers=2)
+        assert [next(albums), next(albums)] == ['Artist0', 'Artist1']
+        albums.close()
+
+        ## Only a few artists are scanned ahead of the albums being consumed
+        assert music_index.get_albums_for_artist.call_count <= 5
+
+    def test_iter_albums_for_artist_missing_folder(self, tmp_path):
+        assert list(music_index.iter_albums_for_artist("Nobody", str(tmp_path / "Nobody"))) == []
+
+    def test_get_albums_for_artist_skips_files_and_bad_albums(self, tmp_path):
+        (tmp_path / "Good" / "tracks").mkdir(parents=True)
+        (tmp_path / "Good" / "details.txt").write_text("2004-04\n")
+        (tmp_path / "Good" / "01 Float On.m4a").write_text("")
+        (tmp_path / "No Details").mkdir()
+        (tmp_path / "cover.jpg").write_text("")
+
+        albums = music_index.get_albums_for_artist("Modest Mouse", str(tmp_path))
+
+        assert [album.album_name for album in albums] == ["Good"]
+        assert albums[0].release_date == "2004-04"
+        assert [track.name for track in albums[0].tracks] == ["01 Float On.m4a"]
+
+    def test_create_index_parallel_matches_serial(self, tmp_path):
+        for artist in range(6):
+            for album in range(3):
+                album_folder = tmp_path / f"Artist {artist}" / f"Album {album}"
+                album_folder.mkdir(parents=True)
+                (album_folder / "details.txt").write_text(f"{2000 + artist}-{album + 1:02d}\n")
+                (album_folder / "01 Track.m4a").write_text("")
+
+        serial = music_index.create_index(str(tmp_path))
+        parallel = music_index.create_index(str(tmp_path), workers=4)
+
+        assert len(serial) == len(parallel) == 18
+        for item in serial:
+            assert [repr(album) for album in parallel.get_albums(item.key)] == [repr(album) for album in item.value]
+        assert [track.name for track in serial.get_albums("2003-02")[0].tracks] == ["01 Track.m4a"]
+
     def test_create_index(self, mocker):
         ## Mock so these don't actually *do* anything
-        mocker.patch('music_index.get_albums')
+        mocker.patch('music_index.iter_albums')
 
         album1 = Album()
         album1.artist = "Some Artist"
@@ -274,7 +406,7 @@ class TestMisc():
         album3.album_name = "AlbumByArtist3"
 
         ## Mock the albums that are returned
-        music_index.get_albums.return_value = [album1, album2, album3]
+        music_index.iter_albums.return_value = iter([album1, album2, album3])
 
         new_index = music_index.create_index('My Music')
 
@@ -282,3 +414,509 @@ class TestMisc():
         assert new_index.key_exists('2023-12')
         assert new_index.key_exists('2021-03')
         assert len(new_index.get('2021-03')) == 2
+
+
+class TestIncrementalIndex():
+
+    def make_library(self, root):
+        for artist in ["Modest Mouse", "Pixies"]:
+            for album, release_date in [("First", "2000-01"), ("Second", "2004-04")]:
+                album_folder = root / artist / album
+                album_folder.mkdir(parents=True)
+                (album_folder / "details.txt").write_text(f"{release_date}\n")
+                (album_folder / "01 Track.m4a").write_text("")
+
+    def touch(self, path, seconds=10):
+        ## Move the mtime well past the manifest's, whatever the file system's timestamp resolution
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 10 ** 9))
+
+    def test_unchanged_library_is_not_rescanned(self, tmp_path, mocker):
+        self.make_library(tmp_path / "lib")
+        manifest_path = str(tmp_path / "manifest.json")
+        first = music_index.create_index(str(tmp_path / "lib"), manifest_path=manifest_path)
+        assert os.path.exists(manifest_path)
+
+        spy = mocker.spy(music_index, 'get_album_from_folder')
+        second = music_index.create_index(str(tmp_path / "lib"), manifest_path=manifest_path)
+
+        assert spy.call_count == 0
+        assert len(list(second.range("1900-01", "2025-01"))) == len(list(first.range("1900-01", "2025-01"))) == 4
+        assert sorted(repr(album) for album in second.get_albums("2004-04")) == \
+               sorted(repr(album) for album in first.get_albums("2004-04"))
+        assert [track.file_with_path for track in second.get_albums("2000-01")[0].tracks] == \
+               [track.file_with_path for track in first.get_albums("2000-01")[0].tracks]
+
+    def test_changes_are_picked_up(self, tmp_path, mocker):
+        library = tmp_path / "lib"
+        self.make_library(library)
+        manifest_path = str(tmp_path / "manifest.json")
+        music_index.create_index(str(library), manifest_path=manifest_path)
+
+        ## A new track, a new release date, a removed album and a new album
+        (library / "Pixies" / "First" / "02 New.m4a").write_text("")
+        self.touch(library / "Pixies" / "First")
+        (library / "Modest Mouse" / "Second" / "details.txt").write_text("2005-05\n")
+        self.touch(library / "Modest Mouse" / "Second" / "details.txt")
+        for name in os.listdir(library / "Modest Mouse" / "First"):
+            os.remove(library / "Modest Mouse" / "First" / name)
+        os.rmdir(library / "Modest Mouse" / "First")
+        (library / "Modest Mouse" / "Third").mkdir()
+        (library / "Modest Mouse" / "Third" / "details.txt").write_text("2007-03\n")
+        self.touch(library / "Modest Mouse")
+
+        spy = mocker.spy(music_index, 'get_album_from_folder')
+        index = music_index.create_index(str(library), manifest_path=manifest_path)
+
+        assert spy.call_count == 3  ## Pixies/First, Modest Mouse/Second and Modest Mouse/Third
+        assert sorted(album.artist for album in index.get_albums("2000-01")) == ["Pixies"]
+        assert sorted(track.name for track in index.get_albums("2000-01")[0].tracks) == \
+               ["01 Track.m4a", "02 New.m4a"]
+        assert [album.artist for album in index.get_albums("2005-05")] == ["Modest Mouse"]
+        assert [album.album_name for album in index.get_albums("2007-03")] == ["Third"]
+        assert len(index.get_albums("2004-04")) == 1
+
+    def test_invalid_album_is_rechecked_once_fixed(self, tmp_path):
+        library = tmp_path / "lib"
+        self.make_library(library)
+        (library / "Pixies" / "Unfinished").mkdir()
+        manifest_path = str(tmp_path / "manifest.json")
+        assert len(list(music_index.create_index(str(library), manifest_path=manifest_path).range("1900-01", "2025-01"))) == 4
+
+        (library / "Pixies" / "Unfinished" / "details.txt").write_text("2024-10\n")
+        self.touch(library / "Pixies" / "Unfinished")
+        index = music_index.create_index(str(library), manifest_path=manifest_path)
+
+        assert [album.album_name for album in index.get_albums("2024-10")] == ["Unfinished"]
+
+    def test_bad_manifest_means_full_scan(self, tmp_path):
+        self.make_library(tmp_path / "lib")
+        manifest_path = tmp_path / "manifest.json"
+        manifest_path.write_text("not json")
+        assert music_index.load_manifest(str(manifest_path)) == {'version': music_index.MANIFEST_VERSION, 'artists': {}}
+
+        index = music_index.create_index(str(tmp_path / "lib"), manifest_path=str(manifest_path))
+
+        assert len(list(index.range("1900-01", "2025-01"))) == 4
+        assert music_index.load_manifest(str(manifest_path))['artists']
+
+
+class TestSnapshot():
+
+    @pytest.mark.parametrize("columnar", [False, True])
+    def test_save_load_round_trip(self, tmp_path, columnar):
+        test_music_index = MusicIndex()
+        test_music_index.add_album(Album("Pixies", "1989-04", "Doolittle",
+                                         [Track("01 Debaser.m4a", "MyMusic/Pixies/Doolittle/01 Debaser.m4a"),
+                                          Track("02 Tame.m4a", "MyMusic/Pixies/Doolittle/02 Tame.m4a")]))
+        test_music_index.add_album(Album("Pixies", "1989-04", "Demo", []))
+        test_music_index.add_album(Album("Björk", "1997-09", "Homogenic",
+                                         [Track("renamed.m4a", "/elsewhere/original.m4a")]))
+        test_music_index.add_album(Album("Unknown", "sometime", "Odd Date", []))
+        path = str(tmp_path / "index.snapshot")
+
+        test_music_index.save(path)
+        loaded = MusicIndex.load(path, columnar=columnar)
+
+        assert (loaded.catalog is not None) == columnar
+        assert len(loaded) == 3
+        assert [repr(album) for album in loaded.get_albums("1989-04")] == \
+               [repr(album) for album in test_music_index.get_albums("1989-04")]
+        assert [(track.name, track.file_with_path) for track in loaded.get_albums("1989-04")[0].tracks] == \
+               [("01 Debaser.m4a", "MyMusic/Pixies/Doolittle/01 Debaser.m4a"),
+                ("02 Tame.m4a", "MyMusic/Pixies/Doolittle/02 Tame.m4a")]
+        assert loaded.get_albums("1989-04")[1].tracks == []
+        homogenic = loaded.get_albums("1997-09")[0]
+        assert (homogenic.artist, homogenic.tracks[0].name, homogenic.tracks[0].file_with_path) == \
+               ("Björk", "renamed.m4a", "/elsewhere/original.m4a")
+        assert loaded.get_albums("sometime")[0].album_name == "Odd Date"
+        assert [album.album_name for album in loaded.range("1990-01", "2000-01")] == ["Homogenic"]
+
+    @pytest.mark.parametrize("columnar", [False, True])
+    def test_empty_index(self, tmp_path, columnar):
+        path = str(tmp_path / "index.snapshot")
+        MusicIndex().save(path)
+        loaded = MusicIndex.load(path, columnar=columnar)
+        assert len(loaded) == 0
+        assert list(loaded.range("1900-01", "2025-01")) == []
+
+    def test_not_a_snapshot(self, tmp_path):
+        path = tmp_path / "index.snapshot"
+        path.write_bytes(b"definitely not a snapshot")
+        with pytest.raises(ValueError):
+            MusicIndex.load(str(path))
+
+
+class TestPlaylistExport():
+
+    def make_index(self, root):
+        test_music_index = MusicIndex()
+        for artist, release_date in [("Pixies", "1989-04"), ("Modest Mouse", "2004-04"), ("Macy Gray", "2007-01")]:
+            album_folder = root / "lib" / artist
+            album_folder.mkdir(parents=True)
+            tracks = []
+            for number in range(3):
+                track_file = album_folder / f"0{number} Song.m4a"
+                track_file.write_bytes(f"{artist} {number}".encode() * 1000)
+                tracks.append(Track(track_file.name, str(track_file)))
+            test_music_index.add_album(Album(artist, release_date, "Album", tracks))
+        return test_music_index
+
+    @pytest.mark.parametrize("strategy", ["copy", "fastcopy", "hardlink", "symlink"])
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_strategies(self, tmp_path, strategy, workers):
+        test_music_index = self.make_index(tmp_path)
+
+        test_music_index.write_playlist(str(tmp_path / "out"), "2000-01", "2010-01", strategy=strategy, workers=workers)
+
+        playlist_dir = tmp_path / "out" / "Music 2000-01 through 2010-01"
+        assert sorted(path.name for path in playlist_dir.iterdir()) == \
+               [f"2004-04_Modest Mouse_Album_0{number} Song.m4a" for number in range(3)] + \
+               [f"2007-01_Macy Gray_Album_0{number} Song.m4a" for number in range(3)]
+        exported = playlist_dir / "2007-01_Macy Gray_Album_01 Song.m4a"
+        source = tmp_path / "lib" / "Macy Gray" / "01 Song.m4a"
+        assert exported.read_bytes() == source.read_bytes()
+        assert exported.is_symlink() == (strategy == "symlink")
+        assert os.path.samefile(exported, source) == (strategy in ("hardlink", "symlink"))
+
+    @pytest.mark.parametrize("strategy", ["fastcopy", "hardlink", "symlink"])
+    def test_export_twice_overwrites(self, tmp_path, strategy):
+        test_music_index = self.make_index(tmp_path)
+        test_music_index.write_playlist(str(tmp_path / "out"), strategy=strategy, workers=2)
+        test_music_index.write_playlist(str(tmp_path / "out"), strategy=strategy, workers=2)
+        assert len(os.listdir(tmp_path / "out" / "Music 1900-01 through 2025-01")) == 9
+
+    @pytest.mark.parametrize("link_strategy", ["hardlink", "symlink"])
+    def test_fastcopy_over_links_keeps_sources(self, tmp_path, link_strategy):
+        test_music_index = self.make_index(tmp_path)
+        source = tmp_path / "lib" / "Macy Gray" / "01 Song.m4a"
+        size = source.stat().st_size
+        test_music_index.write_playlist(str(tmp_path / "out"), strategy=link_strategy, workers=2)
+        test_music_index.write_playlist(str(tmp_path / "out"), strategy="fastcopy", workers=2)
+        assert source.stat().st_size == size
+        exported = tmp_path / "out" / "Music 1900-01 through 2025-01" / "2007-01_Macy Gray_Album_01 Song.m4a"
+        assert not exported.is_symlink() and not os.path.samefile(exported, source)
+        assert exported.read_bytes() == source.read_bytes()
+        assert len(os.listdir(tmp_path / "out" / "Music 1900-01 through 2025-01")) == 9
+
+    def test_makedirs_is_hoisted(self, tmp_path, mocker):
+        test_music_index = self.make_index(tmp_path)
+        (tmp_path / "out" / "Music 1900-01 through 2025-01").mkdir(parents=True)
+        mocker.patch('music_index.makedirs')
+
+        test_music_index.write_playlist(str(tmp_path / "out"), strategy="fastcopy", workers=4)
+
+        music_index.makedirs.assert_called_once_with(str(tmp_path / "out" / "Music 1900-01 through 2025-01"),
+                                                     exist_ok=True)
+
+    def test_unknown_strategy(self, tmp_path):
+        with pytest.raises(ValueError):
+            MusicIndex().write_playlist(str(tmp_path), strategy="teleport")
+
+    def test_errors_are_raised(self, tmp_path):
+        test_music_index = MusicIndex()
+        test_music_index.add_album(Album("Ghost", "2000-01", "Missing", [Track("gone.m4a", str(tmp_path / "gone.m4a"))]))
+        with pytest.raises(FileNotFoundError):
+            test_music_index.write_playlist(str(tmp_path / "out"), strategy="fastcopy", workers=4)
+
+
+class TestPlaylistManifest():
+
+    def make_index(self):
+        test_music_index = MusicIndex()
+        test_music_index.add_album(Album("Modest Mouse", "2004-04", "Good News",
+                                         [Track("01 Horn Intro.m4a", "/music/Modest Mouse/Good News/01 Horn Intro.m4a"),
+                                          Track("02 The World at Large.m4a",
+                                                "/music/Modest Mouse/Good News/02 The World at Large.m4a")]))
+        test_music_index.add_album(Album("Pixies", "1989-04", "Doolittle",
+                                         [Track("01 Debaser.m4a", "/music/Pixies/Doolittle/01 Debaser.m4a")]))
+        test_music_index.add_album(Album("Macy Gray", "2007-01", "Big, Bigger",
+                                         [Track("04 Okay.m4a", "/music/Macy Gray/Big/04 Okay.m4a")]))
+        return test_music_index
+
+    def test_m3u(self, tmp_path):
+        path = tmp_path / "playlist.m3u"
+        assert self.make_index().write_playlist_manifest(str(path), "1980-01", "2005-01") == 3
+        assert path.read_text(encoding="utf-8").splitlines() == [
+            "#EXTM3U",
+            "#EXTINF:-1,Pixies - 01 Debaser.m4a", "/music/Pixies/Doolittle/01 Debaser.m4a",
+            "#EXTINF:-1,Modest Mouse - 01 Horn Intro.m4a", "/music/Modest Mouse/Good News/01 Horn Intro.m4a",
+            "#EXTINF:-1,Modest Mouse - 02 The World at Large.m4a",
+            "/music/Modest Mouse/Good News/02 The World at Large.m4a",
+        ]
+
+    def test_jsonl(self, tmp_path):
+        path = tmp_path / "playlist.jsonl"
+        assert self.make_index().write_playlist_manifest(str(path)) == 4
+        rows = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [row['release_date'] for row in rows] == ["1989-04", "2004-04", "2004-04", "2007-01"]
+        assert rows[0] == {'release_date': "1989-04", 'artist': "Pixies", 'album': "Doolittle",
+                           'track': "01 Debaser.m4a", 'path': "/music/Pixies/Doolittle/01 Debaser.m4a"}
+
+    def test_csv_to_open_file(self):
+        output = io.StringIO()
+        assert self.make_index().write_playlist_manifest(output, "2007-01", "2007-01", playlist_format='csv') == 1
+        assert list(csv.reader(io.StringIO(output.getvalue()))) == [
+            ['release_date', 'artist', 'album', 'track', 'path'],
+            ["2007-01", "Macy Gray", "Big, Bigger", "04 Okay.m4a", "/music/Macy Gray/Big/04 Okay.m4a"],
+        ]
+
+    def test_does_not_touch_audio_files(self, tmp_path, mocker):
+        mocker.patch('music_index.shutil.copy')
+        mocker.patch('music_index.makedirs')
+        self.make_index().write_playlist_manifest(str(tmp_path / "playlist.m3u8"))
+        music_index.shutil.copy.assert_not_called()
+        music_index.makedirs.assert_not_called()
+
+    def test_unknown_format(self, tmp_path):
+        with pytest.raises(ValueError):
+            self.make_index().write_playlist_manifest(str(tmp_path / "playlist.txt"))
+        with pytest.raises(ValueError):
+            self.make_index().write_playlist_manifest(io.StringIO())
+
+
+class TestSecondaryIndexes():
+
+    def make_index(self):
+        test_music_index = MusicIndex()
+        test_music_index.add_album(Album("Pixies", "1989-04", "Doolittle",
+                                         [Track("01 Debaser.m4a", "p/1"), Track("02 Tame.m4a", "p/2")]))
+        test_music_index.add_album(Album("Pixies", "2004-11", "Live in Detroit", [Track("05 Debaser.m4a", "p/3")]))
+        test_music_index.add_album(Album("Björk", "1997-09", "Homogenic", [Track("01 Hunter.m4a", "b/1")]))
+        test_music_index.add_album(Album("Cover Band", "1997-09", "Doolittle", []))
+        return test_music_index
+
+    def test_albums_by_artist(self):
+        test_music_index = self.make_index()
+        assert [album.album_name for album in test_music_index.albums_by_artist("Pixies")] == \
+               ["Doolittle", "Live in Detroit"]
+        assert [album.album_name for album in test_music_index.albums_by_artist("  bjork ")] == ["Homogenic"]
+        assert test_music_index.albums_by_artist("Nobody") == []
+
+    def test_albums_named(self):
+        test_music_index = self.make_index()
+        assert sorted(album.artist for album in test_music_index.albums_named("DOOLITTLE")) == \
+               ["Cover Band", "Pixies"]
+
+    def test_tracks_named(self):
+        test_music_index = self.make_index()
+        assert [(album.album_name, track.name) for album, track in test_music_index.tracks_named("debaser")] == \
+               [("Doolittle", "01 Debaser.m4a"), ("Live in Detroit", "05 Debaser.m4a")]
+        assert [track.file_with_path for _, track in test_music_index.tracks_named("02 Tame.m4a")] == ["p/2"]
+
+    def test_indexes_built_on_first_query(self):
+        test_music_index = self.make_index()
+        assert test_music_index._by_artist is None
+        test_music_index.albums_by_artist("Pixies")
+        assert "pixies" in test_music_index._by_artist
+        test_music_index.add_album(Album("Pixies", "1988-03", "Surfer Rosa", []))
+        assert [album.album_name for album in test_music_index.albums_by_artist("Pixies")] == \
+               ["Doolittle", "Live in Detroit", "Surfer Rosa"]
+
+    def test_indexes_follow_removals(self):
+        test_music_index = self.make_index()
+        assert len(test_music_index.albums_named("Doolittle")) == 2
+        test_music_index.remove("1997-09")
+        assert test_music_index.albums_by_artist("Björk") == []
+        assert [album.artist for album in test_music_index.albums_named("Doolittle")] == ["Pixies"]
+        assert test_music_index.tracks_named("Hunter") == []
+        assert "bjork" not in test_music_index._by_artist
+
+        test_music_index["1989-04"] = [Album("Pixies", "1989-04", "Surfer Rosa", [])]
+        assert [album.album_name for album in test_music_index.albums_by_artist("Pixies")] == \
+               ["Live in Detroit", "Surfer Rosa"]
+        assert [album.album_name for album, _ in test_music_index.tracks_named("Debaser")] == ["Live in Detroit"]
+
+        test_music_index.clear()
+        assert test_music_index.albums_by_artist("Pixies") == []
+
+    def test_indexes_survive_snapshot(self, tmp_path):
+        path = str(tmp_path / "index.snapshot")
+        self.make_index().save(path)
+        loaded = MusicIndex.load(path)
+        assert len(loaded.albums_by_artist("pixies")) == 2
+        assert len(loaded.tracks_named("Debaser")) == 2
+
+    def test_normalize(self):
+        assert music_index.normalize_name("  Sigur   Rós ") == "sigur ros"
+        assert music_index.normalize_track_name("01 Debaser.m4a") == "debaser"
+        assert music_index.normalize_track_name("1979.mp3") == "1979"
+        assert music_index.normalize_track_name("Track") == "track"
+
+
+class TestCatalog():
+
+    def make_catalog(self):
+        catalog = Catalog()
+        catalog.add_album(Album("Pixies", "1989-04", "Doolittle",
+                                [Track("01 Debaser.m4a", "MyMusic/Pixies/Doolittle/01 Debaser.m4a"),
+                                 Track("02 Tame.m4a", "MyMusic/Pixies/Doolittle/02 Tame.m4a")]))
+        catalog.add_album(Album("Björk", "sometime", "Homogenic", [Track("renamed.m4a", "/elsewhere/original.m4a")]))
+        catalog.add_album(Album("Pixies", "1988-03", "Surfer Rosa", []))
+        return catalog
+
+    def test_views(self):
+        catalog = self.make_catalog()
+        assert len(catalog) == 3
+        assert catalog.num_tracks == 3
+        doolittle, homogenic, surfer_rosa = catalog
+        assert isinstance(doolittle, Album) and isinstance(doolittle.tracks[0], Track)
+        assert not hasattr(doolittle, '__dict__') and not hasattr(doolittle.tracks[0], '__dict__')
+        assert (doolittle.artist, doolittle.release_date, doolittle.album_name) == ("Pixies", "1989-04", "Doolittle")
+        assert [(track.name, track.file_with_path) for track in doolittle.tracks] == \
+               [("01 Debaser.m4a", "MyMusic/Pixies/Doolittle/01 Debaser.m4a"),
+                ("02 Tame.m4a", "MyMusic/Pixies/Doolittle/02 Tame.m4a")]
+        assert repr(homogenic) == '"Homogenic" by ~Björk~ released on [sometime]'
+        assert (homogenic.tracks[0].name, homogenic.tracks[0].file_with_path) == \
+               ("renamed.m4a", "/elsewhere/original.m4a")
+        assert surfer_rosa.tracks == []
+        with pytest.raises(IndexError):
+            catalog[3]
+
+    def test_views_compare_by_position(self):
+        catalog = self.make_catalog()
+        assert catalog[0] == catalog[0] and hash(catalog[0]) == hash(catalog[0])
+        assert catalog[0] != catalog[2]
+        assert catalog[0].tracks[1] == TrackView(catalog, 1)
+        assert catalog[0] != Catalog().add_album(Album("Pixies", "1989-04", "Doolittle", []))
+
+    def test_strings_are_shared(self):
+        catalog = self.make_catalog()
+        assert catalog._artist_ids[0] == catalog._artist_ids[2]
+        assert catalog._track_folder_ids[0] == catalog._track_folder_ids[1]
+        assert catalog._text.count("MyMusic/Pixies/Doolittle".encode()) == 1
+        assert catalog._text.count("Pixies".encode()) == 2  ## Once as the artist, once in the folder
+
+    def test_views_are_read_only(self):
+        with pytest.raises(AttributeError):
+            self.make_catalog()[0].artist = "Someone Else"
+
+    def test_write_to_new_dir(self, mocker):
+        mocker.patch('music_index.shutil.copy')
+        mocker.patch('music_index.makedirs')
+        self.make_catalog()[0].write_to_new_dir("Playlist")
+        music_index.shutil.copy.assert_any_call("MyMusic/Pixies/Doolittle/02 Tame.m4a",
+                                                "Playlist/1989-04_Pixies_Doolittle_02 Tame.m4a")
+
+    def test_music_index_with_catalog(self):
+        test_music_index = MusicIndex(Catalog())
+        stored = Album("Modest Mouse", "2004-04", "Good News for People Who Love Bad News",
+                       [Track("03 Float On.m4a", "mm/3")])
+        test_music_index.add_album(stored)
+        test_music_index.add_album(Album("Modest Mouse", "2004-04", "Live", []))
+        albums = test_music_index.get_albums("2004-04")
+        assert all(isinstance(album, AlbumView) for album in albums)
+        assert [album.album_name for album in albums] == ["Good News for People Who Love Bad News", "Live"]
+        assert len(test_music_index.catalog) == 2
+        assert [album.album_name for album in test_music_index.albums_by_artist("modest mouse")] == \
+               ["Good News for People Who Love Bad News", "Live"]
+        assert [track.name for _, track in test_music_index.search("float on")] == ["03 Float On.m4a"]
+        test_music_index.remove("2004-04")
+        assert test_music_index.albums_by_artist("modest mouse") == []
+
+    def test_create_index_columnar(self, mocker):
+        mocker.patch('music_index.iter_albums')
+        music_index.iter_albums.return_value = iter([Album("Pixies", "1989-04", "Doolittle",
+                                                           [Track("01 Debaser.m4a", "p/1")])])
+        new_index = music_index.create_index('My Music', columnar=True)
+        assert len(new_index.catalog) == 1
+        assert new_index.get_albums("1989-04")[0].tracks[0].file_with_path == "p/1"
+
+
+class TestAsync():
+
+    def make_library(self, root):
+        for artist in range(4):
+            for album in range(2):
+                album_folder = root / f"Artist {artist}" / f"Album {album}"
+                album_folder.mkdir(parents=True)
+                (album_folder / "details.txt").write_text(f"{2000 + artist}-{album + 1:02d}\n")
+                (album_folder / "01 Track.m4a").write_text("audio")
+
+    def test_create_index_async_matches_create_index(self, tmp_path):
+        self.make_library(tmp_path)
+        events = []
+        index = asyncio.run(music_index.create_index_async(str(tmp_path), workers=3,
+                                                           progress=lambda *event: events.append(event)))
+        expected = music_index.create_index(str(tmp_path))
+        assert [(item.key, [repr(album) for album in item.value]) for item in index] == \
+               [(item.key, [repr(album) for album in item.value]) for item in expected]
+        assert events == [('scan', done, 4) for done in range(1, 5)]
+
+    def test_create_index_async_with_manifest(self, tmp_path):
+        library, manifest_path = tmp_path / "library", str(tmp_path / "manifest.json")
+        self.make_library(library)
+        first = asyncio.run(music_index.create_index_async(str(library), manifest_path=manifest_path, columnar=True))
+        assert len(first.catalog) == 8
+        assert len(music_index.load_manifest(manifest_path)['artists']) == 4
+        second = asyncio.run(music_index.create_index_async(str(library), manifest_path=manifest_path))
+        assert [repr(album) for album in second.range("2000-01", "2003-12")] == \
+               [repr(album) for album in first.range("2000-01", "2003-12")]
+
+    def test_event_loop_keeps_running(self, mocker):
+        mocker.patch('music_index.scandir')
+        music_index.scandir.return_value = FakeScandir(
+            [FakeDirEntry('My Music', f"Artist{number}", is_dir=True) for number in range(6)])
+        mocker.patch('music_index.get_albums_for_artist',
+                     side_effect=lambda artist, folder: time.sleep(0.05) or [Album(artist, "2001-01", "A", [])])
+
+        async def main():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.005)
+
+            ticking = asyncio.create_task(ticker())
+            index = await music_index.create_index_async('My Music', workers=2)
+            ticking.cancel()
+            return index, ticks
+
+        index, ticks = asyncio.run(main())
+        assert [album.artist for album in index.get_albums("2001-01")] == [f"Artist{number}" for number in range(6)]
+        assert ticks > 10  ## The scan took ~0.15 s, and the loop kept ticking through it
+
+    def test_create_index_async_cancel(self, tmp_path, mocker):
+        mocker.patch('music_index._incremental_arguments',
+                     return_value=[(f"Artist{number}", f"My Music/Artist{number}", 0, None) for number in range(100)])
+        mocker.patch('music_index._get_albums_for_artist_incremental',
+                     side_effect=lambda *args: time.sleep(0.01) or ([], {'mtime_ns': 0, 'albums': {}}))
+        manifest_path = str(tmp_path / "manifest.json")
+
+        async def main():
+            task = asyncio.create_task(music_index.create_index_async('My Music', workers=2,
+                                                                      manifest_path=manifest_path))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await task
+
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(main())
+        time.sleep(0.05)  ## Let the calls already running finish
+        assert music_index._get_albums_for_artist_incremental.call_count < 100
+        assert not os.path.exists(manifest_path)
+
+    def test_write_playlist_async(self, tmp_path):
+        self.make_library(tmp_path / "library")
+        index = music_index.create_index(str(tmp_path / "library"))
+        events = []
+        written = asyncio.run(index.write_playlist_async(str(tmp_path / "out"), "2001-01", "2002-12", workers=3,
+                                                         progress=lambda *event: events.append(event)))
+        assert written == 4
+        assert events == [('write', done, 4) for done in range(1, 5)]
+        playlist_dir = tmp_path / "out" / "Music 2001-01 through 2002-12"
+        assert sorted(os.listdir(playlist_dir)) == ["2001-01_Artist 1_Album 0_01 Track.m4a",
+                                                    "2001-02_Artist 1_Album 1_01 Track.m4a",
+                                                    "2002-01_Artist 2_Album 0_01 Track.m4a",
+                                                    "2002-02_Artist 2_Album 1_01 Track.m4a"]
+        assert (playlist_dir / "2001-01_Artist 1_Album 0_01 Track.m4a").read_text() == "audio"
+
+    def test_write_playlist_async_errors(self, tmp_path, mocker):
+        index = MusicIndex()
+        with pytest.raises(ValueError):
+            asyncio.run(index.write_playlist_async(str(tmp_path), strategy='teleport'))
+        index.add_album(Album("Pixies", "1989-04", "Doolittle", [Track("01 Debaser.m4a", str(tmp_path / "missing.m4a"))]))
+        with pytest.raises(FileNotFoundError):
+            asyncio.run(index.write_playlist_async(str(tmp_path / "out")))
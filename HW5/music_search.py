@@ -0,0 +1,272 @@
+"""
+Full-text search over the artist, album and track names in a MusicIndex, for the partial names
+people actually type ("float on", "modest").
+
+A SearchIndex has one document per track (plus one for each album without tracks). It keeps
+an inverted index, a Hashtable from each normalized word to the sorted documents that contain
+it, and a sorted array of all the words, so a word prefix is a binary search away from the
+words it could be. A query is split into words; every word must match (AND), and the last one
+may be just the start of a word, as it is while someone is still typing. Results are ranked by
+where the words matched: a track name counts more than an album name, which counts more than
+the artist, and a whole word counts double.
+"""
+from array import array
+from bisect import bisect_left
+import gc
+import heapq
+from operator import itemgetter
+import os
+import re
+import unicodedata
+
+from hashtable import Hashtable
+
+ARTIST, ALBUM, TRACK = 1, 2, 4
+"""Bits of a posting saying which of a document's names a word appeared in"""
+_FIELD_BITS = 3
+_FIELD_MASK = (1 << _FIELD_BITS) - 1
+_FIELD_SCORES = tuple((1 if fields & ARTIST else 0) + (2 if fields & ALBUM else 0) + (4 if fields & TRACK else 0)
+                      for fields in range(1 << _FIELD_BITS))
+"""Score of a word match, indexed by the field bits of the posting"""
+_POSTING = 'I' if array('I').itemsize == 4 else 'L'
+_WORD = re.compile(r'\w+')
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalizes an artist or album name for the secondary indexes, so lookups ignore case,
+    accents and spacing: "  Björk " and "bjork" both become "bjork".
+    :param name: The name
+    :return: The normalized name
+    """
+    if name.isascii():
+        ## The common case, and much cheaper: there are no accents to strip
+        return ' '.join(name.lower().split())
+    decomposed = unicodedata.normalize('NFKD', name)
+    return ' '.join(''.join(char for char in decomposed if not unicodedata.combining(char)).casefold().split())
+
+
+def normalize_track_name(name: str) -> str:
+    """
+    Normalizes a track name like normalize_name, also dropping a leading track number and the
+    file extension: "01 Debaser.m4a" becomes "debaser".
+    :param name: The track name, as stored in a Track
+    :return: The normalized name
+    """
+    stem, extension = os.path.splitext(name)
+    if extension[1:].isalnum() and len(extension) <= 5:
+        name = stem
+    number, _, rest = name.partition(' ')
+    if number.isdigit() and rest:
+        name = rest
+    return normalize_name(name)
+
+
+def tokenize(text: str) -> list:
+    """
+    Splits text into normalized words: "Float On (Live)" becomes ["float", "on", "live"].
+    :param text: The text
+    :return: A list of words
+    """
+    return _WORD.findall(normalize_name(text))
+
+
+class SearchIndex:
+    """
+    An inverted word index and a sorted prefix index over the names of some albums and their tracks.
+    Albums can be added and removed after it is built; removed ones are skipped in results until
+    they make up half the documents, and then the index is rebuilt without them.
+    """
+
+    def __init__(self, albums=()):
+        """
+        :param albums: The Albums to index; their order is the tie-break order of search results
+        """
+        self._build(albums)
+
+    def _build(self, albums) -> None:
+        """
+        Internal helper that (re)builds every structure from scratch.
+        """
+        self._albums = []
+        """Document id -> Album"""
+        self._tracks = []
+        """Document id -> Track, or None for an album without tracks"""
+        self._spans = {}
+        """Album -> (first document id, end document id) of its documents"""
+        self._deleted = set()
+        """Document ids of removed albums, still in the postings"""
+        self._new_words = []
+        """Words added since the index was built, not yet merged into self._words"""
+        self._new_words_sorted = True
+        postings = {}
+        self._postings = postings
+        gc_was_enabled = gc.isenabled()
+        gc.disable()  ## Millions of postings and no garbage, like MusicIndex.load
+        try:
+            for album in albums:
+                self.add_album(album)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        self._postings = Hashtable.from_items(postings.items())
+        """Word -> array of postings, document id << _FIELD_BITS | field bits, in document order"""
+        self._words = sorted(postings)
+        """Every word in the index (but the new ones), sorted, for prefix queries"""
+        self._word_postings = [postings[word] for word in self._words]
+        """The postings of each word in self._words, so a prefix query needs no hashing"""
+        self._new_words = []
+
+    def __len__(self) -> int:
+        """
+        :return: The number of documents that can be found (removed albums don't count)
+        """
+        return len(self._albums) - len(self._deleted)
+
+    def add_album(self, album) -> None:
+        """
+        Adds an album and its tracks to the index.
+        :param album: The Album
+        """
+        album_words = dict.fromkeys(tokenize(album.artist), ARTIST)
+        for word in tokenize(album.album_name):
+            album_words[word] = album_words.get(word, 0) | ALBUM
+        first = len(self._albums)
+        postings = self._postings
+        for track in album.tracks or (None,):
+            words = album_words
+            if track is not None:
+                words = dict(album_words)
+                for word in _WORD.findall(normalize_track_name(track.name)):
+                    words[word] = words.get(word, 0) | TRACK
+            document = len(self._albums)
+            self._albums.append(album)
+            self._tracks.append(track)
+            for word, fields in words.items():
+                posting = postings.get(word)
+                if posting is None:
+                    posting = array(_POSTING)
+                    postings[word] = posting
+                    self._new_words.append(word)
+                    self._new_words_sorted = False
+                posting.append(document << _FIELD_BITS | fields)
+        self._spans[album] = (first, len(self._albums))
+
+    def remove_album(self, album) -> None:
+        """
+        Removes an album and its tracks from the index; does nothing if it isn't there.
+        :param album: The Album, the same object that was added
+        """
+        span = self._spans.pop(album, None)
+        if span is None:
+            return
+        self._deleted.update(range(*span))
+        if len(self._deleted) * 2 > len(self._albums):
+            self._build(list(self._spans))
+
+    def _matches(self, word: str, prefix: bool) -> list:
+        """
+        Internal helper that finds the postings for one query word.
+        :return: A list of (postings, is the whole word) tuples
+        """
+        if not prefix:
+            posting = self._postings.get(word)
+            return [] if posting is None else [(posting, True)]
+        if len(self._new_words) * 16 > len(self._words):
+            self._merge_new_words()
+        elif not self._new_words_sorted:
+            self._new_words.sort()
+            self._new_words_sorted = True
+        matches = []
+        for words, word_postings in ((self._words, self._word_postings), (self._new_words, None)):
+            position = bisect_left(words, word)
+            while position < len(words) and words[position].startswith(word):
+                posting = self._postings.get(words[position]) if word_postings is None else word_postings[position]
+                matches.append((posting, words[position] == word))
+                position += 1
+        return matches
+
+    def _merge_new_words(self) -> None:
+        """
+        Internal helper that moves the new words into the sorted words. Prefix queries search the
+        new words separately until there are enough of them for this to be worth it.
+        """
+        get = self._postings.get
+        pairs = list(zip(self._words, self._word_postings))
+        pairs.extend((word, get(word)) for word in self._new_words)
+        pairs.sort(key=itemgetter(0))
+        self._words = [word for word, _ in pairs]
+        self._word_postings = [posting for _, posting in pairs]
+        self._new_words = []
+        self._new_words_sorted = True
+
+    @staticmethod
+    def _scores(matches) -> dict:
+        """
+        Internal helper that scores every document in a query word's postings.
+        :return: Document id -> best score of the word in that document
+        """
+        scores = {}
+        for posting, whole_word in matches:
+            weight = 2 if whole_word else 1
+            for entry in posting:
+                document = entry >> _FIELD_BITS
+                score = _FIELD_SCORES[entry & _FIELD_MASK] * weight
+                if score > scores.get(document, 0):
+                    scores[document] = score
+        return scores
+
+    @staticmethod
+    def _probe(matches, document: int) -> int:
+        """
+        Internal helper that binary searches a query word's postings for one document.
+        :return: The best score of the word in that document, or 0 if it isn't there
+        """
+        best = 0
+        for posting, whole_word in matches:
+            position = bisect_left(posting, document << _FIELD_BITS)
+            if position < len(posting) and posting[position] >> _FIELD_BITS == document:
+                best = max(best, _FIELD_SCORES[posting[position] & _FIELD_MASK] * (2 if whole_word else 1))
+        return best
+
+    def search(self, query: str, limit: int = 10, prefix: bool = True) -> list:
+        """
+        Finds the tracks whose artist, album and track names together contain every word of a query.
+        :param query: The words to look for, in any case and with or without accents
+        :param limit: The most results to return
+        :param prefix: Let the last word of the query match the start of a longer word
+            ("modest mo" finds "Modest Mouse")
+        :return: A list of (Album, Track) tuples, best match first; Track is None for an album
+            without tracks
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words or limit <= 0:
+            return []
+        terms = []
+        for position, word in enumerate(words):
+            matches = self._matches(word, prefix and position == len(words) - 1)
+            if not matches:
+                return []
+            terms.append((sum(len(posting) for posting, _ in matches), matches))
+        ## Start from the rarest word, so the candidates only get fewer from there
+        terms.sort(key=lambda term: term[0])
+        scores = self._scores(terms[0][1])
+        for size, matches in terms[1:]:
+            if len(scores) * len(matches) * 16 < size:
+                ## Few candidates left: binary searching for each is cheaper than reading every posting
+                narrowed = {}
+                for document, score in scores.items():
+                    word_score = self._probe(matches, document)
+                    if word_score:
+                        narrowed[document] = score + word_score
+            else:
+                word_scores = self._scores(matches)
+                narrowed = {document: score + word_scores[document]
+                            for document, score in scores.items() if document in word_scores}
+            scores = narrowed
+            if not scores:
+                return []
+        deleted = self._deleted
+        candidates = (item for item in scores.items() if item[0] not in deleted) if deleted else scores.items()
+        best = heapq.nsmallest(limit, candidates, key=lambda item: (-item[1], item[0]))
+        return [(self._albums[document], self._tracks[document]) for document, _ in best]
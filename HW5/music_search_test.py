@@ -0,0 +1,119 @@
+from music_index import Album, MusicIndex, Track
+from music_search import SearchIndex, tokenize
+
+
+def make_albums():
+    return [
+        Album("Modest Mouse", "2004-04", "Good News for People Who Love Bad News",
+              [Track("03 Float On.m4a", "mm/3"), Track("09 Ocean Breathes Salty.m4a", "mm/9")]),
+        Album("Modest Mouse", "1997-04", "The Lonesome Crowded West", [Track("01 Teeth Like God's Shoeshine.m4a", "mm/1")]),
+        Album("Float Along", "2001-01", "Modest Beginnings", [Track("01 Intro.m4a", "fa/1")]),
+        Album("Björk", "1997-09", "Homogenic", [Track("01 Hunter.m4a", "b/1")]),
+        Album("Sigur Rós", "1999-06", "Ágætis byrjun", []),
+    ]
+
+
+def names(results):
+    return [(album.album_name, track.name if track else None) for album, track in results]
+
+
+class TestTokenize():
+
+    def test_tokenize(self):
+        assert tokenize("Float On (Live)") == ["float", "on", "live"]
+        assert tokenize("  Sigur Rós / Ágætis ") == ["sigur", "ros", "agætis"]
+        assert tokenize("") == []
+
+
+class TestSearchIndex():
+
+    def test_whole_words(self):
+        search_index = SearchIndex(make_albums())
+        assert names(search_index.search("float on", prefix=False)) == \
+               [("Good News for People Who Love Bad News", "03 Float On.m4a")]
+        assert search_index.search("float ocean", prefix=False) == []
+        assert search_index.search("nothing") == []
+        assert search_index.search("   ") == []
+
+    def test_prefix(self):
+        search_index = SearchIndex(make_albums())
+        assert names(search_index.search("ocean bre")) == [("Good News for People Who Love Bad News",
+                                                            "09 Ocean Breathes Salty.m4a")]
+        assert search_index.search("ocean bre", prefix=False) == []
+        assert {album.artist for album, _ in search_index.search("mod", limit=100)} == {"Modest Mouse", "Float Along"}
+
+    def test_ranking(self):
+        search_index = SearchIndex(make_albums())
+        ## "Float" in a track name beats "Float" in an artist name
+        assert [album.artist for album, _ in search_index.search("float")] == ["Modest Mouse", "Float Along"]
+        ## "Modest" in an album name beats "Modest" in an artist name; then ties keep their order
+        assert names(search_index.search("modest")) == [
+            ("Modest Beginnings", "01 Intro.m4a"),
+            ("Good News for People Who Love Bad News", "03 Float On.m4a"),
+            ("Good News for People Who Love Bad News", "09 Ocean Breathes Salty.m4a"),
+            ("The Lonesome Crowded West", "01 Teeth Like God's Shoeshine.m4a"),
+        ]
+        ## A whole word beats the start of one
+        search_index.add_album(Album("Modesty", "2020-01", "Blaise", []))
+        assert search_index.search("modest")[-1][0].artist == "Modesty"
+        assert len(search_index.search("modest", limit=2)) == 2
+
+    def test_accents_and_albums_without_tracks(self):
+        search_index = SearchIndex(make_albums())
+        assert names(search_index.search("SIGUR ros agæ")) == [("Ágætis byrjun", None)]
+        assert names(search_index.search("bjork hunter")) == [("Homogenic", "01 Hunter.m4a")]
+
+    def test_add_and_remove(self):
+        albums = make_albums()
+        search_index = SearchIndex(albums[:1])
+        assert search_index.search("teeth") == []
+        search_index.add_album(albums[1])
+        assert names(search_index.search("teeth")) == [("The Lonesome Crowded West", "01 Teeth Like God's Shoeshine.m4a")]
+        search_index.remove_album(albums[0])
+        assert search_index.search("float") == []
+        assert len(search_index) == 1
+        search_index.remove_album(albums[0])
+        assert len(search_index) == 1
+
+    def test_rebuilds_when_half_removed(self):
+        albums = make_albums()
+        search_index = SearchIndex(albums)
+        for album in albums[:3]:
+            search_index.remove_album(album)
+        assert len(search_index._albums) == len(search_index) == 2
+        assert search_index._deleted == set()
+        assert names(search_index.search("hunter")) == [("Homogenic", "01 Hunter.m4a")]
+
+    def test_many_candidates(self):
+        albums = [Album(f"Band {number}", "2000-01", f"Record {number}", [Track("01 Same Song.m4a", f"{number}/1")])
+                  for number in range(500)]
+        search_index = SearchIndex(albums)
+        assert len(search_index.search("same song", limit=1000)) == 500
+        assert names(search_index.search("same song band 123")) == [("Record 123", "01 Same Song.m4a")]
+        assert names(search_index.search("record 499 song")) == [("Record 499", "01 Same Song.m4a")]
+        ## A few new words are searched on their own, before they are merged into the sorted ones
+        search_index.add_album(Album("Band 7", "2001-01", "Zebra Crossing", [Track("01 Same Song.m4a", "z/1")]))
+        assert sorted(search_index._new_words) == ["crossing", "zebra"]
+        assert names(search_index.search("band 7 zeb")) == [("Zebra Crossing", "01 Same Song.m4a")]
+        assert names(search_index.search("band 7 cross")) == [("Zebra Crossing", "01 Same Song.m4a")]
+
+
+class TestMusicIndexSearch():
+
+    def test_search_follows_changes(self):
+        test_music_index = MusicIndex()
+        for album in make_albums():
+            test_music_index.add_album(album)
+        assert test_music_index._search_index is None
+        assert names(test_music_index.search("float on")) == [("Good News for People Who Love Bad News",
+                                                               "03 Float On.m4a")]
+
+        test_music_index.add_album(Album("Pixies", "1989-04", "Doolittle", [Track("01 Debaser.m4a", "p/1")]))
+        assert names(test_music_index.search("debaser")) == [("Doolittle", "01 Debaser.m4a")]
+        test_music_index.remove("2004-04")
+        assert test_music_index.search("float on") == []
+        test_music_index["1989-04"] = [Album("Pixies", "1989-04", "Surfer Rosa", [Track("07 Where Is My Mind.m4a", "p/7")])]
+        assert test_music_index.search("debaser") == []
+        assert names(test_music_index.search("pixies mind")) == [("Surfer Rosa", "07 Where Is My Mind.m4a")]
+        test_music_index.clear()
+        assert test_music_index.search("pixies") == []